@@ -1,21 +1,56 @@
+import asyncio
+import contextvars
+import copy
 import json
-from typing import Dict, Iterator, List, Literal, Optional, Tuple, Union
+import re
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import AsyncIterator, Dict, Generator, Iterator, List, Literal, Optional, Tuple, Union
 
 from qwen_agent.agents.fncall_agent import FnCallAgent
 from qwen_agent.llm import BaseChatModel
-from qwen_agent.llm.schema import ASSISTANT, DEFAULT_SYSTEM_MESSAGE, Message
-from qwen_agent.settings import MAX_LLM_CALL_PER_RUN
+from qwen_agent.llm.base import _truncate_input_messages_roughly
+from qwen_agent.llm.schema import ASSISTANT, DEFAULT_SYSTEM_MESSAGE, SYSTEM, Message
+from qwen_agent.settings import DEFAULT_MAX_INPUT_TOKENS, MAX_LLM_CALL_PER_RUN
 from qwen_agent.tools import BaseTool
-from qwen_agent.utils.utils import format_as_text_message, merge_generate_cfgs
-from openai import OpenAI
+from qwen_agent.utils.utils import format_as_text_message, has_chinese_messages, merge_generate_cfgs
+from openai import AsyncOpenAI
 import time
 from prompts import *
+from utils import get_limiter
+from session import Session
+from transcript import ReActTranscript
+from llm_trace import LLMTrace, atraced_create, current_trace, record_estimated, traced_create, use_trace
+from llm_clients import get_async_client, get_client
+from llm_retry import get_retry_policy
+from llm_cache import get_llm_cache
 
 
 TOOL_DESC = (
     '{name_for_model}: Call this tool to interact with the {name_for_human} API. '
     'What is the {name_for_human} API useful for? {description_for_model} Parameters: {parameters} {args_format}')
 
+# generate_cfg keys that are passed on to the OpenAI API by arun
+OPENAI_GENERATE_PARAMS = ('stop', 'top_p', 'temperature', 'max_tokens', 'presence_penalty', 'seed')
+
+# Where the page of a page observation ends: the buttons, the buttons discovered in the whole
+# session and the revisit hints that follow differ from one visit of the same page to the next
+_PAGE_END = re.compile(r'\n\s*Clickable buttons|=== GLOBAL DISCOVERY ===|\n\[提示\]|\n\[系统警告\]')
+
+_PIPELINE_EXECUTOR = None
+_PIPELINE_LOCK = threading.Lock()
+
+
+def _pipeline_executor() -> ThreadPoolExecutor:
+    """Threads running speculative planner calls of pipelined agents (shared by all agents)."""
+    global _PIPELINE_EXECUTOR
+    with _PIPELINE_LOCK:
+        if _PIPELINE_EXECUTOR is None:
+            _PIPELINE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="vgems-planner")
+        return _PIPELINE_EXECUTOR
+
+
 class VGems(FnCallAgent):
     """This explorer agent use ReAct format to call tools"""
 
@@ -26,6 +61,9 @@ class VGems(FnCallAgent):
                  name: Optional[str] = None,
                  description: Optional[str] = None,
                  files: Optional[List[str]] = None,
+                 session: Optional[Session] = None,
+                 pipeline_steps: bool = False,
+                 transcript_window: Optional[int] = None,
                  **kwargs):
         super().__init__(function_list=function_list,
                          llm=llm,
@@ -38,43 +76,102 @@ class VGems(FnCallAgent):
             base_generate_cfg=self.extra_generate_cfg,
             new_generate_cfg={'stop': ['Observation:', 'Observation:\n']},
         )
-        self.client = OpenAI(
-            api_key=llm['api_key'], 
-            base_url=llm['model_server'],
-        )
+        # Retries are done by the shared retry policy, not by the OpenAI SDK
+        self.client = get_client(llm['api_key'], llm['model_server'], max_retries=0)
         self.llm_cfg = llm
         self.momery = []
-
-    def observation_information_extraction(self, query, observation):
+        # In-memory tool state, handed to every tool call
+        self.session = session or Session(query=llm.get("query", ""))
+        # Overlap the critic with the next planner call when a page yields information
+        self.pipeline_steps = pipeline_steps
+        # Observations kept verbatim in the planner prompt (older ones are summarized), None for all
+        self.transcript_window = transcript_window
+        self.transcript = None
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """Shared AsyncOpenAI client of the running event loop, for arun."""
+        return get_async_client(self.llm_cfg['api_key'], self.llm_cfg['model_server'], max_retries=0)
+
+    def _call_tool(self, tool_name: str, tool_args: Union[str, dict] = '{}', **kwargs):
+        kwargs.setdefault('session', self.session)
+        return super()._call_tool(tool_name, tool_args, **kwargs)
+
+    def _extraction_messages(self, query, observation):
         user_prompt = "- Query: {query}\n- Observation: {observation}".format(query=query, observation=observation)
-        messages = [
+        return [
             {'role': 'system', 'content': STSTEM_CRITIIC_INFORMATION},
             {'role': 'user', 'content':  user_prompt}]
-        max_retries = 10
-        for attempt in range(max_retries):
+
+    @staticmethod
+    def _parse_extraction(content):
+        print(content)
+        # response_content = json.loads(content)
+        if "true" in content:
             try:
-                response = self.client.chat.completions.create(
-                    model=self.llm_cfg['model'],
-                    response_format={"type": "json_object"},
-                    messages=messages
-                )
-                print(response.choices[0].message.content)
-                # response_content = json.loads(response.choices[0].message.content)
-                if "true" in response.choices[0].message.content:
-                    try:
-                        return json.loads(response.choices[0].message.content)["information"]
-                    except:
-                        return response.choices[0].message.content
-                else:
-                    return None
-            except Exception as e:
-                print(e)
-                if attempt < max_retries - 1:
-                    time.sleep(1 * (2 ** attempt))  # Exponential backoff
-                else:
-                    raise e  # Raise the exception if the last retry fails
+                return json.loads(content)["information"]
+            except:
+                return content
+        else:
+            return None
+
+    def _extraction_params(self, query, observation):
+        return {
+            'model': self.llm_cfg['model'],
+            'response_format': {"type": "json_object"},
+            'messages': self._extraction_messages(query, observation),
+        }
+
+    def _extraction_key(self, query, observation):
+        """
+        LLM cache key of an extraction: the model, the prompt, the query and the page of the
+        observation (URL and content), so that the same page is found again when it is revisited.
+        """
+        return {
+            'model': self.llm_cfg['model'],
+            'system': STSTEM_CRITIIC_INFORMATION,
+            'query': query,
+            'page': _PAGE_END.split(observation, maxsplit=1)[0],
+        }
 
-    def critic_information(self, query, memory):
+    def observation_information_extraction(self, query, observation):
+        params = self._extraction_params(query, observation)
+        key = self._extraction_key(query, observation)
+        cache = get_llm_cache()
+        cached = cache.get('extraction', key)
+        if cached is not None:
+            return self._parse_extraction(cached)
+
+        def attempt_extraction(attempt):
+            with get_limiter().llm_slot():
+                response = traced_create(self.client, 'extraction', attempt=attempt, **params)
+            content = response.choices[0].message.content
+            information = self._parse_extraction(content)
+            cache.put('extraction', key, content)
+            return information
+
+        # Raises the last error when the retries are exhausted
+        return get_retry_policy().call(attempt_extraction, 'extraction')
+
+    async def aobservation_information_extraction(self, query, observation):
+        params = self._extraction_params(query, observation)
+        key = self._extraction_key(query, observation)
+        cache = get_llm_cache()
+        cached = cache.get('extraction', key)
+        if cached is not None:
+            return self._parse_extraction(cached)
+
+        async def attempt_extraction(attempt):
+            async with get_limiter().allm_slot():
+                response = await atraced_create(self.aclient, 'extraction', attempt=attempt, **params)
+            content = response.choices[0].message.content
+            information = self._parse_extraction(content)
+            cache.put('extraction', key, content)
+            return information
+
+        return await get_retry_policy().acall(attempt_extraction, 'extraction')
+
+    def _critic_messages(self, query, memory):
         memory_text = "\n---\n".join(memory) if memory else "No information collected yet"
         memory_count = len(memory)
 
@@ -92,47 +189,312 @@ You need to:
 3. If the query asks a question, check if the accumulated information provides a complete answer
 4. Make your judgment based on the above analysis"""
 
-        messages = [
+        return [
             {'role': 'system', 'content': STSTEM_CRITIIC_ANSWER},
             {'role': 'user', 'content': user_prompt}]
 
-        max_retries = 10
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.llm_cfg['model'],
-                    response_format={"type": "json_object"},
-                    messages=messages
-                )
-                result = response.choices[0].message.content
-                print(f"[critic_information] {result}")
+    @staticmethod
+    def _parse_critic(result):
+        print(f"[critic_information] {result}")
 
-                result_json = json.loads(result)
+        result_json = json.loads(result)
 
-                # Check if judge is true
-                if result_json.get("judge") == True or "true" in result.lower():
-                    answer = result_json.get("answer")
-                    if answer:
-                        return answer
-                    else:
-                        # If judge is true but no answer field, return the whole response
-                        return result
-                else:
-                    # judge is false, return None
-                    reason = result_json.get("reason", "Not enough information")
-                    print(f"[critic_information] Judge=false, reason: {reason}")
-                    return None
-
-            except Exception as e:
-                print(f"[critic_information] Error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(1 * (2 ** attempt))  # Exponential backoff
-                else:
-                    print(f"[critic_information] All retries failed, returning None")
-                    return None
+        # Check if judge is true
+        if result_json.get("judge") == True or "true" in result.lower():
+            answer = result_json.get("answer")
+            if answer:
+                return answer
+            else:
+                # If judge is true but no answer field, return the whole response
+                return result
+        else:
+            # judge is false, return None
+            reason = result_json.get("reason", "Not enough information")
+            print(f"[critic_information] Judge=false, reason: {reason}")
+            return None
+
+    def _critic_params(self, query, memory):
+        return {
+            'model': self.llm_cfg['model'],
+            'response_format': {"type": "json_object"},
+            'messages': self._critic_messages(query, memory),
+        }
+
+    def _cached_critic(self, query, memory):
+        """
+        Returns:
+            tuple: (True, final answer or None) if the critic verdict is in the LLM cache, (False, None) otherwise
+        """
+        cached = get_llm_cache().get('critic', self._critic_params(query, memory))
+        if cached is None:
+            return False, None
+        return True, self._parse_critic(cached)
+
+    def critic_information(self, query, memory, lookup=True):
+        params = self._critic_params(query, memory)
+        cache = get_llm_cache()
+        cached = cache.get('critic', params) if lookup else None
+        if cached is not None:
+            return self._parse_critic(cached)
+
+        def attempt_critic(attempt):
+            with get_limiter().llm_slot():
+                response = traced_create(self.client, 'critic', attempt=attempt, **params)
+            content = response.choices[0].message.content
+            answer = self._parse_critic(content)
+            cache.put('critic', params, content)
+            return answer
+
+        try:
+            return get_retry_policy().call(attempt_critic, 'critic_information')
+        except Exception as e:
+            print(f"[critic_information] All retries failed ({e}), returning None")
+            return None
+
+    async def acritic_information(self, query, memory, lookup=True):
+        params = self._critic_params(query, memory)
+        cache = get_llm_cache()
+        cached = cache.get('critic', params) if lookup else None
+        if cached is not None:
+            return self._parse_critic(cached)
+
+        async def attempt_critic(attempt):
+            async with get_limiter().allm_slot():
+                response = await atraced_create(self.aclient, 'critic', attempt=attempt, **params)
+            content = response.choices[0].message.content
+            answer = self._parse_critic(content)
+            cache.put('critic', params, content)
+            return answer
+
+        try:
+            return await get_retry_policy().acall(attempt_critic, 'critic_information')
+        except Exception as e:
+            print(f"[critic_information] All retries failed ({e}), returning None")
+            return None
+
+    def _call_llm(self, *args, **kwargs):
+        start = time.monotonic()
+        output, error = [], None
+        try:
+            # qwen_agent retries the planner itself; the shared bucket still admits the call
+            get_retry_policy().bucket.acquire()
+            # Hold an LLM slot while the planner response streams in
+            with get_limiter().llm_slot():
+                for output in super()._call_llm(*args, **kwargs):
+                    yield output
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # qwen_agent does not report usage for the streamed planner, so tokens are estimated
+            record_estimated('planner', self.llm_cfg.get('model', ''), kwargs.get('messages'),
+                             output[-1].content if output else '', time.monotonic() - start, error=error)
+
+    async def _acall_llm(self, text_messages: List[Message]) -> List[Message]:
+        """Planner call of arun: the same prompt and stop words as _call_llm, through AsyncOpenAI."""
+        generate_cfg = merge_generate_cfgs(self.llm_cfg.get('generate_cfg', {}), self.extra_generate_cfg)
+        params = {k: v for k, v in generate_cfg.items() if k in OPENAI_GENERATE_PARAMS}
+        # qwen_agent truncates the synchronous planner's input to max_input_tokens; do the same here
+        max_input_tokens = generate_cfg.get('max_input_tokens', DEFAULT_MAX_INPUT_TOKENS)
+        if max_input_tokens > 0:
+            text_messages = _truncate_input_messages_roughly(messages=text_messages, max_tokens=max_input_tokens)
+        messages = [{'role': m.role, 'content': m.content} for m in text_messages]
+
+        async def attempt_planner(attempt):
+            async with get_limiter().allm_slot():
+                response = await atraced_create(
+                    self.aclient, 'planner', attempt=attempt,
+                    model=self.llm_cfg['model'],
+                    messages=messages,
+                    **params
+                )
+            return [Message(role=ASSISTANT, content=response.choices[0].message.content or '')]
+
+        return await get_retry_policy().acall(attempt_planner, 'planner')
+
+    async def _acall_tool(self, tool_name: str, tool_args: Union[str, dict] = '{}', **kwargs) -> str:
+        """
+        Async counterpart of _call_tool: tools defining acall() are awaited on the
+        running loop, the others (in-memory state, blocking LLM calls) run in a thread.
+        """
+        kwargs.setdefault('session', self.session)
+        tool = self.function_map.get(tool_name)
+        if tool is None or not hasattr(tool, 'acall'):
+            return await asyncio.to_thread(self._call_tool, tool_name, tool_args, **kwargs)
+        try:
+            tool_result = await tool.acall(tool_args, **kwargs)
+        except Exception as ex:
+            traceback_info = ''.join(traceback.format_tb(ex.__traceback__))
+            error_message = (f'An error occurred when calling tool `{tool_name}`:\n'
+                             f'{type(ex).__name__}: {ex}\nTraceback:\n{traceback_info}')
+            print(f"[WARNING] {error_message}")
+            return error_message
+        if isinstance(tool_result, str):
+            return tool_result
+        return json.dumps(tool_result, ensure_ascii=False, indent=4)
 
     def _run(self, messages: List[Message], lang: Literal['en', 'zh'] = 'en', **kwargs) -> Iterator[List[Message]]:
+        react = self._react_loop(messages, lang=lang)
+        reply = None
+        while True:
+            try:
+                request = react.send(reply)
+            except StopIteration:
+                return
+            kind, args = request[0], request[1:]
+            reply = None
+            if kind == 'emit':
+                yield args[0]
+            elif kind == 'llm':
+                reply = []
+                for reply in self._call_llm(messages=args[0]):
+                    pass  # Accumulate all streaming outputs
+            elif kind == 'tool':
+                reply = self._call_tool(args[0], args[1], messages=messages, **kwargs)
+            elif kind == 'extract':
+                reply = self.observation_information_extraction(*args)
+            elif kind == 'critic':
+                reply = self.critic_information(*args)
+            elif kind == 'critic+llm':
+                reply = self._critic_and_plan(*args)
+
+    def _plan(self, text_messages):
+        output = []
+        for output in self._call_llm(messages=text_messages):
+            pass  # Accumulate all streaming outputs
+        return output
+
+    def _critic_and_plan(self, query, memory, text_messages):
+        """
+        Run the critic while the next planner call streams in a worker thread.
+
+        The planner call is speculative: when the critic answers, its output is not used. A call
+        already sent cannot be interrupted, so it is waited for and recorded as discarded in the
+        trace of the question.
+        """
+        known, stage2 = self._cached_critic(query, memory)
+        if known:
+            # The verdict is known without a call, so nothing needs to be speculated
+            return (stage2, None) if stage2 else (None, self._plan(text_messages))
+
+        speculative = LLMTrace()
+
+        def plan():
+            with use_trace(speculative):
+                return self._plan(text_messages)
+
+        # Run in a copy of the current context (limiter slots, session) in a worker thread
+        planner = _pipeline_executor().submit(contextvars.copy_context().run, plan)
+        used = False
+        try:
+            stage2 = self.critic_information(query, memory, lookup=False)
+            if stage2:
+                if not planner.cancel():
+                    wait([planner])
+                return stage2, None
+            output = planner.result()
+            used = True
+            return None, output
+        finally:
+            trace = current_trace()
+            if trace is not None:
+                trace.merge(speculative, discarded=not used)
+
+    async def _acritic_and_plan(self, query, memory, text_messages):
+        """Async version of _critic_and_plan; a discarded planner call is cancelled instead."""
+        known, stage2 = self._cached_critic(query, memory)
+        if known:
+            return (stage2, None) if stage2 else (None, await self._acall_llm(text_messages))
+
+        speculative = LLMTrace()
+
+        async def plan():
+            with use_trace(speculative):
+                return await self._acall_llm(text_messages)
+
+        planner = asyncio.ensure_future(plan())
+        used = False
+        try:
+            stage2 = await self.acritic_information(query, memory, lookup=False)
+            if stage2:
+                planner.cancel()
+                # Let a request already sent record its prompt tokens before the trace is read
+                await asyncio.wait({planner})
+                return stage2, None
+            output = await planner
+            used = True
+            return None, output
+        except BaseException:
+            planner.cancel()
+            raise
+        finally:
+            trace = current_trace()
+            if trace is not None:
+                trace.merge(speculative, discarded=not used)
+
+    async def arun(self, messages: List[Union[Dict, Message]], lang: Optional[Literal['en', 'zh']] = None,
+                   **kwargs) -> AsyncIterator[List[Union[Dict, Message]]]:
+        """
+        Async counterpart of run(): the same ReAct loop, with AsyncOpenAI calls and
+        tools awaited on the running event loop instead of blocking a thread.
+
+        Yields:
+            list: response messages, as dicts if the input messages were dicts
+        """
+        new_messages, lang, return_dicts = self._prepare_messages(messages, lang)
+        react = self._react_loop(new_messages, lang=lang)
+        reply = None
+        while True:
+            try:
+                request = react.send(reply)
+            except StopIteration:
+                return
+            kind, args = request[0], request[1:]
+            reply = None
+            if kind == 'emit':
+                rsp = args[0]
+                for msg in rsp:
+                    if not msg.name and self.name:
+                        msg.name = self.name
+                yield [msg.model_dump() for msg in rsp] if return_dicts else rsp
+            elif kind == 'llm':
+                reply = await self._acall_llm(args[0])
+            elif kind == 'tool':
+                reply = await self._acall_tool(args[0], args[1], messages=new_messages, **kwargs)
+            elif kind == 'extract':
+                reply = await self.aobservation_information_extraction(*args)
+            elif kind == 'critic':
+                reply = await self.acritic_information(*args)
+            elif kind == 'critic+llm':
+                reply = await self._acritic_and_plan(*args)
+
+    def _prepare_messages(self, messages, lang):
+        """Message preprocessing of Agent.run, for arun."""
+        return_dicts = bool(messages) and all(isinstance(m, dict) for m in messages)
+        new_messages = [Message(**m) if isinstance(m, dict) else m for m in copy.deepcopy(messages)]
+        if lang is None:
+            lang = 'zh' if has_chinese_messages(new_messages) else 'en'
+        if self.system_message and (not new_messages or new_messages[0].role != SYSTEM):
+            new_messages.insert(0, Message(role=SYSTEM, content=self.system_message))
+        return new_messages, lang, return_dicts
+
+    def _react_loop(self, messages: List[Message], lang: Literal['en', 'zh'] = 'en') -> Generator[tuple, object, None]:
+        """
+        The ReAct loop without any I/O, shared by _run (sync) and arun (async).
+
+        It yields requests that the driver fulfils and sends the result back:
+            ('emit', [Message])              -> None; the messages go to the caller
+            ('llm', text_messages)           -> planner output, a list of Message
+            ('tool', action, action_input)   -> tool observation (str)
+            ('extract', query, observation)  -> extracted information or None
+            ('critic', query, memory)        -> final answer or None
+            ('critic+llm', query, memory, text_messages)
+                                             -> (final answer or None, planner output or None);
+                                                the planner call runs concurrently with the
+                                                critic and is discarded if the critic answers
+        """
         text_messages = self._prepend_react_prompt(messages, lang=lang)
+        self.transcript = ReActTranscript(text_messages[-1].content, window=self.transcript_window)
         num_llm_calls_available = MAX_LLM_CALL_PER_RUN
         response: str = 'Thought: '
         query = self.llm_cfg["query"]
@@ -143,6 +505,7 @@ You need to:
         visited_urls = set()
         consecutive_no_action = 0
         consecutive_no_useful_info = 0
+        prefetched = None  # planner output started early in pipelined mode
 
         while num_llm_calls_available > 0:
             num_llm_calls_available -= 1
@@ -150,23 +513,25 @@ You need to:
             # Check if we should force end (running out of actions but have some results)
             if num_llm_calls_available < action_count * 0.15 and len(self.momery) > 0:
                 print(f"[INFO] Running low on actions ({num_llm_calls_available} left), attempting to generate final answer...")
-                stage2 = self.critic_information(query, self.momery)
+                stage2 = yield ('critic', query, self.momery)
                 if stage2:
                     response = f'Final Answer: {stage2}'
-                    yield [Message(role=ASSISTANT, content=response)]
+                    yield ('emit', [Message(role=ASSISTANT, content=response)])
                     break
                 else:
                     # Critic says not enough, give a clear warning but let Agent continue if it still has steps
                     print(f"[WARNING] Critic says information is insufficient but we're running low on steps. Agent will continue exploring if possible.")
                     # Don't force output here - let the agent try to find more information
 
-            output = []
-            for output in self._call_llm(messages=text_messages):
-                pass  # Accumulate all streaming outputs
+            if prefetched is not None:
+                # Planner output computed while the critic of the previous step was running
+                output, prefetched = prefetched, None
+            else:
+                output = yield ('llm', self._planner_messages(text_messages))
 
             # Yield the complete output once after streaming finishes
             if output:
-                yield [Message(role=ASSISTANT, content=output[-1].content)]
+                yield ('emit', [Message(role=ASSISTANT, content=output[-1].content)])
                 response += output[-1].content
 
             has_action, action, action_input, thought = self._detect_tool("\n"+output[-1].content)
@@ -182,15 +547,15 @@ You need to:
                     print(f"[ERROR] LLM stuck in no-action loop for {consecutive_no_action} times, forcing final answer")
                     if len(self.momery) > 0:
                         # Try critic first
-                        stage2 = self.critic_information(query, self.momery)
+                        stage2 = yield ('critic', query, self.momery)
                         if stage2:
-                            yield [Message(role=ASSISTANT, content=f'Final Answer: {stage2}')]
+                            yield ('emit', [Message(role=ASSISTANT, content=f'Final Answer: {stage2}')])
                         else:
                             # Critic says not enough - give honest partial answer
                             answer = f"抱歉，Agent 遇到问题无法继续。以下是已收集的 {len(self.momery)} 条信息：\n\n" + "\n---\n".join(self.momery)
-                            yield [Message(role=ASSISTANT, content=f'Final Answer: {answer}')]
+                            yield ('emit', [Message(role=ASSISTANT, content=f'Final Answer: {answer}')])
                     else:
-                        yield [Message(role=ASSISTANT, content='Final Answer: 抱歉，未能找到相关信息。')]
+                        yield ('emit', [Message(role=ASSISTANT, content='Final Answer: 抱歉，未能找到相关信息。')])
                     break
 
                 # Provide helpful hint to LLM
@@ -201,7 +566,7 @@ You need to:
                     hint += " 请使用正确的Action格式继续探索。记住你可以使用的工具有：visit_page（点击按钮）、visit_url（访问URL）、url_stack（返回上级）。"
                 hint += " 请务必输出 Action 和 Action Input！"
                 hint += "\nThought: "
-                text_messages[-1].content += hint
+                self.transcript.add_hint(hint)
                 response += hint
                 continue
             else:
@@ -209,7 +574,7 @@ You need to:
 
             # Add the tool result
             query = self.llm_cfg["query"]
-            observation = self._call_tool(action, action_input, messages=messages, **kwargs)
+            observation = yield ('tool', action, action_input)
 
             # Check for URL duplication - extract real URL from observation
             current_url = None
@@ -235,24 +600,31 @@ You need to:
             if current_url:
                 visited_urls.add(current_url)
 
-            stage1 = self.observation_information_extraction(query, observation)
+            stage1 = yield ('extract', query, observation)
             if stage1:
                 consecutive_no_useful_info = 0
                 self.momery.append(stage1+"\n")
                 if len(self.momery) > 1:
-                    yield [Message(role=ASSISTANT, content= "Memory:\n" + "-".join(self.momery)+"\"}")]
+                    yield ('emit', [Message(role=ASSISTANT, content= "Memory:\n" + "-".join(self.momery)+"\"}")])
                 else:
-                    yield [Message(role=ASSISTANT, content= "Memory:\n" + "-" + self.momery[0]+"\"}")]
+                    yield ('emit', [Message(role=ASSISTANT, content= "Memory:\n" + "-" + self.momery[0]+"\"}")])
 
                 # CRITICAL: Force Agent to check progress after finding info
                 progress_hint = f"\n[SYSTEM ALERT] You found useful information! Current count: {len(self.momery)}. Review the query to determine if you need more information or can provide the Final Answer now."
                 print(progress_hint)
 
-                stage2 = self.critic_information(query, self.momery)
+                if self.pipeline_steps:
+                    # Extend the transcript now, so that the next planner call runs while the critic decides
+                    response += self.transcript.add_step(thought, action, action_input, observation, useful=True)
+                    stage2, prefetched = yield ('critic+llm', query, self.momery, self._planner_messages(text_messages))
+                else:
+                    stage2 = yield ('critic', query, self.momery)
                 if stage2:
                     response = f'Final Answer: {stage2}'
-                    yield [Message(role=ASSISTANT, content=response)]
+                    yield ('emit', [Message(role=ASSISTANT, content=response)])
                     break
+                if self.pipeline_steps:
+                    continue
             else:
                 consecutive_no_useful_info += 1
                 print(f"[INFO] No useful info from current page (count: {consecutive_no_useful_info})")
@@ -264,18 +636,17 @@ You need to:
                 feedback += "]"
                 observation = observation + feedback
 
-            observation = f'\nObservation: {observation}\nThought: '
-            response += observation
+            response += self.transcript.add_step(thought, action, action_input, observation, useful=bool(stage1))
             # yield [Message(role=ASSISTANT, content=response)]
 
-            if (not text_messages[-1].content.endswith('\nThought: ')) and (not thought.startswith('\n')):
-                # Add the '\n' between '\nQuestion:' and the first 'Thought:'
-                text_messages[-1].content += '\n'
-            if action_input.startswith('```'):
-                # Add a newline for proper markdown rendering of code
-                action_input = '\n' + action_input
-            text_messages[-1].content += thought + f'\nAction: {action}\nAction Input: {action_input}' + observation
-            # print(text_messages[-1].content)
+    def _planner_messages(self, text_messages: List[Message]) -> List[Message]:
+        """Render the (bounded) transcript into the planner prompt and record its token count."""
+        text_messages[-1].content = self.transcript.render(self.momery)
+        usage = self.transcript.record_call(text_messages[-1].content)
+        print(f"[transcript] planner call {usage['step']}: ~{usage['prompt_tokens']} prompt tokens "
+              f"(~{usage['full_tokens']} unbounded)")
+        self.session.metrics['transcript'] = self.transcript.stats()
+        return text_messages
 
     def _prepend_react_prompt(self, messages: List[Message], lang: Literal['en', 'zh']) -> List[Message]:
         tool_descs = []
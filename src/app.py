@@ -8,10 +8,11 @@ import re
 import json
 import asyncio
 from utils import *
+from background_loop import run_sync
 import base64
 from PIL import Image
 from bs4 import BeautifulSoup
-from openai import OpenAI
+from llm_clients import get_client
 import time
 path = 'count.txt'
 
@@ -310,7 +311,7 @@ IMPORTANT INITIAL STEPS (YOU MUST FOLLOW):
 """.format(query=query, website=website)
                     st.markdown('**🌐Now visit**')
                     st.write(website)
-                    html, markdown, screenshot = asyncio.run(get_info(website))
+                    html, markdown, screenshot = run_sync(get_info(website))
                     with col2:
                         st.markdown('**📸Observation**')
                         if screenshot:
@@ -431,7 +432,7 @@ class VisitPage(BaseTool):
                 st.markdown('**👆Click Button**')
                 st.write(json5.loads(params)['button'].replace("<button>",""))
                 url = BUTTON_URL_ADIC[json5.loads(params)['button'].replace("<button>","")]
-                html, markdown, screenshot = asyncio.run(get_info(url))
+                html, markdown, screenshot = run_sync(get_info(url))
                 st.markdown('**🌐Now Visit**')
                 st.write(url)
                 with col2:
@@ -544,7 +545,7 @@ class VisitUrl(BaseTool):
                 f.write("1")
 
         try:
-            html, markdown, screenshot = asyncio.run(get_info(url))
+            html, markdown, screenshot = run_sync(get_info(url))
         except Exception:
             return "failed to fetch url"
 
@@ -987,10 +988,7 @@ Please return JSON directly:
 """
 
         try:
-            client = OpenAI(
-                api_key=llm_cfg['api_key'],
-                base_url=llm_cfg['model_server'],
-            )
+            client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
             response = client.chat.completions.create(
                 model=llm_cfg['model'],
                 messages=[{'role': 'user', 'content': prompt}],
@@ -1286,10 +1284,7 @@ Output requirements:
                 }
             ]
 
-            client = OpenAI(
-                api_key=llm_cfg['api_key'],
-                base_url=llm_cfg['model_server'],
-            )
+            client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
 
             response = client.chat.completions.create(
                 model=vlm_model,
@@ -0,0 +1,142 @@
+"""
+Persistent background event loop for the synchronous tools.
+
+qwen_agent calls tools synchronously, but page fetches are coroutines. Instead
+of creating a thread and a fresh event loop per fetch, one daemon thread runs
+a single loop for the lifetime of the process; coroutines are submitted to it
+from any thread. Loop-bound resources (the browser pool, async HTTP clients)
+therefore live as long as the process and are shared by every tool call.
+
+Usage:
+    html, markdown, screenshot = run_sync(get_info(url))     # blocking, from sync code
+    future = submit(get_info(url))                           # concurrent.futures.Future
+    result = await asyncio.wrap_future(submit(get_info(url)))  # from another event loop
+"""
+
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Optional
+
+from browser_pool import close_browser_pool
+from llm_clients import aclose_llm_clients
+from static_fetch import aclose_static_clients
+
+SHUTDOWN_TIMEOUT = 30.0  # seconds to wait for the loop's browsers and clients to close on shutdown
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str = "vgems-event-loop"):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._started = threading.Event()
+        self._thread.start()
+        self._started.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._loop.is_closed()
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedule coro on the loop (thread-safe). Context variables of the caller
+        are visible to the coroutine.
+
+        Returns:
+            Future: concurrent.futures.Future resolving to the result of coro
+        """
+        if not self.running:
+            coro.close()
+            raise RuntimeError("Background event loop is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None):
+        """
+        Run coro on the loop and block until it finishes.
+
+        Args:
+            coro: coroutine to run
+            timeout (float): seconds to wait, None to wait forever
+
+        Returns:
+            the result of coro
+        """
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("run() would deadlock when called from the background loop; await the coroutine instead")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Close the browser pool and async HTTP clients of the loop, then stop the loop and its thread."""
+        if not self.running:
+            return
+        # Loop-bound resources can only be closed while the loop still runs
+        for name, close in (("browser pool", close_browser_pool), ("LLM clients", aclose_llm_clients),
+                            ("static fetch client", aclose_static_clients)):
+            try:
+                self.submit(close()).result(timeout)
+            except Exception as e:
+                print(f"[WARNING] Failed to close {name}: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """
+    Returns:
+        BackgroundLoop: the process-wide background loop (started lazily)
+    """
+    global _background_loop
+    with _lock:
+        if _background_loop is None or not _background_loop.running:
+            _background_loop = BackgroundLoop()
+        return _background_loop
+
+
+def submit(coro: Coroutine) -> Future:
+    """Schedule coro on the background loop; see BackgroundLoop.submit."""
+    return get_background_loop().submit(coro)
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None):
+    """Run coro on the background loop and wait for its result; see BackgroundLoop.run."""
+    return get_background_loop().run(coro, timeout)
+
+
+def shutdown_background_loop():
+    """Stop the background loop (closing its browsers and HTTP clients), if it was started."""
+    global _background_loop
+    with _lock:
+        loop, _background_loop = _background_loop, None
+    if loop is not None:
+        loop.stop()
+
+
+atexit.register(shutdown_background_loop)
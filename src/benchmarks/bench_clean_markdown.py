@@ -0,0 +1,200 @@
+"""
+Throughput and parity of markdown cleaning.
+
+Compares markdown_cleaning.clean_markdown with the original implementation,
+kept below as the reference, and reports MB/s for the reference, both URL
+patterns and the streaming cleaner fed in small chunks. Checks:
+
+- the legacy URL pattern gives exactly the reference output, on the corpus
+  and on random texts built from links, URLs, list markers and line breaks;
+- streaming in chunks of any size gives the same output as one call;
+- with the fixed URL pattern, the output of texts without URLs is unchanged,
+  and for every text it keeps the reference's properties: no blank lines
+  left, and a subsequence of the input (cleaning only removes characters).
+
+The corpus is a page cache directory (the raw markdown of each JSON entry) or
+a directory of .md/.txt files; synthetic pages of several sizes otherwise.
+
+Usage:
+    cd src
+    python benchmarks/bench_clean_markdown.py
+    python benchmarks/bench_clean_markdown.py --corpus page_cache --repeat 20
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from markdown_cleaning import clean_markdown, iter_clean_markdown  # noqa: E402
+
+
+# Reference: the original utils.clean_markdown
+
+def reference_clean_markdown(res):
+    """
+    Args:
+        res (str): markdown content
+
+    Returns:
+        str: cleaned markdown content
+    """
+    pattern = r'\[.*?\]\(.*?\)'
+    try:
+        result = re.sub(pattern, '', res)
+        url_pattern = pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+        result = re.sub(url_pattern, '', result)
+        result = result.replace("* \n","")
+        result = re.sub(r"\n\n+", "\n", result)
+        return result
+    except Exception:
+        return res
+
+
+# Corpus
+
+def synthetic_page(size, seed=0):
+    """Crawler-like markdown: navigation link lists, paragraphs with links and bare URLs, blank lines."""
+    rng = random.Random(seed)
+    words = ["学院", "新闻", "招生", "research", "faculty", "数据", "2024", "Contact", "the", "of", "课程"]
+    parts = []
+    while sum(len(p) for p in parts) < size:
+        kind = rng.random()
+        if kind < 0.3:
+            parts.append(f"* [{rng.choice(words)}](https://www.example.edu.cn/{rng.choice(words)}/"
+                         f"{rng.randint(1, 999)}.htm)\n")
+        elif kind < 0.4:
+            parts.append("* \n")
+        elif kind < 0.5:
+            parts.append(f"![](https://img.example.com/{rng.randint(1, 99)}.jpg \"photo\")\n\n")
+        else:
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+            if rng.random() < 0.3:
+                text += f" (see https://www.example.org/page?id={rng.randint(1, 99)}&lang=en)."
+            parts.append(text + "\n" * rng.randint(1, 3))
+    return "".join(parts)[:size]
+
+
+def load_corpus(corpus_dir: Path):
+    """
+    Returns:
+        list: (name, markdown) tuples
+    """
+    pages = []
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix == ".json":
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("markdown"):
+                pages.append((path.name, entry["markdown"]))
+        elif path.suffix in (".md", ".txt"):
+            pages.append((path.name, path.read_text(encoding="utf-8", errors="replace")))
+    return pages
+
+
+# Randomized parity
+
+FRAGMENTS = ["[", "]", "(", ")", "[a](b)", "[link](https://x.org/a)", "![](img.png)", "http://", "https://",
+             "https://a.b/c?d=e&f=%2F", "http://x.y/(z)", "www.x.cn", "* ", "* \n", "*", " ", "\n", "\n\n",
+             "\n\n\n", "\\", "%", "%2", "%zz", ".", ",", ";", ":", "!", "?", "'", '"', "<", ">", "_", "-", "~",
+             "#", "a", "Z", "9", "数据", "。", "é", "😀", "\t", "\r\n"]
+
+
+def random_text(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 80)))
+
+
+def is_subsequence(text, source):
+    it = iter(source)
+    return all(char in it for char in text)
+
+
+def chunked(text, rng):
+    chunks, start = [], 0
+    while start < len(text):
+        size = rng.choice([1, 2, 3, 7, 64, 4096])
+        chunks.append(text[start:start + size])
+        start += size
+    return chunks
+
+
+def check_parity(texts, rng):
+    """
+    Returns:
+        dict: check -> number of failing texts
+    """
+    failures = {"legacy": 0, "streaming": 0, "fixed without URLs": 0, "blank lines": 0, "subsequence": 0}
+    for text in texts:
+        legacy = clean_markdown(text, "legacy")
+        fixed = clean_markdown(text, "fixed")
+        failures["legacy"] += legacy != reference_clean_markdown(text)
+        failures["streaming"] += any("".join(iter_clean_markdown(chunked(text, rng), pattern))
+                                     != clean_markdown(text, pattern) for pattern in ("legacy", "fixed"))
+        failures["fixed without URLs"] += "http" not in text and fixed != legacy
+        failures["blank lines"] += "\n\n" in fixed
+        failures["subsequence"] += not is_subsequence(fixed, text)
+    return failures
+
+
+def throughput(fn, pages, repeat):
+    """MB/s of fn over the pages (UTF-8 size)."""
+    total = sum(len(markdown.encode("utf-8")) for _, markdown in pages) * repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, markdown in pages:
+            fn(markdown)
+    return total / (time.perf_counter() - start) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown cleaning")
+    parser.add_argument("--corpus", default=None,
+                        help="Page cache directory or directory of .md/.txt files (default: synthetic pages)")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per page (default: 10)")
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="Random texts for the parity check (default: 20000)")
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = load_corpus(Path(args.corpus))
+        if not pages:
+            print(f"No pages found in {args.corpus}")
+            return
+        groups = [("corpus", pages)]
+    else:
+        groups = [(f"synthetic {size // 1000} KB", [(f"page{i}", synthetic_page(size, i)) for i in range(5)])
+                  for size in (5_000, 50_000, 1_000_000)]
+
+    variants = [
+        ("reference", reference_clean_markdown),
+        ("legacy", lambda md: clean_markdown(md, "legacy")),
+        ("fixed", lambda md: clean_markdown(md, "fixed")),
+        ("stream 4 KB", lambda md: "".join(iter_clean_markdown(
+            (md[i:i + 4096] for i in range(0, len(md), 4096)), "fixed"))),
+    ]
+    print(f"{'pages':<20}" + "".join(f"{name + ' MB/s':>18}" for name, _ in variants) + f"{'speedup':>10}")
+    rng = random.Random(0)
+    for label, pages in groups:
+        speeds = [throughput(fn, pages, args.repeat) for _, fn in variants]
+        print(f"{label:<20}" + "".join(f"{speed:>18.1f}" for speed in speeds) + f"{speeds[2] / speeds[0]:>9.1f}x")
+        failures = check_parity([markdown for _, markdown in pages], rng)
+        if any(failures.values()):
+            print(f"  parity failures: {failures}")
+
+    texts = [random_text(rng) for _ in range(args.samples)]
+    failures = check_parity(texts, rng)
+    print(f"\nrandom parity ({args.samples} texts): "
+          + ", ".join(f"{check} {'ok' if not count else f'{count} FAILED'}" for check, count in failures.items()))
+    kept = sum(len(clean_markdown(t, "fixed")) - len(clean_markdown(t, "legacy")) for t in texts)
+    print(f"characters kept by the fixed URL pattern that the legacy one removed: {kept}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the link extraction engines on a saved HTML corpus.
+
+The corpus is either a page cache directory (JSON entries written by
+page_cache.PageCache, which carry the page url) or a directory of .html files.
+For every page each engine is run --repeat times; the script reports the time
+per page and whether the engines produced identical links.
+
+Usage:
+    cd src
+    python benchmarks/bench_link_extraction.py --corpus page_cache
+    python benchmarks/bench_link_extraction.py --corpus saved_pages/ --url https://www.example.edu.cn/
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from link_extraction import ENGINES, extract_links, lxml  # noqa: E402
+
+
+def load_corpus(corpus_dir: Path, default_url: str):
+    """
+    Returns:
+        list: (name, url, html) tuples
+    """
+    pages = []
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix == ".json":
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("html"):
+                pages.append((path.name, entry.get("url") or default_url, entry["html"]))
+        elif path.suffix in (".html", ".htm"):
+            pages.append((path.name, default_url, path.read_text(encoding="utf-8", errors="replace")))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark link extraction engines")
+    parser.add_argument("--corpus", required=True, help="Page cache directory or directory of .html files")
+    parser.add_argument("--url", default="https://www.example.com/",
+                        help="Page/root url used for .html files (default: https://www.example.com/)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per page and engine (default: 3)")
+    args = parser.parse_args()
+
+    pages = load_corpus(Path(args.corpus), args.url)
+    if not pages:
+        print(f"No pages found in {args.corpus}")
+        return
+    engines = [name for name in ENGINES if name != "lxml" or lxml is not None]
+    total_mb = sum(len(html.encode("utf-8")) for _, _, html in pages) / 1e6
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB; engines: {', '.join(engines)}\n")
+
+    timings = {name: 0.0 for name in engines}
+    mismatches = []
+    for page_name, url, html in pages:
+        outputs = {}
+        for name in engines:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                outputs[name] = extract_links(html, url, url, engine=name)
+            timings[name] += (time.perf_counter() - start) / args.repeat
+        reference = outputs[engines[0]]
+        for name in engines[1:]:
+            if outputs[name] != reference:
+                mismatches.append((page_name, name, len(reference), len(outputs[name])))
+
+    for name in engines:
+        per_page = timings[name] / len(pages) * 1000
+        speedup = timings[engines[0]] / timings[name] if timings[name] else float("inf")
+        print(f"{name:>6}: {timings[name]:8.2f} s total, {per_page:8.2f} ms/page, {speedup:5.2f}x vs {engines[0]}")
+
+    if len(engines) > 1:
+        print(f"\nParity: {len(pages) - len({m[0] for m in mismatches})}/{len(pages)} pages identical")
+        for page_name, name, expected, got in mismatches[:20]:
+            print(f"  {page_name}: {engines[0]} found {expected} links, {name} found {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Measure screenshot preprocessing: bytes sent to the VLM and encoding time.
+
+Runs prepare_screenshot with several settings over saved screenshots (.png
+files, or the base64 screenshots of a page cache directory) and reports, per
+setting, the average size of the request images, the saving against the raw
+PNG and the preprocessing time. Without --corpus a synthetic full-page
+screenshot is used.
+
+Usage:
+    cd src
+    python benchmarks/bench_screenshots.py --corpus image_0
+    python benchmarks/bench_screenshots.py --corpus page_cache --max-side 1280
+"""
+
+import argparse
+import base64
+import io
+import json
+import random
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from screenshot_processing import VIEWPORT_HEIGHT, get_screenshot_options, prepare_screenshot  # noqa: E402
+
+
+def synthetic_screenshot(width=1280, height=6000, seed=0) -> bytes:
+    """A full-page-like PNG: white background, lines of text and a few noisy "photos"."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    y = 20
+    while y < height - 40:
+        if rng.random() < 0.08:
+            box_height = min(rng.randint(150, 400), height - y)
+            photo = Image.effect_noise((width - 120, box_height), rng.randint(40, 90)).convert("RGB")
+            image.paste(photo, (60, y))
+            y += box_height + 20
+        else:
+            words = " ".join("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9)))
+                             for _ in range(20))
+            draw.text((60, y), words, fill=(rng.randint(0, 80),) * 3)
+            y += 18
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def load_corpus(corpus_dir: Path):
+    """
+    Returns:
+        list: raw screenshot bytes
+    """
+    screenshots = []
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix == ".png":
+            screenshots.append(path.read_bytes())
+        elif path.suffix == ".json":
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("screenshot"):
+                screenshots.append(base64.b64decode(entry["screenshot"]))
+    return screenshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VLM screenshot preprocessing")
+    parser.add_argument("--corpus", default=None,
+                        help="Directory of .png screenshots or a page cache directory (default: synthetic page)")
+    parser.add_argument("--max-side", type=int, default=1568, help="Longest side for downscaling (default: 1568)")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG/WebP quality (default: 80)")
+    args = parser.parse_args()
+
+    screenshots = load_corpus(Path(args.corpus)) if args.corpus else [synthetic_screenshot()]
+    if not screenshots:
+        print(f"No screenshots found in {args.corpus}")
+        return
+
+    base = dict(get_screenshot_options(), max_side=None, format=None, crop="none", tile=False,
+                quality=args.quality, viewport_height=VIEWPORT_HEIGHT)
+    settings = [
+        ("raw png (unchanged)", {}),
+        (f"png, max side {args.max_side}", {"max_side": args.max_side}),
+        (f"jpeg q{args.quality}", {"format": "jpeg"}),
+        (f"jpeg q{args.quality}, max side {args.max_side}", {"format": "jpeg", "max_side": args.max_side}),
+        (f"webp q{args.quality}, max side {args.max_side}", {"format": "webp", "max_side": args.max_side}),
+        ("jpeg, first viewport", {"format": "jpeg", "max_side": args.max_side, "crop": "viewport"}),
+        ("jpeg, 4 viewport tiles", {"format": "jpeg", "max_side": args.max_side, "tile": True, "max_tiles": 4}),
+    ]
+
+    raw_bytes = sum(len(s) for s in screenshots) / len(screenshots)
+    print(f"{len(screenshots)} screenshots, {raw_bytes / 1e3:.0f} KB on average\n")
+    print(f"{'setting':<36}{'images':>8}{'KB sent':>10}{'saved':>8}{'ms':>8}")
+    for label, overrides in settings:
+        options = dict(base, **overrides)
+        try:
+            results = [prepare_screenshot(data, None, options) for data in screenshots]
+        except (OSError, KeyError) as e:  # e.g. Pillow built without WebP
+            print(f"{label:<36}  unavailable: {e}")
+            continue
+        sent = sum(r["sent_bytes"] for r in results) / len(results)
+        images = sum(len(r["images"]) for r in results) / len(results)
+        ms = sum(r["seconds"] for r in results) / len(results) * 1000
+        print(f"{label:<36}{images:>8.1f}{sent / 1e3:>10.0f}{1 - sent / raw_bytes:>8.0%}{ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Micro-benchmark of the calculate_understanding_score heuristics.
+
+Compares understanding_heuristics (precompiled patterns, Aho-Corasick keyword
+matching) with the original implementation, kept below as the reference, and
+checks that both give exactly the same scores:
+
+- on a corpus of pages: a page cache directory (the cleaned markdown of each
+  JSON entry) or a directory of .md/.txt files; synthetic pages of several
+  sizes when no corpus is given;
+- on random texts built from keywords, CJK, punctuation, markdown markers and
+  unusual characters, for both keyword matchers (Aho-Corasick and substring
+  scans).
+
+Usage:
+    cd src
+    python benchmarks/bench_understanding_heuristics.py
+    python benchmarks/bench_understanding_heuristics.py --corpus page_cache --repeat 20
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import understanding_heuristics  # noqa: E402
+from understanding_heuristics import (KEYWORD_GROUPS, KeywordMatcher, heuristic_scores,  # noqa: E402
+                                      special_cases_score)
+
+
+# Reference: the heuristics as originally written in CalculateUnderstandingScore
+
+def reference_text_quality(observation):
+    score = 0
+    length = len(observation)
+
+    if length < 100:
+        score += 0
+    elif 100 <= length < 500:
+        score += 5
+    elif 500 <= length < 5000:
+        score += 10
+    else:
+        score += 8
+
+    valid_chars = len(re.findall(r'[\u4e00-\u9fa5a-zA-Z0-9\s.,!?;:，。！？；：]', observation))
+    valid_ratio = valid_chars / max(length, 1)
+    score += valid_ratio * 10
+
+    has_headers = bool(re.search(r'^#+\s', observation, re.MULTILINE))
+    has_lists = bool(re.search(r'^\s*[-*]\s', observation, re.MULTILINE))
+    if has_headers:
+        score += 2.5
+    if has_lists:
+        score += 2.5
+
+    return min(score, 25)
+
+
+def reference_structure(observation, num_buttons=None):
+    score = 0
+
+    paragraphs = observation.split('\n\n')
+    num_paragraphs = len([p for p in paragraphs if len(p.strip()) > 50])
+    if num_paragraphs >= 3:
+        score += 5
+    elif num_paragraphs >= 1:
+        score += 3
+
+    if num_buttons is None:
+        score += 5
+    elif 5 <= num_buttons <= 30:
+        score += 10
+    elif 1 <= num_buttons < 5:
+        score += 5
+    elif num_buttons > 30:
+        score += 3
+
+    sentences = re.split(r'[。！？.!?]', observation)
+    valid_sentences = [s for s in sentences if len(s.strip()) > 20]
+    density = len(valid_sentences) / max(len(sentences), 1)
+    score += density * 5
+
+    return min(score, 20)
+
+
+def reference_special_cases(observation, url):
+    score = 15
+
+    url_lower = url.lower() if url else ""
+    obs_lower = observation.lower()
+
+    image_indicators = ['gallery', 'photo', 'image', '图片', '相册']
+    video_indicators = ['video', 'play', 'watch', '视频']
+    if any(kw in obs_lower or kw in url_lower for kw in image_indicators):
+        score -= 10
+    if any(kw in obs_lower or kw in url_lower for kw in video_indicators):
+        score -= 10
+
+    interactive_indicators = ['login', 'register', 'captcha', '登录', '注册', '验证码']
+    if any(kw in obs_lower for kw in interactive_indicators):
+        score -= 5
+
+    error_indicators = ['404', 'error', 'not found', '错误', '页面不存在']
+    if any(kw in obs_lower for kw in error_indicators):
+        score -= 15
+
+    viz_indicators = ['chart', 'graph', 'dashboard', '图表', '数据']
+    if any(kw in obs_lower for kw in viz_indicators):
+        score -= 8
+
+    return max(score, 0)
+
+
+def reference_scores(observation, url, num_buttons=None):
+    return (reference_text_quality(observation),
+            reference_structure(observation, num_buttons),
+            reference_special_cases(observation, url))
+
+
+# Corpus
+
+PAGE_WORDS = ("the admission office announces news for students 学院 新闻 招生 通知 公告 研究生 本科 "
+              "deadline application policy research faculty 2024 2025 contact").split()
+
+
+def synthetic_page(size, seed):
+    rng = random.Random(seed)
+    lines = []
+    while sum(len(line) + 2 for line in lines) < size:
+        line = " ".join(rng.choice(PAGE_WORDS) for _ in range(rng.randint(4, 16)))
+        kind = rng.random()
+        if kind < 0.05:
+            line = "## " + line
+        elif kind < 0.25:
+            line = "- " + line
+        lines.append(line + rng.choice([".", "。", "", "!", "？"]))
+    return "\n\n".join(lines)[:size]
+
+
+def load_corpus(corpus_dir: Path):
+    """
+    Returns:
+        list: (name, url, markdown) tuples
+    """
+    pages = []
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.suffix == ".json":
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                markdown = entry.get("clean_markdown") or entry.get("markdown")
+                if markdown:
+                    pages.append((path.name, entry.get("url", ""), markdown))
+        elif path.suffix in (".md", ".txt"):
+            pages.append((path.name, "", path.read_text(encoding="utf-8", errors="replace")))
+    return pages
+
+
+# Randomized parity
+
+KEYWORDS = [kw for _, keywords, _, _ in KEYWORD_GROUPS for kw in keywords]
+FRAGMENTS = KEYWORDS + ["PHOTO", "GaLLery", "Not Found", "watchart", "photograph", "İmage", "K", "ß",
+                        "# ", "## ", "- ", "* ", "  - ", "\n", "\n\n", " ", "\t", "　", "。", "！", "?",
+                        ".", ",", "；", "数据库", "图", "页面", "a", "Z", "9", "é", "😀", "<", ">", "|", "http://"]
+
+
+def random_text(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 120)))
+
+
+def check_random_parity(samples, seed=0):
+    """
+    Returns:
+        list: (matcher, text, url, expected, got) of every mismatch
+    """
+    rng = random.Random(seed)
+    matchers = {"substring": None}
+    if understanding_heuristics.ahocorasick is not None:
+        matchers["aho-corasick"] = understanding_heuristics._SPECIAL_CASES
+    # The substring-scan fallback, as used when pyahocorasick is not installed
+    saved = understanding_heuristics.ahocorasick
+    understanding_heuristics.ahocorasick = None
+    try:
+        matchers["substring"] = KeywordMatcher({name: kws for name, kws, _, _ in KEYWORD_GROUPS})
+    finally:
+        understanding_heuristics.ahocorasick = saved
+
+    mismatches = []
+    active = understanding_heuristics._SPECIAL_CASES
+    try:
+        for name, matcher in matchers.items():
+            understanding_heuristics._SPECIAL_CASES = matcher
+            for _ in range(samples):
+                text = random_text(rng)
+                url = random_text(rng) if rng.random() < 0.5 else ""
+                buttons = rng.choice([None, 0, 3, 10, 50])
+                expected = reference_scores(text, url, buttons)
+                got = heuristic_scores(text, url, buttons)
+                if expected != got:
+                    mismatches.append((name, text, url, expected, got))
+    finally:
+        understanding_heuristics._SPECIAL_CASES = active
+    return mismatches
+
+
+def time_per_call(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, url, markdown in pages:
+            fn(markdown, url, 12)
+    return (time.perf_counter() - start) / (repeat * len(pages)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the understanding score heuristics")
+    parser.add_argument("--corpus", default=None,
+                        help="Page cache directory or directory of .md/.txt files (default: synthetic pages)")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per page (default: 10)")
+    parser.add_argument("--samples", type=int, default=5000,
+                        help="Random texts for the parity check, per keyword matcher (default: 5000)")
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = load_corpus(Path(args.corpus))
+        if not pages:
+            print(f"No pages found in {args.corpus}")
+            return
+        groups = [("corpus", pages)]
+    else:
+        groups = [(f"synthetic {size // 1000} KB", [(f"page{i}", "https://www.example.edu.cn/news/",
+                                                    synthetic_page(size, i)) for i in range(5)])
+                  for size in (2_000, 20_000, 100_000)]
+
+    matcher = "aho-corasick" if understanding_heuristics.ahocorasick is not None else "substring scans"
+    print(f"Keyword matcher: {matcher}\n")
+    print(f"{'pages':<20}{'reference ms':>14}{'current ms':>12}{'speedup':>10}{'parity':>10}")
+    for label, pages in groups:
+        parity = all(reference_scores(md, url, 12) == heuristic_scores(md, url, 12) for _, url, md in pages)
+        reference_ms = time_per_call(reference_scores, pages, args.repeat)
+        current_ms = time_per_call(heuristic_scores, pages, args.repeat)
+        print(f"{label:<20}{reference_ms:>14.3f}{current_ms:>12.3f}{reference_ms / current_ms:>9.1f}x"
+              f"{'ok' if parity else 'DIFF':>10}")
+
+    special_ms = [time_per_call(lambda md, url, _: fn(md, url), groups[-1][1], args.repeat)
+                  for fn in (reference_special_cases, special_cases_score)]
+    print(f"\nspecial cases only ({groups[-1][0]}): {special_ms[0]:.3f} ms -> {special_ms[1]:.3f} ms")
+
+    mismatches = check_random_parity(args.samples)
+    print(f"random parity: {len(mismatches)} mismatches in {args.samples} texts per matcher")
+    for name, text, url, expected, got in mismatches[:5]:
+        print(f"  [{name}] {text!r} url={url!r}: expected {expected}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Long-lived pool of crawl4ai browsers shared by all page fetches.
+
+Launching Chromium takes several seconds, so instead of opening a fresh
+AsyncWebCrawler for every visit, a small number of crawlers are started once,
+leased out per fetch and recycled after a fixed number of pages or after
+repeated failures.
+
+Usage:
+    async with get_browser_pool().acquire() as lease:
+        result = await lease.crawler.arun(url, config=run_config)
+        if result.success:
+            lease.mark_succeeded()
+        else:
+            lease.mark_failed()
+"""
+
+import asyncio
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+# Pool defaults (can be changed with configure_browser_pool)
+POOL_SIZE = 2                  # Number of browsers kept alive
+MAX_PAGES_PER_BROWSER = 50     # Recycle a browser after this many pages
+MAX_CONSECUTIVE_FAILURES = 3   # Recycle a browser after this many failed fetches in a row
+
+
+class BrowserLease:
+    """A crawler checked out from the pool together with its usage counters."""
+
+    def __init__(self, crawler: AsyncWebCrawler):
+        self.crawler = crawler
+        self.pages = 0
+        self.failures = 0
+
+    def mark_failed(self):
+        """Record a failed fetch so that a broken browser gets recycled."""
+        self.failures += 1
+
+    def mark_succeeded(self):
+        """Record a successful fetch (failures only count when they happen in a row)."""
+        self.failures = 0
+
+
+class BrowserPool:
+    """
+    Pool of started AsyncWebCrawler instances bound to one event loop.
+
+    Args:
+        size (int): maximum number of browsers alive at the same time
+        max_pages (int): pages served by one browser before it is recycled
+        max_failures (int): consecutive failures before a browser is recycled
+        browser_config (BrowserConfig): configuration used to launch browsers
+    """
+
+    def __init__(self, size: int = None, max_pages: int = None, max_failures: int = None,
+                 browser_config: Optional[BrowserConfig] = None):
+        self.size = max(1, size or POOL_SIZE)
+        self.max_pages = max_pages or MAX_PAGES_PER_BROWSER
+        self.max_failures = max_failures or MAX_CONSECUTIVE_FAILURES
+        self.browser_config = browser_config or BrowserConfig(headless=True, verbose=False)
+        self._idle = deque()
+        self._live = 0
+        self._closed = False
+        # Notified when a browser is returned or retired, so that waiters can lease or launch one
+        self._available = asyncio.Condition()
+        self.stats = {"launched": 0, "recycled": 0, "leases": 0}
+
+    def _is_healthy(self, lease: BrowserLease) -> bool:
+        if lease.pages >= self.max_pages:
+            return False
+        if lease.failures >= self.max_failures:
+            return False
+        return getattr(lease.crawler, "ready", True) is not False
+
+    async def _launch(self) -> BrowserLease:
+        crawler = AsyncWebCrawler(config=self.browser_config)
+        await crawler.start()
+        self.stats["launched"] += 1
+        return BrowserLease(crawler)
+
+    async def _retire(self, lease: BrowserLease):
+        async with self._available:
+            self._live -= 1
+            self._available.notify()
+        self.stats["recycled"] += 1
+        try:
+            await lease.crawler.close()
+        except Exception as e:
+            print(f"[WARNING] Failed to close browser: {e}")
+
+    async def _checkout(self) -> BrowserLease:
+        while True:
+            async with self._available:
+                # Wait for an idle browser, or for room to launch one
+                while not self._idle and self._live >= self.size:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+                    await self._available.wait()
+                if self._closed:
+                    raise RuntimeError("Browser pool is closed")
+                lease = self._idle.popleft() if self._idle else None
+                if lease is None:
+                    self._live += 1
+            if lease is None:
+                try:
+                    return await self._launch()
+                except Exception:
+                    async with self._available:
+                        self._live -= 1
+                        self._available.notify()
+                    raise
+            if self._is_healthy(lease):
+                return lease
+            await self._retire(lease)
+
+    async def _checkin(self, lease: BrowserLease):
+        if self._closed or not self._is_healthy(lease):
+            await self._retire(lease)
+        else:
+            async with self._available:
+                self._idle.append(lease)
+                self._available.notify()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Lease a browser for one fetch; it is returned (or recycled) on exit.
+
+        An exception counts as a failed fetch. Callers mark the others with
+        lease.mark_failed() (unsuccessful result) or lease.mark_succeeded().
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        lease = await self._checkout()
+        self.stats["leases"] += 1
+        try:
+            yield lease
+        except BaseException:
+            lease.mark_failed()
+            raise
+        finally:
+            lease.pages += 1
+            await self._checkin(lease)
+
+    async def close(self):
+        """Close all idle browsers; leased ones are closed when returned."""
+        async with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            # Waiters raise instead of launching a new browser
+            self._available.notify_all()
+        for lease in idle:
+            await self._retire(lease)
+
+
+# One pool per event loop: asyncio browsers cannot be shared across loops.
+_POOLS = weakref.WeakKeyDictionary()
+_POOL_OPTIONS = {}
+
+
+def configure_browser_pool(size: int = None, max_pages: int = None, max_failures: int = None):
+    """
+    Set the options used for pools created after this call.
+
+    Args:
+        size (int): number of browsers kept alive
+        max_pages (int): pages per browser before recycling
+        max_failures (int): consecutive failures before recycling
+    """
+    if size is not None:
+        _POOL_OPTIONS["size"] = size
+    if max_pages is not None:
+        _POOL_OPTIONS["max_pages"] = max_pages
+    if max_failures is not None:
+        _POOL_OPTIONS["max_failures"] = max_failures
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Returns:
+        BrowserPool: the pool bound to the running event loop (created lazily)
+    """
+    loop = asyncio.get_running_loop()
+    pool = _POOLS.get(loop)
+    if pool is None or pool._closed:
+        pool = BrowserPool(**_POOL_OPTIONS)
+        _POOLS[loop] = pool
+    return pool
+
+
+async def close_browser_pool():
+    """Close the pool bound to the running event loop, if any."""
+    pool = _POOLS.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
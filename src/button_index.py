@@ -0,0 +1,203 @@
+"""
+Incremental button -> URL index of one agent session.
+
+Every visited page adds its links to the index instead of reloading and
+rewriting a JSON dictionary. Unlike a plain dict, a label that points to
+several URLs (e.g. "更多" on different sections) keeps all of them: the label
+itself opens the most recently discovered one, and "更多 #2" the second URL
+discovered for it. Unknown labels get suggestions (case-insensitive prefix or
+fuzzy match) instead of being resolved to a different button.
+"""
+
+import bisect
+import difflib
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+_NUMBERED = re.compile(r'^(.*) #(\d+)$', re.DOTALL)
+
+
+class ButtonIndex:
+    """
+    Button label -> URL index.
+
+    Labels and the urls of a label keep their first-discovery order (so that
+    numbered labels stay valid); get() returns the most recently discovered
+    URL of a label, which matches the old overwrite behaviour.
+    """
+
+    def __init__(self):
+        self._urls: Dict[str, List[str]] = {}   # label -> urls, in discovery order
+        self._recent: Dict[str, str] = {}        # label -> most recently discovered url
+        self._sorted_keys: List[str] = []        # sorted lowercase labels, for prefix search
+        self._by_lower: Dict[str, List[str]] = {}  # lowercase label -> labels
+
+    def add(self, label: str, url: str) -> bool:
+        """
+        Args:
+            label (str): button text
+            url (str): url the button points to
+
+        Returns:
+            bool: True if the label was not known before
+        """
+        urls = self._urls.get(label)
+        self._recent[label] = url
+        if urls is None:
+            self._urls[label] = [url]
+            lower = label.lower()
+            if lower not in self._by_lower:
+                self._by_lower[lower] = []
+                bisect.insort(self._sorted_keys, lower)
+            self._by_lower[lower].append(label)
+            return True
+        if url not in urls:
+            urls.append(url)
+        return False
+
+    def update(self, links: Iterable[Dict]):
+        """Add links of the form {'text': ..., 'url': ...}."""
+        for link in links:
+            self.add(link["text"], link["url"])
+
+    def get(self, label: str, default: Optional[str] = None) -> Optional[str]:
+        return self._recent.get(label, default)
+
+    def urls(self, label: str) -> List[str]:
+        """All urls discovered for a label, in discovery order."""
+        return list(self._urls.get(label, []))
+
+    def collisions(self) -> Dict[str, List[str]]:
+        """Labels that point to more than one url."""
+        return {label: list(urls) for label, urls in self._urls.items() if len(urls) > 1}
+
+    def find_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Args:
+            prefix (str): case-insensitive label prefix
+            limit (int): maximum number of labels returned
+
+        Returns:
+            list: matching labels
+        """
+        prefix = prefix.lower()
+        labels = []
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(prefix) or len(labels) >= limit:
+                break
+            labels.extend(self._by_lower[key])
+        return labels[:limit]
+
+    def find_fuzzy(self, text: str, limit: int = 5, cutoff: float = 0.6) -> List[str]:
+        """
+        Args:
+            text (str): approximate label
+            limit (int): maximum number of labels returned
+            cutoff (float): minimum similarity ratio (0-1)
+
+        Returns:
+            list: closest labels, best first
+        """
+        keys = difflib.get_close_matches(text.lower(), self._by_lower.keys(), n=limit, cutoff=cutoff)
+        return [label for key in keys for label in self._by_lower[key]][:limit]
+
+    def _base_label(self, label: str) -> Optional[str]:
+        if label in self._urls:
+            return label
+        labels = self._by_lower.get(label.lower())
+        if labels:
+            return labels[-1]
+        match = _NUMBERED.match(label)
+        if match and match.group(1) in self._urls:
+            return match.group(1)
+        return None
+
+    def resolve(self, label: str) -> Optional[str]:
+        """
+        Find the url of a label: exact match, then case-insensitive match,
+        then a numbered label ("label #2") for one of several urls of a label.
+
+        Returns:
+            str: the url or None (suggest() gives close labels)
+        """
+        base = self._base_label(label)
+        if base is None:
+            return None
+        if base == label or base.lower() == label.lower():
+            return self.get(base)
+        number = int(_NUMBERED.match(label).group(2))
+        urls = self._urls[base]
+        return urls[number - 1] if 1 <= number <= len(urls) else None
+
+    def alternatives(self, label: str, url: str) -> List[str]:
+        """
+        Args:
+            label (str): a label resolve() accepted
+            url (str): the url it resolved to
+
+        Returns:
+            list: numbered labels of the other urls of the same label (empty for a single url)
+        """
+        base = self._base_label(label)
+        urls = self._urls.get(base, []) if base is not None else []
+        if len(urls) < 2:
+            return []
+        return [f"{base} #{number}" for number, other in enumerate(urls, 1) if other != url]
+
+    def suggest(self, label: str, limit: int = 5) -> List[str]:
+        """
+        Args:
+            label (str): a label resolve() did not accept
+            limit (int): maximum number of labels returned
+
+        Returns:
+            list: labels starting with it (case-insensitive), then the closest ones
+        """
+        labels = self.find_prefix(label, limit=limit) if label else []
+        for similar in self.find_fuzzy(label, limit=limit):
+            if similar not in labels:
+                labels.append(similar)
+        return labels[:limit]
+
+    def to_dict(self) -> Dict[str, str]:
+        """Legacy {label: url} view."""
+        return dict(self._recent)
+
+    def to_json(self) -> Dict:
+        """{label: urls}, or {label: {"urls": urls, "recent": url}} when the most recent url is not the last one."""
+        data = {}
+        for label, urls in self._urls.items():
+            recent = self._recent[label]
+            data[label] = list(urls) if recent == urls[-1] else {"urls": list(urls), "recent": recent}
+        return data
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "ButtonIndex":
+        """Build an index from to_json() or legacy {label: url} data."""
+        index = cls()
+        for label, urls in data.items():
+            recent = None
+            if isinstance(urls, dict):
+                urls, recent = urls.get("urls", []), urls.get("recent")
+            for url in ([urls] if isinstance(urls, str) else urls):
+                index.add(label, url)
+            if recent:
+                index.add(label, recent)
+        return index
+
+    def keys(self) -> List[str]:
+        return list(self._urls)
+
+    def __contains__(self, label: str) -> bool:
+        return label in self._urls
+
+    def __getitem__(self, label: str) -> str:
+        return self._recent[label]
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._urls)
@@ -1,6 +1,10 @@
 import json
 import os
-from openai import OpenAI
+import sys
+
+# Share the pooled LLM clients of the src/ modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_clients import get_client
 
 # 读取配置（使用与app.py相同的配置）
 if 'DASHSCOPE_API_KEY' in os.environ:
@@ -36,10 +40,7 @@ else:
     # }
 
 # 初始化OpenAI客户端
-client = OpenAI(
-    api_key=llm_cfg['api_key'],
-    base_url=llm_cfg['model_server']
-)
+client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
 
 def classify_answer(question, answer, pred, reasoning, score):
     """
@@ -23,7 +23,26 @@ from tqdm import tqdm
 
 # Import VGems components
 from agent import VGems
-from utils import get_info
+from utils import (configure_limits, configure_screenshot_capture, fetch_page, screenshot_capture_report,
+                   screenshots_on_demand)
+from session import Session
+from browser_pool import configure_browser_pool, close_browser_pool
+from background_loop import shutdown_background_loop, submit
+from page_cache import configure_page_cache, get_page_cache
+from host_profiles import configure_host_profiles, get_host_profiles
+from link_extraction import configure_link_extractor
+from markdown_cleaning import configure_markdown_cleaning
+from llm_cache import CACHEABLE_CALL_SITES, configure_llm_cache, get_llm_cache
+from llm_clients import aclose_llm_clients, close_llm_clients, configure_llm_clients
+from llm_retry import configure_llm_retry
+from llm_trace import LLMTrace, configure_llm_prices, use_trace
+from page_chunking import configure_page_chunking, get_budget as get_chunk_budget
+from page_processing import configure_page_processing, shutdown_page_processing
+from prefetch import configure_prefetch, get_prefetcher
+from screenshot_processing import configure_screenshots, screenshot_report
+from static_fetch import aclose_static_clients, configure_fetch_tiers, fetch_tier_report
+from understanding_heuristics import configure_understanding_score, understanding_score_report
+from vlm_budget import configure_vlm, vlm_report
 
 # Import headless tools (this registers all tools without Streamlit dependencies)
 import tools_for_eval  # noqa: F401
@@ -33,6 +52,7 @@ DATASET_FILE = Path("generated_dataset/v_gems_qa.jsonl")
 RESULTS_DIR = Path("evaluation_results")
 RESULTS_FILE = RESULTS_DIR / "v_gems_answers.jsonl"
 CHECKPOINT_FILE = RESULTS_DIR / "eval_checkpoint.json"
+TRACES_DIR = RESULTS_DIR / "traces"  # per-question LLM call traces
 
 # VGems configuration
 LLM_CONFIG = {
@@ -50,9 +70,16 @@ MAX_ROUNDS = 100  # Maximum steps per query
 
 
 class VGemsEvaluator:
-    def __init__(self):
+    def __init__(self, snapshot_sessions: bool = False, async_agent: bool = False, pipeline_steps: bool = False,
+                 transcript_window: Optional[int] = None):
         self.dataset = []
+        self.snapshot_sessions = snapshot_sessions
+        self.async_agent = async_agent
+        self.pipeline_steps = pipeline_steps
+        self.transcript_window = transcript_window
         self.checkpoint = self.load_checkpoint()
+        self.finished_results = {}
+        self.next_position = 0
         RESULTS_DIR.mkdir(exist_ok=True)
 
     def load_checkpoint(self) -> Dict:
@@ -63,9 +90,37 @@ class VGemsEvaluator:
         return {"completed_indices": []}
 
     def save_checkpoint(self):
-        """Save checkpoint."""
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        """Save checkpoint (atomically, so a crash never leaves a truncated file)."""
+        tmp_file = CHECKPOINT_FILE.with_suffix(".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
             json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, CHECKPOINT_FILE)
+
+    def record_result(self, position: int, result: Dict):
+        """
+        Buffer a finished result and write all results that are next in dataset order.
+
+        With concurrent sessions results finish out of order; they are appended to the
+        results file (and marked completed in the checkpoint) strictly in order, each
+        line flushed to disk before the checkpoint references it.
+
+        Args:
+            position: Position of the question in the pending list
+            result: Result record to write
+        """
+        self.finished_results[position] = result
+        while self.next_position in self.finished_results:
+            result = self.finished_results.pop(self.next_position)
+            with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.checkpoint["completed_indices"].append(result["index"])
+            self.save_checkpoint()
+            self.next_position += 1
 
     def load_dataset(self, limit: Optional[int] = None):
         """Load questions from v_gems_qa.jsonl."""
@@ -106,77 +161,104 @@ class VGemsEvaluator:
         print(f"  Hard: {stats['hard']}")
         print()
 
-    def clean_session(self):
-        """Clean up session files between queries."""
-        # Clear BUTTON_URL_ADIC.json
-        with open("BUTTON_URL_ADIC.json", "w") as f:
-            json.dump({}, f)
-
-        # Clear nav_chain.json
-        with open("nav_chain.json", "w") as f:
-            json.dump([], f)
-
-        # Reset count
-        with open("count.txt", "w") as f:
-            f.write("0")
-
-        # Reset navigation step counter
-        with open("navigation_steps.txt", "w") as f:
-            f.write("0")
-
-    def count_navigation_steps(self) -> int:
+    def count_navigation_steps(self, session: Session) -> int:
         """
         Count the number of navigation steps (button clicks / page visits).
 
-        Reads navigation_steps.txt which is incremented by visit_page/visit_url tools.
+        The counter is incremented by the visit_page/visit_url tools.
 
         Returns:
             Number of button clicks/page navigations
         """
-        try:
-            with open("navigation_steps.txt", "r") as f:
-                steps = int(f.read().strip())
-            return steps
-        except Exception as e:
-            print(f"[WARNING] Failed to count navigation steps: {e}")
-            return 0
+        return session.navigation_steps
 
-    async def run_v_gems(self, question: str, root_url: str) -> tuple[Optional[str], int, bool, Optional[str]]:
+    def drive_agent(self, bot: VGems, messages: List[Dict]) -> Optional[str]:
+        """
+        Run the agent loop until it gives a final answer or runs out of rounds.
+
+        Args:
+            bot: Initialized VGems agent
+            messages: Initial messages
+
+        Returns:
+            The final answer, or None if none was given
+        """
+        iterations = 0
+        for response in bot.run(messages=messages, lang="zh"):
+            iterations += 1
+            answer = self.final_answer(response)
+            if answer is not None:
+                return answer
+            if iterations >= MAX_ROUNDS:
+                break
+        return None
+
+    async def adrive_agent(self, bot: VGems, messages: List[Dict]) -> Optional[str]:
+        """Async version of drive_agent, running the agent on the current event loop."""
+        iterations = 0
+        async for response in bot.arun(messages=messages, lang="zh"):
+            iterations += 1
+            answer = self.final_answer(response)
+            if answer is not None:
+                return answer
+            if iterations >= MAX_ROUNDS:
+                break
+        return None
+
+    @staticmethod
+    def final_answer(response: List[Dict]) -> Optional[str]:
+        """
+        Returns:
+            The answer if the last agent message is a final answer, else None
+        """
+        if len(response) > 0 and response[-1].get("role") == "assistant":
+            content = response[-1].get("content", "")
+            # Check if Final Answer is reached
+            if "Final Answer" in content or "最终答案" in content:
+                # Extract the answer
+                if "Final Answer:" in content:
+                    return content.split("Final Answer:", 1)[1].strip()
+                elif "最终答案：" in content:
+                    return content.split("最终答案：", 1)[1].strip()
+                else:
+                    return content
+        return None
+
+    async def run_v_gems(self, question: str, root_url: str, session: Session) -> tuple[Optional[str], int, bool, Optional[str]]:
         """
         Run VGems agent on a single question.
 
         Args:
             question: User question
             root_url: Starting website URL
+            session: Tool state of this run
 
         Returns:
             Tuple of (answer, steps, success, error_message)
         """
         try:
-            # Clean session files
-            self.clean_session()
-
-            # Set ROOT_URL
-            with open("ROOT_URL.txt", "w") as f:
-                f.write(root_url)
-
-            # Set query
-            with open("query.txt", "w") as f:
-                f.write(question)
+            # Fresh session state for this query
+            session.reset(root_url=root_url, query=question)
 
             # Initialize agent
             tools = ["visit_page", "visit_url", "url_stack", "count_usefulness",
                      "query_requirement", "calculate_understanding_score", "use_vlm_analysis"]
+            if get_chunk_budget():
+                tools.append("show_more")
 
             llm_cfg = LLM_CONFIG.copy()
             llm_cfg["query"] = question
             llm_cfg["action_count"] = MAX_ROUNDS
 
-            bot = VGems(llm=llm_cfg, function_list=tools)
+            bot = VGems(llm=llm_cfg, function_list=tools, session=session, pipeline_steps=self.pipeline_steps,
+                        transcript_window=self.transcript_window)
             bot._call_tool('query_requirement', action_input=json.dumps({"op": "set", "query": question}, ensure_ascii=False))
 
-            # Get initial page
-            html, markdown, screenshot = await get_info(root_url)
+            # Get initial page on the loop the tools fetch on, so they share one browser pool
+            if self.async_agent:
+                html, markdown, screenshot = await fetch_page(root_url)
+            else:
+                html, markdown, screenshot = await asyncio.wrap_future(submit(fetch_page(root_url)))
 
             # Check if initial page load failed
             if not html and "Error:" in markdown:
@@ -187,7 +269,7 @@ class VGemsEvaluator:
             if screenshot:
                 import base64
                 print("Saving initial screenshot...")
-                image_folder = "images/"
+                image_folder = session.image_folder
                 if not os.path.exists(image_folder):
                     os.makedirs(image_folder)
 
@@ -198,12 +280,14 @@ class VGemsEvaluator:
 
                 # Save screenshot info for VLM access
                 from tools_for_eval import save_screenshot_info
-                save_screenshot_info(image_path, root_url)
+                save_screenshot_info(image_path, root_url, session)
                 print(f"  ✓ Screenshot saved to {image_path}")
+            elif screenshots_on_demand():
+                session.set_screenshot(None, root_url)
 
-            # Extract buttons from initial page
-            from tools_for_eval import extract_links_with_text
-            buttons = extract_links_with_text(html, root_url)
+            # Extract buttons from initial page without blocking the loop the other questions run on
+            from tools_for_eval import aextract_links_with_text
+            buttons = await aextract_links_with_text(html, root_url, session)
 
             # Prepare initial message
             start_prompt = f"""query:
@@ -236,30 +320,16 @@ Each button is wrapped in a <button> tag
 
             messages = [{'role': 'user', 'content': start_prompt}]
 
-            # Run agent
-            iterations = 0
-            answer = None
-            for response in bot.run(messages=messages, lang="zh"):
-                iterations += 1
-                if len(response) > 0 and response[-1].get("role") == "assistant":
-                    content = response[-1].get("content", "")
-                    # Check if Final Answer is reached
-                    if "Final Answer" in content or "最终答案" in content:
-                        # Extract the answer
-                        if "Final Answer:" in content:
-                            answer = content.split("Final Answer:", 1)[1].strip()
-                        elif "最终答案：" in content:
-                            answer = content.split("最终答案：", 1)[1].strip()
-                        else:
-                            answer = content
-                        break
-
-                if iterations >= MAX_ROUNDS:
-                    break
+            if self.async_agent:
+                # Native async agent: tools and LLM calls are awaited on this event loop
+                answer = await self.adrive_agent(bot, messages)
+            else:
+                # Run agent (blocking, so it runs in a worker thread to let other sessions proceed)
+                answer = await asyncio.to_thread(self.drive_agent, bot, messages)
 
             # Calculate actual navigation steps (button clicks)
             # Steps = number of pages visited (excluding the initial root page)
-            steps = self.count_navigation_steps()
+            steps = self.count_navigation_steps(session)
 
             return answer, steps, True, None
 
@@ -268,7 +338,72 @@ Each button is wrapped in a <button> tag
             print(f"    ✗ Error: {error_msg}")
             return None, 0, False, error_msg
 
-    async def evaluate(self, limit: Optional[int] = None):
+    def save_trace(self, idx: int, trace: LLMTrace):
+        """Write the per-call LLM trace of one question to evaluation_results/traces/."""
+        TRACES_DIR.mkdir(parents=True, exist_ok=True)
+        with open(TRACES_DIR / f"question_{idx}.json", 'w', encoding='utf-8') as f:
+            json.dump({"index": idx, "calls": trace.calls, "totals": trace.totals()}, f, ensure_ascii=False, indent=2)
+
+    async def evaluate_item(self, idx: int, item: Dict, session: Session) -> Dict:
+        """
+        Run VGems on one dataset item.
+
+        Args:
+            idx: Index of the item in the dataset
+            item: Dataset item
+            session: Session object reused by the worker running this item
+
+        Returns:
+            Result record for the results file
+        """
+        question = item["question"]
+        ground_truth = item["answer"]
+        root_url = item["root_url"]
+        info = item.get("info", {})
+
+        print(f"\n{'='*80}")
+        print(f"[{idx + 1}/{len(self.dataset)}] Question: {question[:80]}...")
+        print(f"Root URL: {root_url}")
+        print(f"Type: {info.get('type')}, Difficulty: {info.get('difficulty_level')}, Domain: {info.get('domain')}")
+        print(f"{'='*80}")
+
+        # Run VGems, recording every LLM call it makes
+        with use_trace() as trace:
+            agent_answer, steps, success, error = await self.run_v_gems(question, root_url, session)
+        llm_totals = trace.totals()
+        self.save_trace(idx, trace)
+
+        if self.snapshot_sessions:
+            session.snapshot(str(RESULTS_DIR / "sessions" / f"question_{idx}"))
+
+        if success and agent_answer:
+            print(f"✓ Completed in {steps} steps")
+            print(f"Agent answer: {agent_answer[:200]}...")
+        else:
+            print(f"✗ Failed" + (f" - {error}" if error else ""))
+        print(f"LLM: {llm_totals['calls']} calls, {llm_totals['total_tokens']} tokens, "
+              f"{llm_totals['latency']:.1f}s" + (f", ${llm_totals['cost']:.4f}" if llm_totals['cost'] is not None else ""))
+
+        return {
+            "index": idx,
+            "question": question,
+            "answer": ground_truth,  # Ground truth answer (for evaluate.py)
+            "pred": agent_answer if agent_answer else "",  # Agent prediction (for evaluate.py)
+            "root_url": root_url,
+            "info": info,
+            "evaluation": {
+                "success": success,
+                "steps": steps,
+                "error": error,
+                "transcript": session.metrics.get("transcript"),
+                "understanding_score": session.metrics.get("understanding_score"),
+                "vlm": session.metrics.get("vlm"),
+                "llm": llm_totals
+            },
+            "timestamp": time.time()
+        }
+
+    async def evaluate(self, limit: Optional[int] = None, concurrency: int = 1):
         """Main evaluation function."""
         print("\n" + "="*80)
         print("VGems Evaluation on Generated Dataset")
@@ -290,60 +425,40 @@ Each button is wrapped in a <button> tag
 
         print(f"Already completed: {len(completed_indices)}")
         print(f"Pending: {len(pending_items)}")
+        print(f"Concurrency: {concurrency}")
         print(f"\nStarting evaluation...\n")
 
-        # Run evaluation
-        success_count = 0
-        fail_count = 0
-
-        for idx, item in tqdm(pending_items, desc="Evaluating"):
-            question = item["question"]
-            ground_truth = item["answer"]
-            root_url = item["root_url"]
-            info = item.get("info", {})
-
-            print(f"\n{'='*80}")
-            print(f"[{idx + 1}/{len(self.dataset)}] Question: {question[:80]}...")
-            print(f"Root URL: {root_url}")
-            print(f"Type: {info.get('type')}, Difficulty: {info.get('difficulty_level')}, Domain: {info.get('domain')}")
-            print(f"{'='*80}")
-
-            # Run VGems
-            agent_answer, steps, success, error = await self.run_v_gems(question, root_url)
-
-            if success and agent_answer:
-                success_count += 1
-                print(f"✓ Completed in {steps} steps")
-                print(f"Agent answer: {agent_answer[:200]}...")
-            else:
-                fail_count += 1
-                print(f"✗ Failed" + (f" - {error}" if error else ""))
-
-            # Save result
-            result = {
-                "index": idx,
-                "question": question,
-                "answer": ground_truth,  # Ground truth answer (for evaluate.py)
-                "pred": agent_answer if agent_answer else "",  # Agent prediction (for evaluate.py)
-                "root_url": root_url,
-                "info": info,
-                "evaluation": {
-                    "success": success,
-                    "steps": steps,
-                    "error": error
-                },
-                "timestamp": time.time()
-            }
-
-            with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(result, ensure_ascii=False) + '\n')
-
-            # Update checkpoint
-            self.checkpoint["completed_indices"].append(idx)
-            self.save_checkpoint()
-
-            # Small delay between queries
-            await asyncio.sleep(1)
+        # Run evaluation: each worker drives one agent session at a time
+        self.finished_results = {}
+        self.next_position = 0
+        counts = {"success": 0, "fail": 0}
+        queue = asyncio.Queue()
+        for position, (idx, item) in enumerate(pending_items):
+            queue.put_nowait((position, idx, item))
+        pbar = tqdm(total=len(pending_items), desc="Evaluating")
+
+        async def worker(slot: int):
+            # Sequential runs keep their screenshots in the working directory
+            session_dir = ""
+            if concurrency > 1:
+                session_dir = str(RESULTS_DIR / "sessions" / f"worker_{slot}")
+                os.makedirs(session_dir, exist_ok=True)
+            session = Session(workdir=session_dir)
+
+            while not queue.empty():
+                position, idx, item = queue.get_nowait()
+                result = await self.evaluate_item(idx, item, session)
+                counts["success" if result["evaluation"]["success"] and result["pred"] else "fail"] += 1
+                self.record_result(position, result)
+                pbar.update(1)
+
+                # Small delay between queries
+                if concurrency == 1:
+                    await asyncio.sleep(1)
+
+        await asyncio.gather(*(worker(slot) for slot in range(min(concurrency, len(pending_items)))))
+        pbar.close()
+        success_count, fail_count = counts["success"], counts["fail"]
 
         # Final summary
         total = len(pending_items)
@@ -364,14 +479,196 @@ async def main():
                        help='Limit number of questions to evaluate (for testing)')
     parser.add_argument('--max-rounds', type=int, default=100,
                        help='Maximum steps per query (default: 100)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='Number of questions evaluated at the same time (default: 1)')
+    parser.add_argument('--max-llm-calls', type=int, default=0,
+                       help='Maximum in-flight LLM calls across sessions, 0 for unbounded (default: 0)')
+    parser.add_argument('--max-fetches', type=int, default=0,
+                       help='Maximum in-flight page fetches across sessions, 0 for unbounded (default: 0)')
+    parser.add_argument('--per-host-fetches', type=int, default=None,
+                       help='Maximum concurrent fetches to the same host, 0 for unbounded '
+                            '(default: 2 with --concurrency above 1, unbounded otherwise)')
+    parser.add_argument('--host-interval', type=float, default=None,
+                       help='Minimum seconds between two fetches to the same host '
+                            '(default: 0.5 with --concurrency above 1, 0 otherwise)')
+    parser.add_argument('--snapshot-sessions', action='store_true',
+                       help='Write each question\'s final tool state to evaluation_results/sessions/question_<n>/')
+    parser.add_argument('--browser-pool-size', type=int, default=2,
+                       help='Number of browsers kept alive for page fetches (default: 2)')
+    parser.add_argument('--browser-max-pages', type=int, default=50,
+                       help='Recycle a browser after this many pages (default: 50)')
+    parser.add_argument('--page-cache', choices=['off', 'readwrite', 'replay'], default='off',
+                       help='Page cache mode: readwrite reuses pages cached by earlier runs (up to --page-cache-ttl '
+                            'old), replay only serves cached pages (default: off)')
+    parser.add_argument('--page-cache-dir', default='page_cache',
+                       help='Page cache directory (default: page_cache)')
+    parser.add_argument('--page-cache-ttl', type=float, default=24,
+                       help='Page cache entry lifetime in hours (default: 24)')
+    parser.add_argument('--link-extractor', choices=['auto', 'bs4', 'lxml'], default='auto',
+                       help='HTML link extraction engine; auto uses lxml when installed (default: auto)')
+    parser.add_argument('--async-agent', action='store_true',
+                       help='Run agents with the native async loop (VGems.arun) instead of one thread per session')
+    parser.add_argument('--pipeline-steps', action='store_true',
+                       help='Start the next planner call while the critic judges newly found information')
+    parser.add_argument('--transcript-window', type=int, default=0,
+                       help='Observations kept verbatim in the planner prompt, older ones are summarized; '
+                            '0 keeps everything (default: 0)')
+    parser.add_argument('--page-token-budget', type=int, default=0,
+                       help='Show only the page sections most relevant to the query within this many tokens '
+                            '(the agent gets a show_more tool for the rest), 0 for whole pages (default: 0)')
+    parser.add_argument('--llm-prices', default=None,
+                       help='JSON file with USD prices per 1M tokens, {"model": {"input": x, "output": y}}, '
+                            'to report the cost of each question')
+    parser.add_argument('--processing-workers', type=int, default=0,
+                       help='Worker processes for HTML parsing, markdown cleaning and scoring heuristics, '
+                            '0 to run inline (default: 0)')
+    parser.add_argument('--llm-max-connections', type=int, default=100,
+                       help='HTTP connections per LLM endpoint, shared by all sessions (default: 100)')
+    parser.add_argument('--llm-keepalive-connections', type=int, default=20,
+                       help='Idle HTTP connections kept open per LLM endpoint (default: 20)')
+    parser.add_argument('--no-http2', action='store_true',
+                       help='Do not use HTTP/2 for LLM calls even if the h2 package is installed')
+    parser.add_argument('--llm-cache', default='',
+                       help='Comma-separated LLM call sites whose replies are cached across revisits and reruns, '
+                            f'from {",".join(CACHEABLE_CALL_SITES)} (default: none)')
+    parser.add_argument('--llm-cache-path', default='llm_cache.sqlite',
+                       help='SQLite file of the LLM cache (default: llm_cache.sqlite)')
+    parser.add_argument('--llm-cache-size', type=int, default=100000,
+                       help='Cached LLM replies kept, least recently used are evicted (default: 100000)')
+    parser.add_argument('--llm-max-attempts', type=int, default=6,
+                       help='Attempts per LLM call; parse errors are resent once, other 4xx never (default: 6)')
+    parser.add_argument('--llm-retry-time', type=float, default=120,
+                       help='Seconds one LLM call may spend retrying, Retry-After included (default: 120)')
+    parser.add_argument('--llm-rate', type=float, default=0,
+                       help='LLM requests per second across all sessions, 0 for unbounded (default: 0)')
+    parser.add_argument('--llm-burst', type=int, default=0,
+                       help='LLM requests sent at once after an idle period, 0 for the rate (default: 0)')
+    parser.add_argument('--understanding-relevance', choices=['llm', 'short_circuit', 'lexical'], default='llm',
+                       help='Relevance part of calculate_understanding_score: always ask the LLM, ask it only when '
+                            'the heuristics leave the decision open, or use the local lexical estimate (default: llm)')
+    parser.add_argument('--relevance-fallback', choices=['default', 'lexical'], default='default',
+                       help='Relevance when the LLM call fails: 20 points or the lexical estimate (default: default)')
+    parser.add_argument('--understanding-thresholds', default='40,60,80',
+                       help='Comma-separated understanding scores at which the recommendation changes, '
+                            'used by short_circuit (default: 40,60,80)')
+    parser.add_argument('--screenshot-max-side', type=int, default=0,
+                       help='Downscale VLM screenshots to this many pixels on the longer side, 0 to keep (default: 0)')
+    parser.add_argument('--screenshot-format', choices=['png', 'jpeg', 'webp'], default='png',
+                       help='Re-encode VLM screenshots; png sends them unchanged (default: png)')
+    parser.add_argument('--screenshot-quality', type=int, default=80,
+                       help='JPEG/WebP quality of VLM screenshots (default: 80)')
+    parser.add_argument('--screenshot-crop', choices=['none', 'viewport', 'focus'], default='none',
+                       help='Crop VLM screenshots to the first screen or to the requested focus area (default: none)')
+    parser.add_argument('--screenshot-tiles', type=int, default=0,
+                       help='Send tall pages as up to this many screen-high tiles in one request, 0 for one image '
+                            '(default: 0)')
+    parser.add_argument('--screenshot-capture', choices=['eager', 'on_demand'], default='eager',
+                       help='Take a screenshot on every page visit, or only when use_vlm_analysis needs one '
+                            '(default: eager)')
+    parser.add_argument('--vlm-max-calls', type=int, default=15,
+                       help='VLM requests allowed per question (default: 15)')
+    parser.add_argument('--vlm-batch-pages', type=int, default=1,
+                       help='Analyze the screenshots of up to this many pages visited since their last analysis '
+                            'in one VLM request, 1 for the current page only (default: 1)')
+    parser.add_argument('--vlm-max-images', type=int, default=8,
+                       help='Images per VLM request, pages and tiles together (default: 8)')
+    parser.add_argument('--prefetch', type=int, default=0,
+                       help='Prefetch the K links of each visited page sharing most terms with the query into '
+                            'the page cache while the LLM decides, 0 to disable (default: 0)')
+    parser.add_argument('--prefetch-inflight', type=int, default=4,
+                       help='Prefetches running at the same time (default: 4)')
+    parser.add_argument('--fetch-tier', choices=['browser', 'auto'], default='browser',
+                       help='Fetch every page with the browser, or try plain HTTP first for pages needed without '
+                            'a screenshot (default: browser)')
+    parser.add_argument('--static-min-text', type=int, default=200,
+                       help='Text characters below which an HTTP-fetched page is fetched again with the browser '
+                            '(default: 200)')
+    parser.add_argument('--host-profiles', default='',
+                       help='JSON file of per-host fetch profiles (latencies, failures, wait strategy, tier) used to '
+                            'adapt timeouts and skip dead hosts across runs, e.g. host_profiles.json (default: off)')
+    parser.add_argument('--markdown-urls', choices=['fixed', 'legacy'], default='fixed',
+                       help='URL pattern removed from page markdown: fixed keeps the punctuation around URLs, '
+                            'legacy reproduces the original cleaning (default: fixed)')
     args = parser.parse_args()
+    llm_cache_sites = [site.strip() for site in args.llm_cache.split(',') if site.strip()]
+    unknown_sites = set(llm_cache_sites) - set(CACHEABLE_CALL_SITES)
+    if unknown_sites:
+        parser.error(f"--llm-cache: unknown call sites {', '.join(sorted(unknown_sites))}")
+    if args.prefetch and args.page_cache != 'readwrite':
+        parser.error("--prefetch needs --page-cache readwrite")
+    if args.fetch_tier == 'auto' and args.screenshot_capture == 'eager':
+        # Eager capture takes a screenshot on every visit, and screenshots need the browser
+        parser.error("--fetch-tier auto needs --screenshot-capture on_demand")
 
     global MAX_ROUNDS
     MAX_ROUNDS = args.max_rounds
 
+    configure_browser_pool(size=args.browser_pool_size, max_pages=args.browser_max_pages)
+    # Per-host politeness only matters when sessions fetch at the same time; one session keeps
+    # the original fetch timing
+    if args.per_host_fetches is None:
+        args.per_host_fetches = 2 if args.concurrency > 1 else 0
+    if args.host_interval is None:
+        args.host_interval = 0.5 if args.concurrency > 1 else 0.0
+    configure_limits(
+        max_llm_calls=args.max_llm_calls or None,
+        max_fetches=args.max_fetches or None,
+        per_host=args.per_host_fetches or None,
+        host_interval=args.host_interval,
+    )
+    configure_page_cache(mode=args.page_cache, cache_dir=args.page_cache_dir,
+                         ttl=args.page_cache_ttl * 3600)
+    configure_link_extractor(args.link_extractor)
+    if args.llm_prices:
+        with open(args.llm_prices, 'r', encoding='utf-8') as f:
+            configure_llm_prices(json.load(f))
+    configure_page_chunking(args.page_token_budget)
+    configure_page_processing(args.processing_workers)
+    configure_screenshots(max_side=args.screenshot_max_side, image_format=args.screenshot_format,
+                          quality=args.screenshot_quality, crop=args.screenshot_crop,
+                          tile=args.screenshot_tiles > 0, max_tiles=args.screenshot_tiles or None)
+    configure_screenshot_capture(args.screenshot_capture)
+    configure_vlm(max_calls=args.vlm_max_calls, max_images=args.vlm_max_images, batch_pages=args.vlm_batch_pages)
+    configure_prefetch(top_k=args.prefetch, max_inflight=args.prefetch_inflight)
+    configure_fetch_tiers(tier=args.fetch_tier, min_text=args.static_min_text)
+    configure_host_profiles(args.host_profiles)
+    configure_markdown_cleaning(args.markdown_urls)
+    configure_understanding_score(mode=args.understanding_relevance, fallback=args.relevance_fallback,
+                                  thresholds=[float(t) for t in args.understanding_thresholds.split(',') if t.strip()])
+    configure_llm_clients(max_connections=args.llm_max_connections,
+                          max_keepalive_connections=args.llm_keepalive_connections,
+                          http2=False if args.no_http2 else None)
+    configure_llm_cache(call_sites=llm_cache_sites, path=args.llm_cache_path, max_entries=args.llm_cache_size)
+    configure_llm_retry(max_attempts=args.llm_max_attempts, max_total_time=args.llm_retry_time,
+                        requests_per_second=args.llm_rate or None, burst=args.llm_burst or None)
+
     # Run evaluation
-    evaluator = VGemsEvaluator()
-    await evaluator.evaluate(limit=args.limit)
+    evaluator = VGemsEvaluator(snapshot_sessions=args.snapshot_sessions, async_agent=args.async_agent,
+                               pipeline_steps=args.pipeline_steps,
+                               transcript_window=args.transcript_window or None)
+    try:
+        await evaluator.evaluate(limit=args.limit, concurrency=max(1, args.concurrency))
+    finally:
+        get_prefetcher().cancel()
+        await close_browser_pool()
+        shutdown_background_loop()
+        shutdown_page_processing()
+        await aclose_llm_clients()
+        await aclose_static_clients()
+        close_llm_clients()
+        print(get_page_cache().summary())
+        print(fetch_tier_report())
+        if get_host_profiles().enabled:
+            get_host_profiles().save()
+            print(get_host_profiles().summary())
+        if args.prefetch:
+            print(get_prefetcher().summary())
+        if get_llm_cache().enabled:
+            print(get_llm_cache().summary())
+        print(understanding_score_report())
+        print(screenshot_capture_report())
+        print(screenshot_report())
+        print(vlm_report())
 
 
 if __name__ == "__main__":
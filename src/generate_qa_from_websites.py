@@ -27,19 +27,26 @@ Output format:
 }
 """
 
+import argparse
 import asyncio
 import json
 import random
 import re
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai import CrawlerRunConfig, CacheMode
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import time
-from openai import OpenAI
 from tqdm import tqdm
 
+from browser_pool import close_browser_pool, get_browser_pool
+from page_cache import configure_page_cache, get_page_cache
+from llm_clients import close_llm_clients, get_client
+from llm_trace import traced_create, use_trace
+from page_processing import configure_page_processing, run_cpu_async, shutdown_page_processing
+from utils import clean_markdown
+
 # Configuration
 LLM_CONFIG = {
     'model': 'qwen3-coder-plus',
@@ -68,10 +75,39 @@ QA_FILE = OUTPUT_DIR / "v_gems_qa.jsonl"
 CHECKPOINT_FILE = OUTPUT_DIR / "checkpoint.json"
 
 # Initialize OpenAI client for LLM calls
-client = OpenAI(
-    api_key=LLM_CONFIG['api_key'],
-    base_url=LLM_CONFIG['base_url']
-)
+client = get_client(LLM_CONFIG['api_key'], LLM_CONFIG['base_url'])
+
+
+def collect_internal_links(html: str, current_url: str, root_url: str) -> List[Tuple[str, str]]:
+    """
+    Args:
+        html: Page html
+        current_url: Page URL (for resolving relative links)
+        root_url: Website URL (only links on its domain are kept)
+
+    Returns:
+        List of (url, button_text) for the followable internal links of the page
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    links = []  # [(url, button_text), ...]
+
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        full_url = urljoin(current_url, href)
+
+        # Only follow internal links (same domain)
+        if urlparse(full_url).netloc == urlparse(root_url).netloc:
+            # Avoid common non-content links
+            if not any(skip in full_url.lower() for skip in
+                      ['login', 'logout', 'register', 'download',
+                       '.pdf', '.zip', '.jpg', '.png', '#']):
+                # Get link text (button text)
+                button_text = link.get_text(strip=True)
+                if not button_text:
+                    button_text = "Read more"  # Default text for links without text
+                links.append((full_url, button_text))
+
+    return links
 
 
 class QAGenerator:
@@ -193,75 +229,68 @@ class QAGenerator:
         Returns:
             Tuple of (final_url, page_content, golden_path) or None if navigation fails
         """
-        browser_config = BrowserConfig(
-            headless=True,
-            verbose=False
-        )
-
         run_config = CrawlerRunConfig(
             cache_mode=CacheMode.BYPASS,
             wait_until="domcontentloaded",
             page_timeout=30000
         )
-
-        async with AsyncWebCrawler(config=browser_config) as crawler:
-            current_url = root_url
-            path_steps = ["root"]  # Track the golden path
-
-            for depth in range(target_depth):
-                try:
-                    # Fetch current page
-                    result = await crawler.arun(
-                        url=current_url,
-                        config=run_config
-                    )
+        page_cache = get_page_cache()
+
+        current_url = root_url
+        path_steps = ["root"]  # Track the golden path
+
+        for depth in range(target_depth):
+            try:
+                # Fetch current page (served from the page cache when possible)
+                cached = page_cache.get(current_url)
+                if cached:
+                    html, markdown = cached["html"], cached["markdown"]
+                elif page_cache.read_only:
+                    return None
+                else:
+                    async with get_browser_pool().acquire() as lease:
+                        result = await lease.crawler.arun(
+                            url=current_url,
+                            config=run_config
+                        )
+                        if result.success:
+                            lease.mark_succeeded()
+                        else:
+                            lease.mark_failed()
 
                     if not result.success:
                         return None
 
-                    # If this is the target depth, return the content
-                    if depth == target_depth - 1:
-                        golden_path = "->".join(path_steps)
-                        return (current_url, result.markdown, golden_path)
-
-                    # Extract all internal links with their text
-                    soup = BeautifulSoup(result.html, 'html.parser')
-                    links = []  # [(url, button_text), ...]
-
-                    for link in soup.find_all('a', href=True):
-                        href = link['href']
-                        full_url = urljoin(current_url, href)
-
-                        # Only follow internal links (same domain)
-                        if urlparse(full_url).netloc == urlparse(root_url).netloc:
-                            # Avoid common non-content links
-                            if not any(skip in full_url.lower() for skip in
-                                      ['login', 'logout', 'register', 'download',
-                                       '.pdf', '.zip', '.jpg', '.png', '#']):
-                                # Get link text (button text)
-                                button_text = link.get_text(strip=True)
-                                if not button_text:
-                                    button_text = "Read more"  # Default text for links without text
-                                links.append((full_url, button_text))
-
-                    if not links:
-                        # No more links to follow, return current page
-                        golden_path = "->".join(path_steps)
-                        return (current_url, result.markdown, golden_path)
-
-                    # Randomly select next link
-                    next_url, button_text = random.choice(links)
-                    path_steps.append(button_text[:50])  # Limit button text length
-                    current_url = next_url
-
-                    # Small delay
+                    html, markdown = result.html, str(result.markdown)
+                    page_cache.put(current_url, html, markdown, await run_cpu_async(clean_markdown, markdown))
+
+                # If this is the target depth, return the content
+                if depth == target_depth - 1:
+                    golden_path = "->".join(path_steps)
+                    return (current_url, markdown, golden_path)
+
+                # Extract all internal links with their text (in the page processing pool)
+                links = await run_cpu_async(collect_internal_links, html, current_url, root_url)
+
+                if not links:
+                    # No more links to follow, return current page
+                    golden_path = "->".join(path_steps)
+                    return (current_url, markdown, golden_path)
+
+                # Randomly select next link
+                next_url, button_text = random.choice(links)
+                path_steps.append(button_text[:50])  # Limit button text length
+                current_url = next_url
+
+                # Small delay (only needed when the site was actually hit)
+                if not cached:
                     await asyncio.sleep(0.5)
 
-                except Exception as e:
-                    print(f"    ✗ Navigation error at depth {depth}: {e}")
-                    return None
+            except Exception as e:
+                print(f"    ✗ Navigation error at depth {depth}: {e}")
+                return None
 
-            return None
+        return None
 
     def generate_qa_with_llm(self, content: str, difficulty: str, domain: str, language: str, is_multi_source: bool = False) -> Optional[Dict]:
         """
@@ -433,7 +462,8 @@ Web page content:
 """
 
         try:
-            response = client.chat.completions.create(
+            response = traced_create(
+                client, 'qa_generation',
                 model=LLM_CONFIG['model'],
                 messages=[
                     {"role": "user", "content": prompt}
@@ -650,11 +680,12 @@ Web page content:
         # Load websites
         self.load_websites()
 
-        # Generate single-source QA pairs
-        await self.generate_single_source_qa()
+        with use_trace() as trace:
+            # Generate single-source QA pairs
+            await self.generate_single_source_qa()
 
-        # Generate multi-source QA pairs
-        await self.generate_multi_source_qa()
+            # Generate multi-source QA pairs
+            await self.generate_multi_source_qa()
 
         # Summary
         print("\n" + "="*80)
@@ -672,13 +703,35 @@ Web page content:
             sum(self.checkpoint["multi_source_generated"].values())
         )
         print(f"\nTotal QA pairs: {total_generated}/680")
+        llm = trace.totals()
+        print(f"LLM usage: {llm['calls']} calls, {llm['prompt_tokens']} prompt + "
+              f"{llm['completion_tokens']} completion tokens, {llm['errors']} errors")
         print(f"\nResults saved to: {QA_FILE}")
         print("="*80 + "\n")
 
 
 async def main():
+    parser = argparse.ArgumentParser(description='Generate the VGems QA dataset')
+    parser.add_argument('--page-cache', choices=['off', 'readwrite', 'replay'], default='off',
+                       help='Page cache mode: readwrite reuses pages cached by earlier runs (up to 24h old), '
+                            'replay only serves cached pages (default: off)')
+    parser.add_argument('--page-cache-dir', default='page_cache',
+                       help='Page cache directory (default: page_cache)')
+    parser.add_argument('--processing-workers', type=int, default=0,
+                       help='Worker processes for HTML parsing and markdown cleaning, 0 to run inline (default: 0)')
+    args = parser.parse_args()
+
+    configure_page_cache(mode=args.page_cache, cache_dir=args.page_cache_dir)
+    configure_page_processing(args.processing_workers)
+
     generator = QAGenerator()
-    await generator.run()
+    try:
+        await generator.run()
+    finally:
+        await close_browser_pool()
+        shutdown_page_processing()
+        close_llm_clients()
+        print(get_page_cache().summary())
 
 
 if __name__ == "__main__":
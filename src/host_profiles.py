@@ -0,0 +1,241 @@
+"""
+Per-host fetch profiles, kept across runs.
+
+get_info used the same settings for every site (30 s page timeout,
+wait_until="domcontentloaded", 45 s overall timeout), although some target
+sites answer in a second and others always time out. With a profile store,
+every fetch records its host's outcome, and the next fetch of that host uses:
+
+- timeouts from the observed latencies: 3x the 95th percentile of the last
+  successful browser fetches, between MIN_PAGE_TIMEOUT and MAX_PAGE_TIMEOUT
+  (the fixed defaults until MIN_SAMPLES fetches are known);
+- the wait strategy that gives content: a host whose pages mostly load
+  without text with "domcontentloaded" moves to "load", then "networkidle";
+- the fetch tier that worked (static HTTP or the browser, see static_fetch);
+- fail fast: after DEAD_AFTER failures in a row the host is not fetched for
+  RETRY_AFTER seconds, then one fetch probes it again.
+
+Profiles are saved as one JSON file (written atomically; with several
+processes the last writer wins).
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+WAIT_STRATEGIES = ("domcontentloaded", "load", "networkidle")
+
+PAGE_TIMEOUT = 30.0       # seconds, the browser page timeout of an unknown host
+OVERALL_MARGIN = 15.0     # seconds added to the page timeout for the whole fetch
+MIN_PAGE_TIMEOUT = 10.0
+MAX_PAGE_TIMEOUT = 60.0
+MIN_SAMPLES = 5           # latencies needed before the timeout adapts
+MAX_SAMPLES = 50          # latencies kept per host
+DEAD_AFTER = 3            # failures in a row after which a host is skipped
+RETRY_AFTER = 600.0       # seconds a dead host is skipped before it is probed again
+SAVE_EVERY = 20           # recorded fetches between two saves
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _new_profile() -> Dict:
+    return {
+        "latencies": [],            # seconds of the last successful browser fetches
+        "fetches": 0,
+        "failures": 0,
+        "timeouts": 0,
+        "consecutive_failures": 0,
+        "last_failure": 0.0,
+        "wait_until": WAIT_STRATEGIES[0],
+        "waits": {},                # strategy -> [successful fetches, those with enough text]
+        "tier": None,               # "http" or "browser" (needs JavaScript), None if unknown
+        "updated_at": 0.0,
+    }
+
+
+class HostProfiles:
+    """
+    Store of per-host fetch profiles (thread-safe).
+
+    Args:
+        path (str | Path): JSON file, None to keep the profiles in memory only
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.stats = {"adapted": 0, "fail_fast": 0, "probes": 0}
+        self._hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if self.path is not None and self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._hosts = json.load(f).get("hosts", {})
+            except (OSError, ValueError) as e:
+                print(f"[WARNING] Failed to load host profiles from {self.path}: {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def fail_fast(self, url: str) -> Optional[str]:
+        """
+        Returns:
+            str: why url's host should not be fetched now, None to fetch it
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            profile = self._hosts.get(host_of(url))
+            if not profile or profile["consecutive_failures"] < DEAD_AFTER:
+                return None
+            since = time.time() - profile["last_failure"]
+            if since >= RETRY_AFTER:
+                # Half-open: let this fetch probe the host; it is skipped again if it fails
+                profile["last_failure"] = time.time()
+                self.stats["probes"] += 1
+                return None
+            self.stats["fail_fast"] += 1
+            return (f"Host {host_of(url)} failed {profile['consecutive_failures']} times in a row, "
+                    f"skipped for {RETRY_AFTER - since:.0f} s")
+
+    def fetch_settings(self, url: str) -> Dict:
+        """
+        Returns:
+            dict: page_timeout (ms), timeout (s, whole fetch) and wait_until for url's host
+        """
+        page_timeout, wait_until = PAGE_TIMEOUT, WAIT_STRATEGIES[0]
+        if self.enabled:
+            with self._lock:
+                profile = self._hosts.get(host_of(url))
+                if profile:
+                    wait_until = profile["wait_until"]
+                    if len(profile["latencies"]) >= MIN_SAMPLES:
+                        page_timeout = min(MAX_PAGE_TIMEOUT,
+                                           max(MIN_PAGE_TIMEOUT, 3 * percentile(profile["latencies"], 95)))
+                    if page_timeout != PAGE_TIMEOUT or wait_until != WAIT_STRATEGIES[0]:
+                        self.stats["adapted"] += 1
+        return {"page_timeout": int(page_timeout * 1000), "timeout": page_timeout + OVERALL_MARGIN,
+                "wait_until": wait_until}
+
+    def tier(self, url: str) -> Optional[str]:
+        with self._lock:
+            profile = self._hosts.get(host_of(url))
+            return profile["tier"] if profile else None
+
+    def record_tier(self, url: str, tier: str):
+        """Remember the fetch tier that worked for url's host ("http" or "browser")."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._hosts.setdefault(host_of(url), _new_profile())["tier"] = tier
+        self._changed()
+
+    def record(self, url: str, seconds: float, ok: bool, wait_until: str = None, has_content: bool = True,
+               timeout: bool = False):
+        """
+        Record the outcome of a fetch.
+
+        Args:
+            url (str): fetched url
+            seconds (float): fetch duration
+            ok (bool): whether the page was fetched
+            wait_until (str): wait strategy of a browser fetch, None for other tiers
+            has_content (bool): whether the fetched page had enough text
+            timeout (bool): whether the fetch timed out
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            profile = self._hosts.setdefault(host_of(url), _new_profile())
+            profile["fetches"] += 1
+            profile["updated_at"] = time.time()
+            if ok:
+                profile["consecutive_failures"] = 0
+                if wait_until:
+                    profile["latencies"] = (profile["latencies"] + [round(seconds, 3)])[-MAX_SAMPLES:]
+            else:
+                profile["failures"] += 1
+                profile["timeouts"] += timeout
+                profile["consecutive_failures"] += 1
+                profile["last_failure"] = time.time()
+            if wait_until and ok:
+                counts = profile["waits"].setdefault(wait_until, [0, 0])
+                counts[0] += 1
+                counts[1] += has_content
+                # Wait longer on hosts whose pages mostly load without text
+                position = WAIT_STRATEGIES.index(wait_until)
+                if (wait_until == profile["wait_until"] and position + 1 < len(WAIT_STRATEGIES)
+                        and counts[0] >= 3 and counts[1] / counts[0] < 0.5):
+                    profile["wait_until"] = WAIT_STRATEGIES[position + 1]
+        self._changed()
+
+    def _changed(self):
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= SAVE_EVERY
+        if due:
+            self.save()
+
+    def save(self):
+        """Write the profiles to the JSON file."""
+        if not self.enabled:
+            return
+        with self._lock:
+            data = json.dumps({"hosts": self._hosts}, ensure_ascii=False, indent=1)
+            self._unsaved = 0
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[WARNING] Failed to save host profiles to {self.path}: {e}")
+
+    def summary(self) -> str:
+        with self._lock:
+            hosts = len(self._hosts)
+            dead = sum(1 for p in self._hosts.values() if p["consecutive_failures"] >= DEAD_AFTER)
+            slow_wait = sum(1 for p in self._hosts.values() if p["wait_until"] != WAIT_STRATEGIES[0])
+        return (f"host profiles ({self.path}): {hosts} hosts, {dead} failing, {slow_wait} with a longer wait; "
+                f"{self.stats['adapted']} fetches with adapted settings, {self.stats['fail_fast']} skipped, "
+                f"{self.stats['probes']} probes")
+
+
+_host_profiles = HostProfiles()
+
+
+def configure_host_profiles(path=None) -> HostProfiles:
+    """
+    Args:
+        path (str | Path): JSON file of the profiles, None or "" to disable them
+
+    Returns:
+        HostProfiles: the new process-wide store
+    """
+    global _host_profiles
+    _host_profiles.save()
+    _host_profiles = HostProfiles(path or None)
+    return _host_profiles
+
+
+def get_host_profiles() -> HostProfiles:
+    """
+    Returns:
+        HostProfiles: the process-wide store (disabled unless configured)
+    """
+    return _host_profiles
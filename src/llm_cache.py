@@ -0,0 +1,202 @@
+"""
+Persistent cache of LLM replies for deterministic-in-purpose call sites.
+
+Information extraction and relevance scoring send the same (query, page)
+prompt again whenever an agent revisits a URL, and again on every rerun over
+the same dataset. With the cache enabled for a call site, the reply is stored
+in SQLite under the SHA-256 of the model, the messages (system and user
+prompts) and the other request parameters, and served from there next time.
+
+Only call sites listed in `call_sites` are cached (planner and critic replies
+depend on the whole trajectory and are normally left out). Once the cache holds
+more than `max_entries` replies, the least recently used ones are evicted. The
+database may be shared by several processes.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+CACHE_PATH = Path("llm_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 100_000
+CACHEABLE_CALL_SITES = ("extraction", "understanding_relevance", "critic")
+
+
+def request_key(params: Dict) -> str:
+    """
+    Args:
+        params (dict): chat.completions.create parameters (model, messages, ...)
+
+    Returns:
+        str: SHA-256 of the canonical JSON of the parameters
+    """
+    data = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed LRU cache of LLM replies (thread-safe).
+
+    Args:
+        path (str | Path): database file
+        max_entries (int): number of replies above which the least recently used are evicted
+        call_sites (iterable): call sites whose replies are cached; empty disables the cache
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 call_sites: Iterable[str] = ()):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.call_sites = frozenset(call_sites)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._entries = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.call_sites)
+
+    def caches(self, call_site: str) -> bool:
+        return call_site in self.call_sites
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with the lock held
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS replies (
+                                key TEXT PRIMARY KEY,
+                                call_site TEXT NOT NULL,
+                                model TEXT,
+                                content TEXT NOT NULL,
+                                created_at REAL NOT NULL,
+                                last_used REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS replies_last_used ON replies (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, call_site: str, params: Dict) -> Optional[str]:
+        """
+        Args:
+            call_site (str): name of the call site
+            params (dict): request parameters
+
+        Returns:
+            str: the cached reply content, None on a miss or if call_site is not cached
+        """
+        if not self.caches(call_site):
+            return None
+        key = request_key(params)
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT content FROM replies WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    # Touch the entry so that eviction is least-recently-used
+                    conn.execute("UPDATE replies SET last_used = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+        except sqlite3.Error as e:
+            print(f"[WARNING] LLM cache lookup failed: {e}")
+            row = None
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return row[0]
+
+    def put(self, call_site: str, params: Dict, content: str):
+        """
+        Store a reply. Callers store only replies that they could parse.
+
+        Args:
+            call_site (str): name of the call site
+            params (dict): request parameters
+            content (str): reply content
+        """
+        if not self.caches(call_site) or content is None:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?, ?)",
+                             (request_key(params), call_site, params.get("model"), content, now, now))
+                conn.commit()
+                self.stats["writes"] += 1
+                self._evict_if_needed(conn)
+        except sqlite3.Error as e:
+            print(f"[WARNING] Failed to write LLM cache entry: {e}")
+
+    def _evict_if_needed(self, conn: sqlite3.Connection):
+        # Called with the lock held
+        if self._entries is None:
+            self._entries = conn.execute("SELECT COUNT(*) FROM replies").fetchone()[0]
+        else:
+            self._entries += 1
+        if self._entries <= self.max_entries:
+            return
+        # Recount (other processes may write too), then evict down to 90% of the limit
+        self._entries = conn.execute("SELECT COUNT(*) FROM replies").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess <= 0 or self._entries <= self.max_entries:
+            return
+        conn.execute("DELETE FROM replies WHERE key IN "
+                     "(SELECT key FROM replies ORDER BY last_used LIMIT ?)", (excess,))
+        conn.commit()
+        self._entries -= excess
+        self.stats["evictions"] += excess
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0.0
+        sites = ", ".join(sorted(self.call_sites)) or "off"
+        return (f"LLM cache ({sites}): {self.stats['hits']}/{lookups} hits ({hit_rate:.1f}%), "
+                f"{self.stats['writes']} writes, {self.stats['evictions']} evictions")
+
+
+_llm_cache = LLMCache()
+
+
+def configure_llm_cache(call_sites: Iterable[str] = None, path=None, max_entries: int = None) -> LLMCache:
+    """
+    Replace the process-wide LLM cache.
+
+    Args:
+        call_sites (iterable): call sites to cache, e.g. ("extraction", "understanding_relevance")
+        path (str | Path): database file
+        max_entries (int): size limit in replies
+
+    Returns:
+        LLMCache: the new cache
+    """
+    global _llm_cache
+    _llm_cache.close()
+    _llm_cache = LLMCache(
+        path=path if path is not None else _llm_cache.path,
+        max_entries=max_entries if max_entries is not None else _llm_cache.max_entries,
+        call_sites=call_sites if call_sites is not None else _llm_cache.call_sites,
+    )
+    return _llm_cache
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Returns:
+        LLMCache: the process-wide LLM cache (no call site cached unless configured)
+    """
+    return _llm_cache
@@ -0,0 +1,155 @@
+"""
+Process-wide registry of pooled OpenAI clients.
+
+Creating an OpenAI client creates a new HTTP connection pool, so a client built
+per call pays a TCP and TLS handshake on every request. All modules get their
+clients here instead; one client is kept per (base_url, api_key), with HTTP
+keep-alive, HTTP/2 when the h2 package is installed, and configurable pool
+limits.
+
+Usage:
+    client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
+    aclient = get_async_client(llm_cfg['api_key'], llm_cfg['model_server'])  # inside a running loop
+"""
+
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Dict, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Pool defaults (can be changed with configure_llm_clients)
+MAX_CONNECTIONS = 100          # Connections per client
+MAX_KEEPALIVE_CONNECTIONS = 20  # Idle connections kept open per client
+KEEPALIVE_EXPIRY = 60.0        # Seconds an idle connection is kept open
+TIMEOUT = 600.0                # Request timeout in seconds (the OpenAI SDK default)
+
+_OPTIONS = {
+    "max_connections": MAX_CONNECTIONS,
+    "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+    "keepalive_expiry": KEEPALIVE_EXPIRY,
+    "timeout": TIMEOUT,
+    "http2": None,
+}
+
+# {(base_url, api_key): client, (base_url, api_key, max_retries): variant sharing its pool}
+_clients: Dict[Tuple, OpenAI] = {}
+# Async clients are bound to the event loop their connections were opened on
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def configure_llm_clients(max_connections: int = None, max_keepalive_connections: int = None,
+                          keepalive_expiry: float = None, timeout: float = None, http2: bool = None):
+    """
+    Set the options used for clients created after this call.
+
+    Args:
+        max_connections (int): connections per client
+        max_keepalive_connections (int): idle connections kept open per client
+        keepalive_expiry (float): seconds an idle connection is kept open
+        timeout (float): request timeout in seconds
+        http2 (bool): use HTTP/2; None to use it when the h2 package is installed
+    """
+    if max_connections is not None:
+        _OPTIONS["max_connections"] = max_connections
+    if max_keepalive_connections is not None:
+        _OPTIONS["max_keepalive_connections"] = max_keepalive_connections
+    if keepalive_expiry is not None:
+        _OPTIONS["keepalive_expiry"] = keepalive_expiry
+    if timeout is not None:
+        _OPTIONS["timeout"] = timeout
+    if http2 is not None:
+        _OPTIONS["http2"] = http2
+
+
+def _http2_enabled() -> bool:
+    # httpx needs the h2 package for HTTP/2 and raises without it
+    if _OPTIONS["http2"] is False:
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def _http_options() -> Dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=_OPTIONS["max_connections"],
+            max_keepalive_connections=_OPTIONS["max_keepalive_connections"],
+            keepalive_expiry=_OPTIONS["keepalive_expiry"],
+        ),
+        "timeout": _OPTIONS["timeout"],
+        "http2": _http2_enabled(),
+    }
+
+
+def get_client(api_key: str, base_url: str = None, max_retries: int = None) -> OpenAI:
+    """
+    Args:
+        api_key (str): API key
+        base_url (str): endpoint
+        max_retries (int): retries of the OpenAI SDK itself, None for its default (callers
+            with their own retry loop pass 0); all variants share one connection pool
+
+    Returns:
+        OpenAI: the shared client for (base_url, api_key) (created lazily)
+    """
+    key = (base_url or "", api_key or "")
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url,
+                            http_client=httpx.Client(**_http_options()))
+            _clients[key] = client
+        if max_retries is None:
+            return client
+        variant = _clients.get(key + (max_retries,))
+        if variant is None:
+            variant = client.with_options(max_retries=max_retries)
+            _clients[key + (max_retries,)] = variant
+        return variant
+
+
+def get_async_client(api_key: str, base_url: str = None, max_retries: int = None) -> AsyncOpenAI:
+    """
+    Args:
+        max_retries (int): retries of the OpenAI SDK itself, see get_client
+
+    Returns:
+        AsyncOpenAI: the shared client for (base_url, api_key) bound to the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    key = (base_url or "", api_key or "")
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                 http_client=httpx.AsyncClient(**_http_options()))
+            clients[key] = client
+        if max_retries is None:
+            return client
+        variant = clients.get(key + (max_retries,))
+        if variant is None:
+            variant = client.with_options(max_retries=max_retries)
+            clients[key + (max_retries,)] = variant
+        return variant
+
+
+def close_llm_clients():
+    """Close the synchronous clients; async clients are closed by aclose_llm_clients on their loop."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_llm_clients():
+    """Close the async clients bound to the running event loop, if any."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
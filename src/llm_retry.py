@@ -0,0 +1,314 @@
+"""
+Shared retry policy for LLM calls.
+
+The agent's LLM calls used to retry every error up to 10 times with 1, 2, 4,
+... 512 s sleeps, so a single call could block a session for more than 17
+minutes, and a reply that failed to parse was resent the same way as a timeout.
+RetryPolicy instead:
+
+- classifies errors: rate limits (429), transient failures (5xx, 408/409,
+  timeouts, connection errors), parse errors of the reply, and fatal errors
+  (other 4xx) that are not retried at all;
+- honors the Retry-After header of rate-limited replies;
+- uses exponential backoff with full jitter, and caps the total time spent on
+  one call: each attempt gets the remaining time as its timeout (passed to the
+  OpenAI client by traced_create, and enforced with asyncio.wait_for in acall),
+  so a hung request cannot outlast the budget;
+- takes every attempt from one process-wide token bucket. A rate-limited reply
+  pauses the bucket, so concurrent sessions back off together instead of
+  hitting the endpoint again at the same moment.
+
+Usage:
+    result = get_retry_policy().call(lambda attempt: parse(traced_create(client, 'critic', attempt, ...)), 'critic')
+    result = await get_retry_policy().acall(lambda attempt: ..., 'critic')   # coroutine function
+"""
+
+import asyncio
+import contextvars
+import email.utils
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RATE_LIMIT = "rate_limit"
+TRANSIENT = "transient"
+PARSE = "parse"
+FATAL = "fatal"
+
+# Policy defaults (can be changed with configure_llm_retry)
+MAX_ATTEMPTS = 6          # Attempts per call, including the first
+BASE_DELAY = 1.0          # Seconds, doubled per attempt before jitter
+MAX_DELAY = 30.0          # Upper bound of one backoff delay (Retry-After may ask for more)
+MAX_TOTAL_TIME = 120.0    # Seconds one call may spend in attempts and backoff
+MAX_PARSE_RETRIES = 1     # Resends of a request whose reply could not be parsed
+MIN_ATTEMPT_TIMEOUT = 1.0  # Seconds an attempt gets even when admission used up the rest of the budget
+
+_RETRYABLE_STATUS = {408, 409, 425}
+_PARSE_ERRORS = (ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+# Timeout of the attempt running in this context, set by RetryPolicy
+_attempt_timeout = contextvars.ContextVar("llm_attempt_timeout", default=None)
+
+
+def attempt_timeout() -> Optional[float]:
+    """
+    Returns:
+        float: seconds left for the LLM request of the current attempt, None outside of a RetryPolicy call
+    """
+    return _attempt_timeout.get()
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    Args:
+        error (Exception): exception raised by an LLM call or by parsing its reply
+
+    Returns:
+        str: RATE_LIMIT, TRANSIENT, PARSE or FATAL
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        if status == 429:
+            return RATE_LIMIT
+        if status >= 500 or status in _RETRYABLE_STATUS:
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return TRANSIENT
+    # openai.APIConnectionError / APITimeoutError and httpx transport errors carry no status code
+    if any(cls.__name__ in ("APIConnectionError", "APITimeoutError", "TransportError")
+           for cls in type(error).__mro__):
+        return TRANSIENT
+    if isinstance(error, _PARSE_ERRORS):
+        return PARSE
+    return TRANSIENT
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Returns:
+        float: seconds the server asked to wait (Retry-After / retry-after-ms headers), None if absent
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Process-wide admission of LLM requests (thread-safe, usable from any event loop).
+
+    Args:
+        rate (float): requests per second, None for no rate limit
+        burst (int): requests that may be sent at once after an idle period
+    """
+
+    def __init__(self, rate: float = None, burst: int = None):
+        self.rate = rate or None
+        self.burst = max(1, burst or (int(rate) if rate else 1))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token; returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate is None:
+                return wait
+            start = now + wait
+            self._tokens = min(self.burst, self._tokens + (start - self._updated) * self.rate)
+            self._updated = start
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """Wait, without blocking the event loop, until a request may be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every request for the next `seconds` (after a rate-limited reply)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """
+    Args:
+        max_attempts (int): attempts per call, including the first
+        base_delay (float): backoff of the first retry in seconds, doubled per attempt
+        max_delay (float): upper bound of one backoff delay
+        max_total_time (float): seconds one call may spend in attempts and backoff
+        max_parse_retries (int): resends of a request whose reply could not be parsed
+        bucket (TokenBucket): admission shared with other policies, None for the process-wide bucket
+    """
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY,
+                 max_delay: float = MAX_DELAY, max_total_time: float = MAX_TOTAL_TIME,
+                 max_parse_retries: int = MAX_PARSE_RETRIES, bucket: Optional[TokenBucket] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_total_time = max_total_time
+        self.max_parse_retries = max_parse_retries
+        self._bucket = bucket
+
+    @property
+    def bucket(self) -> TokenBucket:
+        return self._bucket or _bucket
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """
+        Args:
+            attempt (int): the attempt that failed (1 for the first)
+            error (Exception): its error
+
+        Returns:
+            float: seconds to wait before the next attempt
+        """
+        # Full jitter: spread concurrent retries over the whole backoff window
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        return delay
+
+    def _next_delay(self, attempt: int, error: BaseException, started: float, parse_failures: int,
+                    call_site: str) -> Optional[float]:
+        """Seconds to sleep before the next attempt, None to give up and raise."""
+        kind = classify_error(error)
+        if kind == FATAL or attempt >= self.max_attempts:
+            return None
+        if kind == PARSE:
+            if parse_failures > self.max_parse_retries:
+                return None
+            delay = 0.0
+        else:
+            delay = self.backoff(attempt, error)
+        if time.monotonic() - started + delay > self.max_total_time:
+            return None
+        print(f"[{call_site}] {kind} error on attempt {attempt}: {error}; retrying in {delay:.1f}s")
+        if kind == RATE_LIMIT:
+            # Every session waits (in bucket.acquire), not only the one that hit the limit
+            self.bucket.pause(delay)
+            return 0.0
+        return delay
+
+    def _remaining(self, started: float) -> float:
+        """Timeout of the next attempt: what is left of max_total_time."""
+        return max(self.max_total_time - (time.monotonic() - started), MIN_ATTEMPT_TIMEOUT)
+
+    def call(self, fn: Callable[[int], T], call_site: str = "llm") -> T:
+        """
+        Args:
+            fn (callable): fn(attempt) makes the call and parses the reply; requests made with
+                traced_create time out when the attempt's share of max_total_time is spent
+            call_site (str): name used in log messages
+
+        Returns:
+            the result of fn; the last error is raised when retries are exhausted
+        """
+        started = time.monotonic()
+        parse_failures = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            self.bucket.acquire()
+            timeout = self._remaining(started)
+            token = _attempt_timeout.set(timeout)
+            try:
+                return fn(attempt)
+            except Exception as e:
+                parse_failures += classify_error(e) == PARSE
+                delay = self._next_delay(attempt, e, started, parse_failures, call_site)
+                if delay is None:
+                    raise
+            finally:
+                _attempt_timeout.reset(token)
+            if delay:
+                time.sleep(delay)
+
+    async def acall(self, fn: Callable[[int], Awaitable[T]], call_site: str = "llm") -> T:
+        """Async version of call; fn(attempt) returns an awaitable."""
+        started = time.monotonic()
+        parse_failures = 0
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.bucket.aacquire()
+            timeout = self._remaining(started)
+            token = _attempt_timeout.set(timeout)
+            try:
+                return await asyncio.wait_for(fn(attempt), timeout)
+            except Exception as e:
+                parse_failures += classify_error(e) == PARSE
+                delay = self._next_delay(attempt, e, started, parse_failures, call_site)
+                if delay is None:
+                    raise
+            finally:
+                _attempt_timeout.reset(token)
+            if delay:
+                await asyncio.sleep(delay)
+
+
+_bucket = TokenBucket()
+_policy = RetryPolicy()
+
+
+def configure_llm_retry(max_attempts: int = MAX_ATTEMPTS, max_total_time: float = MAX_TOTAL_TIME,
+                        base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                        requests_per_second: float = None, burst: int = None):
+    """
+    Args:
+        max_attempts (int): attempts per call, including the first
+        max_total_time (float): seconds one call may spend in attempts and backoff
+        base_delay (float): backoff of the first retry in seconds
+        max_delay (float): upper bound of one backoff delay
+        requests_per_second (float): process-wide LLM request rate, None for unbounded
+        burst (int): requests that may be sent at once after an idle period
+    """
+    global _bucket, _policy
+    _bucket = TokenBucket(requests_per_second, burst)
+    _policy = RetryPolicy(max_attempts=max_attempts, base_delay=base_delay, max_delay=max_delay,
+                          max_total_time=max_total_time)
+
+
+def get_retry_policy() -> RetryPolicy:
+    """
+    Returns:
+        RetryPolicy: the process-wide retry policy
+    """
+    return _policy
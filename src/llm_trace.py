@@ -0,0 +1,238 @@
+"""
+Token, latency and cost accounting for LLM calls.
+
+Every LLM call site goes through traced_create / atraced_create (or, for the
+qwen_agent planner stream, record_estimated). Calls are recorded into the trace
+that is active in the current context, so one question evaluated in one
+asyncio task (and the threads it starts with asyncio.to_thread) gets its own
+trace without passing it around:
+
+    with use_trace() as trace:
+        ...run the agent...
+    record["llm"] = trace.totals()
+
+Outside of use_trace() nothing is recorded.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from llm_retry import attempt_timeout
+from transcript import estimate_tokens
+
+# USD per 1M tokens, {model: {"input": ..., "output": ...}}; set with configure_llm_prices
+_PRICES: Dict[str, Dict[str, float]] = {}
+
+_current_trace = contextvars.ContextVar("llm_trace", default=None)
+
+
+def configure_llm_prices(prices: Dict[str, Dict[str, float]]):
+    """
+    Args:
+        prices (dict): {model: {"input": usd_per_1m_tokens, "output": usd_per_1m_tokens}}
+    """
+    _PRICES.clear()
+    _PRICES.update(prices or {})
+
+
+def call_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """
+    Returns:
+        float: cost in USD, None if the model has no configured price
+    """
+    price = _PRICES.get(model)
+    if not price:
+        return None
+    return (prompt_tokens * price.get("input", 0) + completion_tokens * price.get("output", 0)) / 1e6
+
+
+class LLMTrace:
+    """Calls made while answering one question (thread-safe)."""
+
+    def __init__(self):
+        self.calls: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, call_site: str, model: str, latency: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, attempt: int = 1, error: str = None, estimated: bool = False,
+               discarded: bool = False):
+        """
+        Args:
+            call_site (str): which part of the system made the call (planner, extraction, critic, ...)
+            model (str): model name
+            latency (float): seconds
+            prompt_tokens (int): prompt tokens
+            completion_tokens (int): completion tokens
+            attempt (int): 1 for the first try, >1 for retries
+            error (str): error message of a failed call
+            estimated (bool): token counts are estimates (the API did not report usage)
+            discarded (bool): the output was not used (a speculative call made unnecessary, or cancelled)
+        """
+        entry = {
+            "call_site": call_site,
+            "model": model,
+            "latency": round(latency, 3),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "attempt": attempt,
+            "error": error,
+            "estimated": estimated,
+            "discarded": discarded,
+            "cost": call_cost(model, prompt_tokens, completion_tokens),
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self.calls.append(entry)
+
+    def merge(self, other: "LLMTrace", discarded: bool = False):
+        """
+        Add the calls of another trace (e.g. of a speculative call) to this one.
+
+        Args:
+            other (LLMTrace): trace to add
+            discarded (bool): mark its calls as discarded
+        """
+        with other._lock:
+            calls = [dict(call, discarded=call.get("discarded", False) or discarded) for call in other.calls]
+        with self._lock:
+            self.calls.extend(calls)
+
+    def totals(self) -> Dict:
+        """
+        Returns:
+            dict: call counts, tokens, latency, retries, errors, discarded calls and cost, overall and per call site
+        """
+        def summarize(calls):
+            costs = [c["cost"] for c in calls if c["cost"] is not None]
+            return {
+                "calls": len(calls),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "total_tokens": sum(c["prompt_tokens"] + c["completion_tokens"] for c in calls),
+                "latency": round(sum(c["latency"] for c in calls), 3),
+                "retries": sum(1 for c in calls if c["attempt"] > 1),
+                "errors": sum(1 for c in calls if c["error"]),
+                "discarded": sum(1 for c in calls if c.get("discarded")),
+                "cost": round(sum(costs), 6) if costs else None,
+            }
+
+        with self._lock:
+            calls = list(self.calls)
+        by_site = {}
+        for call in calls:
+            by_site.setdefault(call["call_site"], []).append(call)
+        totals = summarize(calls)
+        totals["by_call_site"] = {site: summarize(site_calls) for site, site_calls in by_site.items()}
+        return totals
+
+
+@contextmanager
+def use_trace(trace: LLMTrace = None):
+    """Record the LLM calls of the enclosed code (and the tasks/threads it starts) into trace."""
+    trace = trace or LLMTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[LLMTrace]:
+    """
+    Returns:
+        LLMTrace: the trace of the current context, or None
+    """
+    return _current_trace.get()
+
+
+def _message_text(messages) -> str:
+    parts = []
+    for message in messages or []:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        if isinstance(content, list):
+            content = " ".join(item.get("text", "") for item in content if isinstance(item, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _usage(response, messages):
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens or 0, False
+    completion = response.choices[0].message.content if getattr(response, "choices", None) else ""
+    return estimate_tokens(_message_text(messages)), estimate_tokens(completion or ""), True
+
+
+def _record_response(call_site, params, start, response=None, error=None, attempt=1, cancelled=False):
+    trace = current_trace()
+    if trace is None:
+        return
+    latency = time.monotonic() - start
+    model = params.get("model", "")
+    if cancelled:
+        # The prompt was sent (and is usually billed) but no completion came back
+        trace.record(call_site, model, latency, estimate_tokens(_message_text(params.get("messages"))),
+                     attempt=attempt, estimated=True, discarded=True)
+        return
+    if error is not None:
+        trace.record(call_site, model, latency, attempt=attempt, error=f"{type(error).__name__}: {error}")
+        return
+    prompt_tokens, completion_tokens, estimated = _usage(response, params.get("messages"))
+    trace.record(call_site, model, latency, prompt_tokens, completion_tokens, attempt=attempt, estimated=estimated)
+
+
+def _with_timeout(params):
+    """Request parameters with the timeout left to the current retry attempt, if there is one."""
+    timeout = attempt_timeout()
+    if timeout is None or "timeout" in params:
+        return params
+    return dict(params, timeout=timeout)
+
+
+def traced_create(client, call_site: str, attempt: int = 1, **params):
+    """
+    client.chat.completions.create(**params), recorded in the current trace.
+
+    Args:
+        client: OpenAI client
+        call_site (str): name of the call site
+        attempt (int): attempt number of the caller's retry loop
+
+    Inside a RetryPolicy call, the request times out when the attempt's time is spent.
+    """
+    start = time.monotonic()
+    try:
+        response = client.chat.completions.create(**_with_timeout(params))
+    except Exception as e:
+        _record_response(call_site, params, start, error=e, attempt=attempt)
+        raise
+    _record_response(call_site, params, start, response=response, attempt=attempt)
+    return response
+
+
+async def atraced_create(client, call_site: str, attempt: int = 1, **params):
+    """Async version of traced_create for AsyncOpenAI clients."""
+    start = time.monotonic()
+    try:
+        response = await client.chat.completions.create(**_with_timeout(params))
+    except asyncio.CancelledError:
+        _record_response(call_site, params, start, attempt=attempt, cancelled=True)
+        raise
+    except Exception as e:
+        _record_response(call_site, params, start, error=e, attempt=attempt)
+        raise
+    _record_response(call_site, params, start, response=response, attempt=attempt)
+    return response
+
+
+def record_estimated(call_site: str, model: str, messages, completion: str, latency: float, error: str = None):
+    """Record a call whose API does not report usage (e.g. the streamed qwen_agent planner)."""
+    trace = current_trace()
+    if trace is None:
+        return
+    trace.record(call_site, model, latency, estimate_tokens(_message_text(messages)),
+                 estimate_tokens(completion or ""), error=error, estimated=True)
@@ -0,0 +1,110 @@
+"""
+Cleaning of crawled markdown before it is shown to the agent.
+
+clean_markdown removes markdown links, bare URLs and empty "* " list items,
+and collapses blank lines. Its URL pattern was an alternation matched one
+character at a time, and contained the character range [$-_@.&+] (every
+character from "$" to "_": digits, upper case letters and most punctuation,
+brackets and quotes included), so it also removed the punctuation around URLs.
+
+Here the patterns are compiled once, the URL pattern is a single character
+class, and the text is cleaned in blocks of whole lines, so that a stream of
+chunks (iter_clean_markdown) is cleaned as it arrives and each pass works on
+a block that stays in cache. The link and URL patterns never cross a line
+break, which makes the blocks independent; only the blank line collapsing is
+carried over from one block to the next. The passes stay separate: a URL
+glued to a link is removed differently when both patterns run in one pass.
+
+The URL pattern is fixed by default: an RFC 3986 character set without
+brackets, quotes or "*", and without trailing punctuation. "legacy" keeps the
+original pattern (same output as before, see benchmarks/bench_clean_markdown.py).
+"""
+
+import re
+from typing import Iterable, Iterator, Optional
+
+URL_PATTERNS = ("fixed", "legacy")
+BLOCK_SIZE = 1 << 16   # characters per block when a whole page is cleaned
+
+_LINK = re.compile(r'\[.*?\]\(.*?\)')
+_URLS = {
+    "fixed": re.compile(r"https?://[A-Za-z0-9\-._~:/?#@!$&+,;=%]*[A-Za-z0-9\-_~/#@$&+=%]"),
+    # The original pattern; its alternatives reduce to one character class ("%" is in the $-_ range)
+    "legacy": re.compile(r'https?://[a-zA-Z0-9$-_@.&+!*\\(),]+'),
+}
+_BLANK_LINES = re.compile(r'\n\n+')
+
+_url_pattern = "fixed"
+
+
+def configure_markdown_cleaning(url_pattern: str = "fixed"):
+    """
+    Args:
+        url_pattern (str): "fixed", or "legacy" for the original URL pattern
+    """
+    global _url_pattern
+    if url_pattern not in URL_PATTERNS:
+        raise ValueError(f"Unknown URL pattern: {url_pattern} (expected one of {URL_PATTERNS})")
+    _url_pattern = url_pattern
+
+
+def get_url_pattern() -> str:
+    """
+    Returns:
+        str: the configured URL pattern (pass it to clean_markdown in the page processing pool)
+    """
+    return _url_pattern
+
+
+def iter_clean_markdown(chunks: Iterable[str], url_pattern: str = None) -> Iterator[str]:
+    """
+    Clean markdown arriving in chunks of any size.
+
+    Args:
+        chunks (iterable): consecutive pieces of the markdown
+        url_pattern (str): "fixed" or "legacy", the configured one if None
+
+    Returns:
+        iterator: pieces of the cleaned markdown; joined, they equal clean_markdown of the whole text
+    """
+    url = _URLS[url_pattern or _url_pattern]
+    after_newline = False  # whether the output so far ends with a line break
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind("\n") + 1
+        if len(pending) < BLOCK_SIZE or not cut:
+            continue
+        block, pending = pending[:cut], pending[cut:]
+        cleaned = _BLANK_LINES.sub("\n", url.sub("", _LINK.sub("", block)).replace("* \n", ""))
+        if after_newline:
+            cleaned = cleaned.lstrip("\n")
+        if cleaned:
+            after_newline = cleaned.endswith("\n")
+            yield cleaned
+    if pending:
+        cleaned = _BLANK_LINES.sub("\n", url.sub("", _LINK.sub("", pending)).replace("* \n", ""))
+        if after_newline:
+            cleaned = cleaned.lstrip("\n")
+        if cleaned:
+            yield cleaned
+
+
+def _blocks(text: str) -> Iterator[str]:
+    for start in range(0, len(text), BLOCK_SIZE):
+        yield text[start:start + BLOCK_SIZE]
+
+
+def clean_markdown(res: Optional[str], url_pattern: str = None) -> Optional[str]:
+    """
+    Args:
+        res (str): markdown content
+        url_pattern (str): "fixed" or "legacy", the configured one if None
+
+    Returns:
+        str: cleaned markdown content (res itself if it cannot be cleaned)
+    """
+    try:
+        return "".join(iter_clean_markdown(_blocks(res), url_pattern))
+    except Exception:
+        return res
@@ -0,0 +1,230 @@
+"""
+On-disk page cache shared by every crawl path.
+
+Each fetched page (raw HTML, raw and cleaned markdown, optional screenshot) is
+stored as one JSON file named after the SHA-256 of its normalized URL. Entries
+expire after a TTL, and the least recently used ones are evicted once the cache
+grows beyond a size limit.
+
+Modes:
+    off        - the cache is bypassed
+    readwrite  - serve fresh entries, store new fetches
+    replay     - serve entries regardless of age and never fetch or write;
+                 pages that are not cached are reported as missing, which
+                 makes evaluation runs reproducible
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+CACHE_DIR = Path("page_cache")
+DEFAULT_TTL = 24 * 3600                 # seconds
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+MODES = ("off", "readwrite", "replay")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Args:
+        url (str): url
+
+    Returns:
+        str: url with lowercase scheme/host, no fragment, no default port and sorted query
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class PageCache:
+    """
+    Size-bounded LRU page cache with TTL.
+
+    Args:
+        cache_dir (str | Path): directory holding the cache entries
+        ttl (float): entry lifetime in seconds (ignored in replay mode)
+        max_bytes (int): total size above which the oldest entries are evicted
+        mode (str): one of MODES
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, mode: str = "readwrite"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown page cache mode: {mode} (expected one of {MODES})")
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def read_only(self) -> bool:
+        return self.mode == "replay"
+
+    def _entry_path(self, url: str) -> Path:
+        key = hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, url: str, need_screenshot: bool = False) -> Optional[Dict]:
+        """
+        Args:
+            url (str): page url
+            need_screenshot (bool): treat entries without a screenshot as a miss
+
+        Returns:
+            dict: the cached entry (html, markdown, clean_markdown, screenshot, fetched_at) or None
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        if not self.read_only:
+            expired = time.time() - entry.get("fetched_at", 0) > self.ttl
+            if expired or (need_screenshot and not entry.get("screenshot")):
+                self.stats["misses"] += 1
+                return None
+
+        # Touch the entry so that eviction is least-recently-used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats["hits"] += 1
+        return entry
+
+    def contains(self, url: str) -> bool:
+        """Whether an entry exists for url (cheap: expiry and screenshot are not checked)."""
+        return self.enabled and self._entry_path(url).exists()
+
+    def put(self, url: str, html: str, markdown: str, clean_markdown: str = None, screenshot: str = None):
+        """
+        Store a fetched page. Does nothing when the cache is off or in replay mode.
+
+        Args:
+            url (str): page url
+            html (str): raw html
+            markdown (str): raw markdown produced by the crawler
+            clean_markdown (str): markdown after utils.clean_markdown
+            screenshot (str): base64 encoded screenshot
+        """
+        if not self.enabled or self.read_only:
+            return
+        entry = {
+            "url": url,
+            "normalized_url": normalize_url(url),
+            "fetched_at": time.time(),
+            "content_hash": hashlib.sha256((html or "").encode("utf-8")).hexdigest(),
+            "html": html,
+            "markdown": markdown,
+            "clean_markdown": clean_markdown,
+            "screenshot": screenshot,
+        }
+        path = self._entry_path(url)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[WARNING] Failed to write page cache entry for {url}: {e}")
+            return
+
+        self.stats["writes"] += 1
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data) - old_size
+        self._evict_if_needed()
+
+    def _scan(self):
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            if self._total_bytes <= self.max_bytes:
+                return
+            # Evict down to 90% of the limit so that eviction is not triggered on every write
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in sorted(self._scan()):
+                if self._total_bytes <= target:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                self._total_bytes -= size
+                self.stats["evictions"] += 1
+
+    def summary(self) -> str:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0.0
+        return (f"page cache ({self.mode}): {self.stats['hits']}/{lookups} hits ({hit_rate:.1f}%), "
+                f"{self.stats['writes']} writes, {self.stats['evictions']} evictions")
+
+
+_page_cache = PageCache(mode="off")
+
+
+def configure_page_cache(mode: str = None, cache_dir=None, ttl: float = None, max_bytes: int = None) -> PageCache:
+    """
+    Replace the process-wide page cache.
+
+    Args:
+        mode (str): one of MODES
+        cache_dir (str | Path): cache directory
+        ttl (float): entry lifetime in seconds
+        max_bytes (int): size limit in bytes
+
+    Returns:
+        PageCache: the new cache
+    """
+    global _page_cache
+    _page_cache = PageCache(
+        cache_dir=cache_dir if cache_dir is not None else _page_cache.cache_dir,
+        ttl=ttl if ttl is not None else _page_cache.ttl,
+        max_bytes=max_bytes if max_bytes is not None else _page_cache.max_bytes,
+        mode=mode if mode is not None else _page_cache.mode,
+    )
+    return _page_cache
+
+
+def get_page_cache() -> PageCache:
+    """
+    Returns:
+        PageCache: the process-wide page cache (off unless configured)
+    """
+    return _page_cache
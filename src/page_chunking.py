@@ -0,0 +1,182 @@
+"""
+Relevance-ranked page chunking for tool observations.
+
+visit_page / visit_url used to return the whole cleaned markdown, which is then
+sent to the extraction LLM and, through the ReAct transcript, to the planner.
+With a token budget configured, the markdown is split into sections (at
+headings, and at line boundaries for long sections), the sections are ranked
+against the query with BM25, and only the best ones that fit in the budget are
+returned, in page order. The remaining sections stay in the session and can be
+paged through with the show_more tool.
+
+Everything is local: BM25 over lowercase words and CJK character bigrams.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from transcript import estimate_tokens
+
+MAX_CHUNK_CHARS = 1500   # sections longer than this are split at line boundaries
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_HEADING = re.compile(r'^#{1,6}\s')
+_WORD = re.compile(r'[a-z0-9]+')
+_CJK_RUN = re.compile(r'[\u4e00-\u9fff]+')
+
+_budget_tokens: Optional[int] = None
+
+
+def configure_page_chunking(budget_tokens: int = None):
+    """
+    Args:
+        budget_tokens (int): maximum estimated tokens of page content per observation, None/0 to disable
+    """
+    global _budget_tokens
+    _budget_tokens = budget_tokens or None
+
+
+def get_budget() -> Optional[int]:
+    """
+    Returns:
+        int: the configured token budget, or None when chunking is off
+    """
+    return _budget_tokens
+
+
+def split_sections(markdown: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """
+    Args:
+        markdown (str): cleaned page markdown
+        max_chars (int): maximum characters per chunk
+
+    Returns:
+        list: chunks in page order
+    """
+    sections, current = [], []
+    for line in markdown.splitlines():
+        if _HEADING.match(line) and current:
+            sections.append(current)
+            current = []
+        current.append(line)
+    if current:
+        sections.append(current)
+
+    chunks = []
+    for lines in sections:
+        piece, size = [], 0
+        for line in lines:
+            if piece and size + len(line) + 1 > max_chars:
+                chunks.append("\n".join(piece))
+                piece, size = [], 0
+            # A single overlong line is cut into max_chars pieces
+            while len(line) > max_chars:
+                chunks.append(line[:max_chars])
+                line = line[max_chars:]
+            piece.append(line)
+            size += len(line) + 1
+        if piece:
+            chunks.append("\n".join(piece))
+    return [c for c in chunks if c.strip()]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words plus CJK character bigrams (single characters for 1-character runs)."""
+    text = text.lower()
+    terms = _WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def bm25_scores(chunks: List[str], query: str) -> List[float]:
+    """
+    Args:
+        chunks (list): documents
+        query (str): query text
+
+    Returns:
+        list: BM25 score of every chunk
+    """
+    docs = [Counter(tokenize(c)) for c in chunks]
+    query_terms = set(tokenize(query))
+    if not docs or not query_terms:
+        return [0.0] * len(chunks)
+    lengths = [sum(d.values()) for d in docs]
+    avg_length = sum(lengths) / len(docs) or 1.0
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for d in docs if term in d)
+        idf[term] = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term)
+            if tf:
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def rank_chunks(chunks: List[str], query: str) -> List[int]:
+    """
+    Returns:
+        list: chunk indices, most relevant first (page order among equal scores)
+    """
+    scores = bm25_scores(chunks, query)
+    return sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+
+
+def take_within_budget(chunks: List[str], order: List[int], budget_tokens: int) -> Tuple[List[int], List[int]]:
+    """
+    Args:
+        chunks (list): all chunks
+        order (list): candidate chunk indices in priority order
+        budget_tokens (int): token budget
+
+    Returns:
+        tuple: (selected indices in page order, remaining indices in priority order)
+    """
+    selected, remaining, used = [], [], 0
+    for i in order:
+        tokens = estimate_tokens(chunks[i])
+        # The first chunk is always shown, even if it alone exceeds the budget
+        if not selected or used + tokens <= budget_tokens:
+            selected.append(i)
+            used += tokens
+        else:
+            remaining.append(i)
+    return sorted(selected), remaining
+
+
+def render_chunks(chunks: List[str], selected: List[int], remaining: List[int]) -> str:
+    """Join the selected chunks and add a note about the sections left out."""
+    text = "\n".join(chunks[i] for i in selected)
+    if remaining:
+        text += (f"\n\n[Showing the {len(selected)} sections most relevant to the query, in page order; "
+                 f"{len(remaining)} more sections not shown: use the show_more tool to read them.]")
+    return text
+
+
+def chunk_page(markdown: str, query: str, budget_tokens: int) -> Tuple[str, Dict]:
+    """
+    Args:
+        markdown (str): cleaned page markdown
+        query (str): user query
+        budget_tokens (int): token budget for the returned content
+
+    Returns:
+        tuple: (content to show, state for show_more: {"chunks", "remaining"})
+    """
+    if not markdown or estimate_tokens(markdown) <= budget_tokens:
+        return markdown, {"chunks": [], "remaining": []}
+    chunks = split_sections(markdown)
+    selected, remaining = take_within_budget(chunks, rank_chunks(chunks, query), budget_tokens)
+    return render_chunks(chunks, selected, remaining), {"chunks": chunks, "remaining": remaining}
@@ -0,0 +1,109 @@
+"""
+Optional process pool for CPU-bound page post-processing.
+
+Link extraction, markdown cleaning and the understanding-score heuristics are
+pure Python and hold the GIL, so with several concurrent sessions they
+serialize the threads and block the event loop. When a pool is configured the
+work runs in worker processes instead; only strings go in and plain lists,
+dicts and numbers come out, so no DOM objects are ever pickled.
+
+Without a pool (the default) every call runs inline, exactly as before.
+
+Usage:
+    links = run_cpu(extract_links, html, url, root_url, engine)        # sync code
+    markdown = await run_cpu_async(clean_markdown, raw_markdown)        # async code
+    future = submit_cpu(heuristic_scores, observation, url, n_buttons)  # overlap with other work
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def configure_page_processing(workers: int = 0) -> Optional[ProcessPoolExecutor]:
+    """
+    Replace the process-wide page processing pool.
+
+    Args:
+        workers (int): number of worker processes, 0 to run everything inline
+
+    Returns:
+        ProcessPoolExecutor: the new pool, or None when running inline
+    """
+    global _executor
+    shutdown_page_processing()
+    if workers and workers > 0:
+        # spawn: forking a process that already runs threads and browsers is unsafe
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_page_processing():
+    """Stop the worker processes, if any."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _disable_broken_pool(e: Exception):
+    global _executor
+    print(f"[WARNING] Page processing pool failed ({e}), processing pages inline")
+    _executor = None
+
+
+def submit_cpu(fn: Callable, *args) -> Future:
+    """
+    Start fn(*args) in the pool and return immediately.
+
+    fn must be a module-level function and args plain data (str, bytes, numbers).
+
+    Returns:
+        Future: resolves to fn(*args); already done when running inline
+    """
+    if _executor is not None:
+        try:
+            return _executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            _disable_broken_pool(e)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run_cpu(fn: Callable, *args):
+    """
+    Run fn(*args) in the pool and wait for the result (blocking).
+
+    Returns:
+        the result of fn(*args)
+    """
+    try:
+        return submit_cpu(fn, *args).result()
+    except BrokenProcessPool as e:
+        _disable_broken_pool(e)
+        return fn(*args)
+
+
+async def run_cpu_async(fn: Callable, *args):
+    """
+    Run fn(*args) in the pool without blocking the event loop, so that other
+    fetches keep going while the page is processed.
+
+    Returns:
+        the result of fn(*args)
+    """
+    if _executor is None:
+        return fn(*args)
+    try:
+        return await asyncio.wrap_future(submit_cpu(fn, *args))
+    except BrokenProcessPool as e:
+        _disable_broken_pool(e)
+        return fn(*args)
@@ -0,0 +1,213 @@
+"""
+Speculative prefetch of the pages an agent is likely to visit next.
+
+While the planner LLM writes the next Thought/Action (often 5-20 s), the
+browser pool sits idle, although the next click is usually one of the buttons
+of the page just shown. After every page visit, the page's links are ranked
+by how many query terms (words and CJK bigrams, as in page_chunking) their
+button text and url contain, and the top K are fetched into the page cache in
+the background. A visit to a prefetched page is then a cache hit; a visit to
+a page still being prefetched waits for that fetch instead of starting
+another one.
+
+Prefetching is off unless top_k is set, and needs a writable page cache.
+Fetches go through the same request limiter as visits, so per-host limits
+still apply.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List
+from urllib.parse import urlsplit
+
+from background_loop import submit
+from page_cache import get_page_cache, normalize_url
+from page_chunking import tokenize
+from understanding_heuristics import STOPWORDS
+
+MAX_INFLIGHT = 4  # prefetches running at the same time, further ones are dropped
+MAX_UNCLAIMED = 256  # prefetched pages remembered until visited (the oldest are forgotten)
+
+
+def rank_links(links: Iterable[Dict], query: str, limit: int) -> List[str]:
+    """
+    Args:
+        links (iterable): {'url', 'text'} dictionaries of a page
+        query (str): the user query
+        limit (int): number of urls to return
+
+    Returns:
+        list: urls of the links sharing the most query terms, best first (none without a shared term)
+    """
+    query_terms = set(tokenize(query)) - STOPWORDS
+    if not query_terms or limit <= 0:
+        return []
+    scored = {}
+    for position, link in enumerate(links):
+        url = link.get("url") or ""
+        if not url.startswith(("http://", "https://")):
+            continue
+        terms = set(tokenize(f"{link.get('text') or ''} {urlsplit(url).path}"))
+        score = len(query_terms & terms)
+        if score and score > scored.get(url, (0, 0))[0]:
+            scored[url] = (score, -position)
+    return [url for url, _ in sorted(scored.items(), key=lambda item: item[1], reverse=True)[:limit]]
+
+
+class Prefetcher:
+    """
+    Background page fetches started after each visit, and how many of them were used.
+
+    Args:
+        top_k (int): links prefetched per visited page, 0 to disable
+        max_inflight (int): prefetches running at the same time
+    """
+
+    def __init__(self, top_k: int = 0, max_inflight: int = MAX_INFLIGHT):
+        self.top_k = top_k
+        self.max_inflight = max(1, max_inflight)
+        self.stats = {"scheduled": 0, "fetched": 0, "failed": 0, "dropped": 0,
+                      "visits": 0, "hits": 0, "inflight_hits": 0}
+        self._inflight: Dict[str, Future] = {}  # normalized url -> set when its prefetch is over
+        self._tasks: Dict[str, Future] = {}     # normalized url -> running prefetch
+        self._done = OrderedDict()              # normalized urls prefetched and not visited yet, oldest first
+        self._lock = threading.Lock()
+        self._loop = None                       # event loop of the page visits
+
+    @property
+    def enabled(self) -> bool:
+        cache = get_page_cache()
+        return self.top_k > 0 and cache.enabled and not cache.read_only
+
+    def schedule(self, links: Iterable[Dict], query: str, fetch: Callable):
+        """
+        Start prefetching the most promising links of a page (returns immediately).
+
+        Args:
+            links (iterable): {'url', 'text'} dictionaries of the visited page
+            query (str): the user query
+            fetch (callable): coroutine function fetching a url into the page cache
+        """
+        if not self.enabled:
+            return
+        cache = get_page_cache()
+        for url in rank_links(links, query, self.top_k):
+            key = normalize_url(url)
+            with self._lock:
+                if key in self._inflight or key in self._done or cache.contains(url):
+                    continue
+                if len(self._inflight) >= self.max_inflight:
+                    self.stats["dropped"] += 1
+                    continue
+                self.stats["scheduled"] += 1
+                # Reserve the slot before starting so that a visit in between waits for it
+                over = self._inflight[key] = Future()
+            try:
+                task = self._start(self._run(key, url, fetch, over))
+            except Exception as e:
+                print(f"[WARNING] Prefetch of {url} could not start: {e}")
+                self._finish(key, over, ok=False)
+                continue
+            with self._lock:
+                if key in self._inflight:  # unless it already finished
+                    self._tasks[key] = task
+
+    def _start(self, coro) -> Future:
+        # On the loop the visits fetch on (and whose browser pool they use), once one was seen;
+        # the background loop of the synchronous tools otherwise
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return submit(coro)
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    async def _run(self, key: str, url: str, fetch: Callable, over: Future):
+        ok = False
+        try:
+            ok = bool((await fetch(url))[0])
+        except Exception as e:
+            print(f"[WARNING] Prefetch of {url} failed: {e}")
+        finally:
+            self._finish(key, over, ok)
+
+    def _finish(self, key: str, over: Future, ok: bool):
+        with self._lock:
+            if self._inflight.get(key) is not over:
+                return  # already finished (cancelled)
+            del self._inflight[key]
+            self._tasks.pop(key, None)
+            if ok:
+                self.stats["fetched"] += 1
+                self._done[key] = True
+                while len(self._done) > MAX_UNCLAIMED:
+                    self._done.popitem(last=False)
+            else:
+                self.stats["failed"] += 1
+        over.set_result(ok)
+
+    async def claim(self, url: str):
+        """
+        Called before a page visit: waits for a running prefetch of url and counts hits.
+        """
+        key = normalize_url(url)
+        self._loop = asyncio.get_running_loop()
+        with self._lock:
+            self.stats["visits"] += 1
+            pending = self._inflight.get(key)
+            if self._done.pop(key, None):
+                self.stats["hits"] += 1
+                return
+        if pending is None:
+            return
+        # Returns when the prefetch is done, whether it succeeded or not
+        await asyncio.wait({asyncio.wrap_future(pending)})
+        with self._lock:
+            if self._done.pop(key, None):
+                self.stats["inflight_hits"] += 1
+
+    def cancel(self):
+        """Cancel the running prefetches (before the browser pool is closed)."""
+        with self._lock:
+            pending = list(self._tasks.values())
+            overs = list(self._inflight.items())
+        for task in pending:
+            task.cancel()
+        # A prefetch cancelled before it started never finishes by itself: release its visits
+        for key, over in overs:
+            self._finish(key, over, ok=False)
+
+    def summary(self) -> str:
+        stats = dict(self.stats)
+        if not stats["scheduled"]:
+            return f"prefetch: {'off' if not self.top_k else 'nothing prefetched'}"
+        used = stats["hits"] + stats["inflight_hits"]
+        return (f"prefetch (top {self.top_k}): {stats['fetched']} pages prefetched, {used} visited "
+                f"({used / max(stats['fetched'], 1):.0%} used, {stats['inflight_hits']} while in flight), "
+                f"{used / max(stats['visits'], 1):.0%} of {stats['visits']} visits served, "
+                f"{stats['failed']} failed, {stats['dropped']} dropped")
+
+
+_prefetcher = Prefetcher()
+
+
+def configure_prefetch(top_k: int = 0, max_inflight: int = MAX_INFLIGHT) -> Prefetcher:
+    """
+    Args:
+        top_k (int): links prefetched per visited page, 0 to disable
+        max_inflight (int): prefetches running at the same time
+
+    Returns:
+        Prefetcher: the new process-wide prefetcher
+    """
+    global _prefetcher
+    _prefetcher = Prefetcher(top_k, max_inflight)
+    return _prefetcher
+
+
+def get_prefetcher() -> Prefetcher:
+    """
+    Returns:
+        Prefetcher: the process-wide prefetcher (disabled unless configured)
+    """
+    return _prefetcher
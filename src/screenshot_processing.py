@@ -0,0 +1,231 @@
+"""
+Screenshot preprocessing before VLM calls.
+
+crawl4ai screenshots are full-page PNGs, often several MB, which used to be
+base64-encoded unchanged into the VLM request. prepare_screenshot can instead:
+
+- crop to the first viewport, or to the region named by the tool's focus_area
+  ("header", "bottom", "left sidebar", or an explicit "x,y,w,h" box in pixels
+  or fractions of the page);
+- split a tall page into viewport-high tiles (at most max_tiles), sent as
+  several images of one request;
+- downscale every image so that its longer side is at most max_side pixels;
+- re-encode as JPEG or WebP at the given quality.
+
+With the defaults the screenshot is passed through unchanged. The function
+takes its options as an argument so that it can run in the page processing
+pool; bytes before/after and preprocessing time are summed per process.
+"""
+
+import base64
+import io
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+FORMATS = ("png", "jpeg", "webp")
+CROP_MODES = ("none", "viewport", "focus")
+VIEWPORT_HEIGHT = 1080   # pixels of one screen in a full-page screenshot
+MAX_TILES = 4
+
+_options = {
+    "max_side": None,        # longest side in pixels, None to keep the size
+    "format": None,          # one of FORMATS, None to keep the original encoding
+    "quality": 80,           # JPEG/WebP quality
+    "crop": "none",          # one of CROP_MODES
+    "viewport_height": VIEWPORT_HEIGHT,
+    "tile": False,           # split tall pages into viewport-high tiles
+    "max_tiles": MAX_TILES,
+}
+
+_stats = {"screenshots": 0, "images": 0, "original_bytes": 0, "sent_bytes": 0, "seconds": 0.0}
+_stats_lock = threading.Lock()
+
+_BOX = re.compile(r'^\s*(\d*\.?\d+)\s*,\s*(\d*\.?\d+)\s*,\s*(\d*\.?\d+)\s*,\s*(\d*\.?\d+)\s*$')
+_TOP_WORDS = ("top", "header", "banner", "nav", "menu", "顶部", "导航", "页眉")
+_BOTTOM_WORDS = ("bottom", "footer", "底部", "页脚")
+_MIDDLE_WORDS = ("middle", "center", "centre", "main", "body", "中间", "中部", "正文")
+_LEFT_WORDS = ("left", "左")
+_RIGHT_WORDS = ("right", "右")
+
+
+def configure_screenshots(max_side: int = None, image_format: str = None, quality: int = None,
+                          crop: str = None, viewport_height: int = None, tile: bool = None,
+                          max_tiles: int = None):
+    """
+    Args:
+        max_side (int): longest side of a sent image in pixels, 0 to keep the size
+        image_format (str): "png", "jpeg" or "webp"; "png" keeps the original encoding
+        quality (int): JPEG/WebP quality (1-95)
+        crop (str): "none", "viewport" (first screen, or the focus area) or "focus" (only when
+            a focus area is given and can be located)
+        viewport_height (int): height of one screen in pixels
+        tile (bool): split tall pages into viewport-high tiles
+        max_tiles (int): maximum tiles per screenshot
+    """
+    if image_format is not None and image_format not in FORMATS:
+        raise ValueError(f"Unknown screenshot format: {image_format} (expected one of {FORMATS})")
+    if crop is not None and crop not in CROP_MODES:
+        raise ValueError(f"Unknown screenshot crop mode: {crop} (expected one of {CROP_MODES})")
+    if max_side is not None:
+        _options["max_side"] = max_side or None
+    if image_format is not None:
+        _options["format"] = None if image_format == "png" else image_format
+    if quality is not None:
+        _options["quality"] = quality
+    if crop is not None:
+        _options["crop"] = crop
+    if viewport_height is not None:
+        _options["viewport_height"] = viewport_height
+    if tile is not None:
+        _options["tile"] = tile
+    if max_tiles is not None:
+        _options["max_tiles"] = max(1, max_tiles)
+
+
+def get_screenshot_options() -> Dict:
+    """
+    Returns:
+        dict: the options to pass to prepare_screenshot
+    """
+    return dict(_options)
+
+
+def _mime_type(data: bytes) -> str:
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def focus_box(focus_area: str, width: int, height: int, viewport_height: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Args:
+        focus_area (str): "x,y,w,h" in pixels or fractions of the page, or words such as
+            "header", "footer", "main content", "left sidebar"
+        width (int): image width
+        height (int): image height
+        viewport_height (int): height of one screen
+
+    Returns:
+        tuple: (left, top, right, bottom) crop box, None if the area cannot be located
+    """
+    if not focus_area:
+        return None
+    match = _BOX.match(focus_area)
+    if match:
+        x, y, w, h = (float(v) for v in match.groups())
+        if max(x, y, w, h) <= 1:
+            x, w = x * width, w * width
+            y, h = y * height, h * height
+        box = (max(0, int(x)), max(0, int(y)), min(width, int(x + w)), min(height, int(y + h)))
+        return box if box[2] > box[0] and box[3] > box[1] else None
+
+    area = focus_area.lower()
+    screen = min(viewport_height, height)
+    if any(word in area for word in _TOP_WORDS):
+        top = 0
+    elif any(word in area for word in _BOTTOM_WORDS):
+        top = height - screen
+    elif any(word in area for word in _MIDDLE_WORDS):
+        top = max(0, (height - screen) // 2)
+    else:
+        top = None
+    left, right = 0, width
+    if any(word in area for word in _LEFT_WORDS):
+        right = width // 2
+    elif any(word in area for word in _RIGHT_WORDS):
+        left = width // 2
+    if top is None and (left, right) == (0, width):
+        return None
+    if top is None:
+        top, screen = 0, height
+    return left, top, right, top + screen
+
+
+def _encode(image: Image.Image, options: Dict) -> Tuple[str, bytes]:
+    if options["max_side"] and max(image.size) > options["max_side"]:
+        image = image.copy()
+        image.thumbnail((options["max_side"], options["max_side"]), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image_format = options["format"]
+    if image_format in ("jpeg", "webp"):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, format=image_format.upper(), quality=options["quality"])
+        return f"image/{image_format}", buffer.getvalue()
+    image.save(buffer, format="PNG")
+    return "image/png", buffer.getvalue()
+
+
+def prepare_screenshot(data: bytes, focus_area: str = None, options: Dict = None) -> Dict:
+    """
+    Args:
+        data (bytes): the screenshot file
+        focus_area (str): region the VLM should look at (see focus_box)
+        options (dict): see get_screenshot_options; the configured options if None
+
+    Returns:
+        dict: {"images": [data URLs], "original_bytes", "sent_bytes", "seconds", "cropped", "tiles",
+               "truncated"}
+    """
+    options = options or get_screenshot_options()
+    start = time.perf_counter()
+    result = {"original_bytes": len(data), "cropped": False, "tiles": 1, "truncated": False}
+
+    passthrough = (not options["max_side"] and not options["format"]
+                   and options["crop"] == "none" and not options["tile"])
+    if passthrough:
+        encoded = [(_mime_type(data), data)]
+    else:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            width, height = image.size
+            viewport_height = options["viewport_height"]
+            box = None
+            if options["crop"] != "none":
+                box = focus_box(focus_area, width, height, viewport_height)
+                if box is None and options["crop"] == "viewport":
+                    box = (0, 0, width, min(height, viewport_height))
+            region = image.crop(box) if box else image
+            result["cropped"] = box is not None
+
+            parts = [region]
+            if options["tile"] and region.height > viewport_height * 1.5:
+                tops = list(range(0, region.height, viewport_height))
+                result["truncated"] = len(tops) > options["max_tiles"]
+                parts = [region.crop((0, top, region.width, min(region.height, top + viewport_height)))
+                         for top in tops[:options["max_tiles"]]]
+            result["tiles"] = len(parts)
+            encoded = [_encode(part, options) for part in parts]
+
+    result["images"] = [f"data:{mime};base64,{base64.b64encode(payload).decode()}" for mime, payload in encoded]
+    result["sent_bytes"] = sum(len(payload) for _, payload in encoded)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def record_screenshot(prepared: Dict):
+    """Add a prepared screenshot to the process-wide byte and time totals."""
+    with _stats_lock:
+        _stats["screenshots"] += 1
+        _stats["images"] += len(prepared["images"])
+        _stats["original_bytes"] += prepared["original_bytes"]
+        _stats["sent_bytes"] += prepared["sent_bytes"]
+        _stats["seconds"] += prepared["seconds"]
+
+
+def screenshot_report() -> str:
+    """Bytes saved by screenshot preprocessing in this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    if not stats["screenshots"]:
+        return "screenshots: none sent to the VLM"
+    saved = 1 - stats["sent_bytes"] / max(stats["original_bytes"], 1)
+    return (f"screenshots: {stats['screenshots']} sent as {stats['images']} images, "
+            f"{stats['original_bytes'] / 1e6:.1f} MB -> {stats['sent_bytes'] / 1e6:.1f} MB ({saved:.0%} saved), "
+            f"{stats['seconds'] / stats['screenshots'] * 1000:.0f} ms preprocessing per screenshot")
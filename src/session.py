@@ -0,0 +1,166 @@
+"""
+In-memory state shared by the tools of one agent run.
+
+The tools used to coordinate through files in the working directory
+(BUTTON_URL_ADIC.json, ROOT_URL.txt, nav_chain.json, count.txt, query.txt,
+navigation_steps.txt and current_screenshot.json). A Session holds the same
+state in memory; VGems passes its session to every tool call, so several agents
+can run in one process. The state can still be written to disk in the legacy
+file layout for debugging, and saved/restored as a whole for checkpointing.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from button_index import ButtonIndex
+from vlm_budget import VLMBudget
+
+MAX_PENDING_SCREENSHOTS = 8  # screenshots of pages not analyzed by the VLM yet that are kept
+
+
+class Session:
+    """
+    State of one agent run.
+
+    Args:
+        root_url (str): official website the run starts from
+        query (str): the user query
+        workdir (str): directory for screenshots and snapshots ("" = working directory)
+    """
+
+    def __init__(self, root_url: str = "", query: str = "", workdir: str = ""):
+        self.workdir = workdir
+        self.reset(root_url, query)
+
+    def reset(self, root_url: str = "", query: str = ""):
+        """Clear all state for a new query."""
+        self.root_url = root_url
+        self.query = query
+        self.buttons = ButtonIndex()               # button text -> url(s)
+        self.nav_chain: List[Dict] = []            # url stack, [{"url": ...}, ...]
+        self.count = 0                             # count_usefulness counter
+        self.navigation_steps = 0                  # number of visit_page / visit_url calls
+        self.current_screenshot: Optional[Dict] = None  # {"screenshot_path", "url", "timestamp"}
+        self.pending_screenshots: List[Dict] = []  # pages visited since their last VLM analysis, oldest first
+        self.vlm_budget = VLMBudget()              # VLM calls left to this run
+        self.metrics: Dict = {}                    # per-run measurements (e.g. transcript token counts)
+        self.page_chunks: Dict = {}                # sections of the current page not shown yet (show_more)
+
+    def path(self, name: str) -> str:
+        """
+        Args:
+            name (str): file or folder name
+
+        Returns:
+            str: the path of name inside the session working directory
+        """
+        return os.path.join(self.workdir, name) if self.workdir else name
+
+    @property
+    def image_folder(self) -> str:
+        return self.path("images/")
+
+    def set_screenshot(self, screenshot_path: str, url: str):
+        """Remember the screenshot of the current page for VLM access (None: not captured yet)."""
+        self.current_screenshot = {
+            "screenshot_path": screenshot_path,
+            "url": url,
+            "timestamp": time.time()
+        }
+        self.pending_screenshots = [s for s in self.pending_screenshots if s["url"] != url]
+        self.pending_screenshots.append(self.current_screenshot)
+        del self.pending_screenshots[:-MAX_PENDING_SCREENSHOTS]
+
+    def mark_analyzed(self, urls):
+        """Drop pages sent to the VLM from the pending screenshots."""
+        urls = set(urls)
+        self.pending_screenshots = [s for s in self.pending_screenshots if s["url"] not in urls]
+
+    def to_dict(self) -> Dict:
+        return {
+            "root_url": self.root_url,
+            "query": self.query,
+            "buttons": self.buttons.to_json(),
+            "nav_chain": self.nav_chain,
+            "count": self.count,
+            "navigation_steps": self.navigation_steps,
+            "current_screenshot": self.current_screenshot,
+            "pending_screenshots": self.pending_screenshots,
+            "vlm_budget": self.vlm_budget.to_dict(),
+            "metrics": self.metrics,
+            "page_chunks": self.page_chunks,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, workdir: str = "") -> "Session":
+        session = cls(data.get("root_url", ""), data.get("query", ""), workdir)
+        session.buttons = ButtonIndex.from_json(data.get("buttons", {}))
+        session.nav_chain = list(data.get("nav_chain", []))
+        session.count = int(data.get("count", 0))
+        session.navigation_steps = int(data.get("navigation_steps", 0))
+        session.current_screenshot = data.get("current_screenshot")
+        session.pending_screenshots = list(data.get("pending_screenshots", []))
+        if "vlm_budget" in data:
+            session.vlm_budget = VLMBudget.from_dict(data["vlm_budget"])
+        session.metrics = dict(data.get("metrics", {}))
+        session.page_chunks = dict(data.get("page_chunks", {}))
+        return session
+
+    def save(self, file_path: str):
+        """Save the whole session to one JSON file (checkpointing)."""
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str, workdir: str = "") -> "Session":
+        """Restore a session saved with save()."""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), workdir)
+
+    def snapshot(self, directory: str = None):
+        """
+        Write the state in the legacy file layout, for debugging.
+
+        Args:
+            directory (str): target directory (defaults to the session working directory)
+        """
+        directory = directory if directory is not None else self.workdir
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        def target(name):
+            return os.path.join(directory, name) if directory else name
+
+        with open(target("BUTTON_URL_ADIC.json"), "w") as f:
+            json.dump(self.buttons.to_dict(), f, ensure_ascii=False, indent=2)
+        with open(target("ROOT_URL.txt"), "w") as f:
+            f.write(self.root_url)
+        with open(target("nav_chain.json"), "w") as f:
+            json.dump(self.nav_chain, f, ensure_ascii=False)
+        with open(target("count.txt"), "w") as f:
+            f.write(str(self.count))
+        with open(target("query.txt"), "w", encoding="utf-8") as f:
+            f.write(self.query)
+        with open(target("navigation_steps.txt"), "w") as f:
+            f.write(str(self.navigation_steps))
+        if self.current_screenshot:
+            with open(target("current_screenshot.json"), "w") as f:
+                json.dump(self.current_screenshot, f)
+
+
+_default_session = Session()
+
+
+def get_session(kwargs: Dict) -> Session:
+    """
+    Args:
+        kwargs (dict): keyword arguments of a tool call
+
+    Returns:
+        Session: the session passed by the agent, or the process-wide default one
+    """
+    return kwargs.get("session") or _default_session
@@ -0,0 +1,224 @@
+"""
+Browser-free fast path for static pages.
+
+Most university and organization sites serve their content in the HTML
+itself, yet every page went through headless Chromium. With the "auto" fetch
+tier, get_info first tries a plain HTTP GET on a pooled httpx client and
+converts the HTML to markdown with crawl4ai's markdown generator, and only
+uses the browser when
+
+- a screenshot is needed,
+- the request fails or does not return HTML,
+- the page looks rendered by JavaScript: little text, or an empty SPA
+  container (<div id="app"></div>, ...) or a "please enable JavaScript" notice.
+
+The tier that worked is remembered per host (and across runs in the host
+profiles). A host is switched to the browser, so that later visits skip the
+HTTP attempt, only after BROWSER_AFTER_MISSES of its pages looked rendered by
+JavaScript and none was served over HTTP; failed requests and non-HTML or
+non-200 replies send that page to the browser without counting against the
+host.
+"""
+
+import asyncio
+import re
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+
+from host_profiles import get_host_profiles
+from page_processing import run_cpu_async
+
+FETCH_TIERS = ("browser", "auto")
+MIN_TEXT_CHARS = 200   # fewer text characters than this means the page needs the browser
+HTTP_TIMEOUT = 15.0    # seconds per HTTP request
+BROWSER_AFTER_MISSES = 3  # JavaScript-rendered pages of a host without static pages before it skips HTTP
+
+_options = {"tier": "browser", "min_text": MIN_TEXT_CHARS, "timeout": HTTP_TIMEOUT}
+
+# A desktop browser user agent: some sites refuse unknown clients
+_HEADERS = {
+    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/124.0 Safari/537.36"),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+_SPA_SHELL = re.compile(
+    r'<div[^>]+id=["\'](?:app|root|__next|__nuxt|main-app)["\'][^>]*>\s*</div>'
+    r'|<noscript>[^<]*(?:enable|turn on|启用|开启)[^<]*javascript',
+    re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+_MARKDOWN_LINK = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+_TEXT_CHAR = re.compile(r'[\u4e00-\u9fa5a-zA-Z0-9]')
+
+# Async clients are bound to the event loop their connections were opened on
+_clients = weakref.WeakKeyDictionary()
+_host_tiers: Dict[str, str] = {}   # host -> "http" (served a static page) or "browser"
+_host_misses: Dict[str, int] = {}  # host -> pages that looked rendered by JavaScript
+_stats = {"http": 0, "escalated": 0, "browser": 0, "skipped": 0}
+_lock = threading.Lock()
+
+
+def configure_fetch_tiers(tier: str = None, min_text: int = None, timeout: float = None):
+    """
+    Args:
+        tier (str): "browser" fetches every page with the browser; "auto" tries HTTP first
+        min_text (int): text characters below which a page is fetched again with the browser
+        timeout (float): HTTP request timeout in seconds
+    """
+    if tier is not None and tier not in FETCH_TIERS:
+        raise ValueError(f"Unknown fetch tier: {tier} (expected one of {FETCH_TIERS})")
+    if tier is not None:
+        _options["tier"] = tier
+    if min_text is not None:
+        _options["min_text"] = min_text
+    if timeout is not None:
+        _options["timeout"] = timeout
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def use_http(url: str) -> bool:
+    """
+    Returns:
+        bool: whether to try the HTTP tier for url (auto tier, and the host did not need the browser)
+    """
+    if _options["tier"] != "auto":
+        return False
+    with _lock:
+        # Known from this run, else from the host profiles of earlier runs
+        tier = _host_tiers.get(_host(url))
+    if tier is None:
+        tier = get_host_profiles().tier(url)
+    if tier == "browser":
+        with _lock:
+            _stats["skipped"] += 1
+        return False
+    return True
+
+
+def record_browser_fetch(url: str):
+    """Count a page fetched with the browser (whether or not HTTP was tried first)."""
+    with _lock:
+        _stats["browser"] += 1
+
+
+def _client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(headers=_HEADERS, follow_redirects=True, timeout=_options["timeout"],
+                                       limits=httpx.Limits(max_connections=50, max_keepalive_connections=10))
+            _clients[loop] = client
+        return client
+
+
+def _decode(response: httpx.Response) -> str:
+    # Many sites declare their charset (often GBK) only in a <meta> tag
+    if "charset" not in response.headers.get("content-type", "").lower():
+        match = _META_CHARSET.search(response.content[:4096])
+        if match:
+            try:
+                return response.content.decode(match.group(1).decode("ascii"), errors="replace")
+            except LookupError:
+                pass
+    return response.text
+
+
+def html_to_markdown(html: str, url: str) -> str:
+    """Markdown of a page with the generator the crawler uses (runs in the page processing pool)."""
+    result = DefaultMarkdownGenerator().generate_markdown(html, url)
+    return str(result.raw_markdown)
+
+
+def looks_js_rendered(html: str, markdown: str, min_text: int = MIN_TEXT_CHARS) -> bool:
+    """
+    Args:
+        html (str): raw html
+        markdown (str): its markdown
+        min_text (int): minimum number of text characters of a static page
+
+    Returns:
+        bool: whether the content is probably rendered by JavaScript (needs the browser)
+    """
+    text_chars = len(_TEXT_CHAR.findall(_MARKDOWN_LINK.sub(r'\1', markdown or "")))
+    if text_chars < min_text:
+        return True
+    # An SPA container or a noscript notice on a page with little text
+    return text_chars < min_text * 5 and _SPA_SHELL.search(html) is not None
+
+
+async def fetch_static(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Fetch a page without the browser.
+
+    Returns:
+        tuple: (html, raw markdown), None if the page needs the browser (a host whose pages
+            repeatedly look rendered by JavaScript, and never static, is then fetched with the
+            browser from now on)
+    """
+    host = _host(url)
+    try:
+        response = await _client().get(url)
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or "html" not in content_type.lower():
+            html = None
+        else:
+            html = _decode(response)
+    except httpx.HTTPError as e:
+        print(f"[INFO] HTTP fetch of {url} failed ({type(e).__name__}), using the browser")
+        html = None
+
+    if html is None:
+        # Says nothing about how the host renders its pages: only this page goes to the browser
+        with _lock:
+            _stats["escalated"] += 1
+        return None
+    markdown = await run_cpu_async(html_to_markdown, html, url)
+    if looks_js_rendered(html, markdown, _options["min_text"]):
+        with _lock:
+            _stats["escalated"] += 1
+            _host_misses[host] = _host_misses.get(host, 0) + 1
+            # A host that served static pages keeps the HTTP tier; one that never did skips it
+            # once several of its pages needed the browser
+            switch = _host_misses[host] >= BROWSER_AFTER_MISSES and _host_tiers.get(host) != "http"
+            if switch:
+                _host_tiers[host] = "browser"
+        if switch:
+            get_host_profiles().record_tier(url, "browser")
+        return None
+    with _lock:
+        _stats["http"] += 1
+        _host_tiers[host] = "http"
+    get_host_profiles().record_tier(url, "http")
+    return html, markdown
+
+
+async def aclose_static_clients():
+    """Close the HTTP client bound to the running event loop, if any."""
+    with _lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def fetch_tier_report() -> str:
+    """Pages fetched per tier in this process."""
+    with _lock:
+        stats = dict(_stats)
+        browser_hosts = sum(1 for tier in _host_tiers.values() if tier == "browser")
+        hosts = len(_host_tiers)
+    total = stats["http"] + stats["browser"]
+    if not total:
+        return "fetch tiers: no pages fetched"
+    return (f"fetch tiers ({_options['tier']}): {stats['http']}/{total} pages over HTTP, {stats['browser']} with "
+            f"the browser ({stats['escalated']} after an HTTP attempt, {stats['skipped']} skipped HTTP); "
+            f"{browser_hosts}/{hosts} hosts need the browser")
@@ -11,11 +11,24 @@ from qwen_agent.tools.base import BaseTool, register_tool
 import re
 import json
 import asyncio
+import time
 from utils import *
+from background_loop import run_sync
+from session import get_session
+from link_extraction import current_engine, extract_links
+from page_processing import run_cpu, run_cpu_async, submit_cpu
+from llm_trace import traced_create
+from llm_cache import get_llm_cache
+from llm_clients import get_client
+from page_chunking import chunk_page, get_budget as get_chunk_budget, render_chunks, take_within_budget
+from screenshot_processing import get_screenshot_options, prepare_screenshot, record_screenshot
+from vlm_budget import get_vlm_options
+from prefetch import get_prefetcher
+from understanding_heuristics import (get_understanding_settings, heuristic_scores, lexical_relevance,
+                                      recommend, record_relevance, relevance_can_change_decision,
+                                      special_cases_score, structure_score, text_quality_score)
 import base64
 from PIL import Image
-from bs4 import BeautifulSoup
-from openai import OpenAI
 
 # LLM configuration
 llm_cfg = {
@@ -29,238 +42,98 @@ llm_cfg = {
     },
 }
 
-path = 'count.txt'
-
 
 def run_async_in_sync(coro):
     """
-    Smart async runner that works both inside and outside event loops.
+    Run coro on the persistent background event loop and wait for the result.
 
-    - If already in an event loop (e.g., called from async function): use existing loop
-    - If not in an event loop (e.g., Streamlit): create new loop with asyncio.run()
+    Works both inside and outside a running event loop. All tool calls share
+    the same loop, so the browser pool stays alive between page visits.
     """
-    try:
-        # Try to get the running event loop
-        loop = asyncio.get_running_loop()
-        # We're already in an event loop, need to create a task
-        import concurrent.futures
-        import threading
-
-        result = [None]
-        exception = [None]
-
-        def run_in_thread():
-            try:
-                # Create a new event loop in the thread
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                result[0] = new_loop.run_until_complete(coro)
-                new_loop.close()
-            except Exception as e:
-                exception[0] = e
+    return run_sync(coro)
 
-        thread = threading.Thread(target=run_in_thread)
-        thread.start()
-        thread.join()
 
-        if exception[0]:
-            raise exception[0]
-        return result[0]
+def save_screenshot_info(screenshot_path, url, session=None):
+    """Remember the current screenshot in the session for VLM access"""
+    (session or get_session({})).set_screenshot(screenshot_path, url)
 
-    except RuntimeError:
-        # No event loop running, use asyncio.run() normally
-        return asyncio.run(coro)
 
+def _index_links(unique_links, session):
+    # Add to the session's button index (labels pointing to several urls keep all of them)
+    session.buttons.update(unique_links)
+    # Warm the page cache with the likeliest next clicks while the LLM decides
+    get_prefetcher().schedule(unique_links, session.query, prefetch_page)
 
-def save_screenshot_info(screenshot_path, url):
-    """Save current screenshot information to a JSON file for VLM access"""
-    import time
-    try:
-        with open("current_screenshot.json", "w") as f:
-            json.dump({
-                "screenshot_path": screenshot_path,
-                "url": url,
-                "timestamp": time.time()
-            }, f)
-    except Exception as e:
-        print(f"Failed to save screenshot info: {e}")
+    # Format output
+    info = ""
+    for i in unique_links:
+        info += "<button>" + i["text"] + "<button>" + "\n"
+    return info
 
 
-def extract_links_with_text(html, current_url):
+def extract_links_with_text(html, current_url, session=None):
     """
     Extract links with text from HTML, intelligently capturing context for generic button names.
     """
-    with open("ROOT_URL.txt", "r") as f:
-        ROOT_URL = f.read()
-    soup = BeautifulSoup(html, 'html.parser')
-    links = []
-
-    # Extract main domain for subdomain matching
-    from urllib.parse import urlparse
-    root_parsed = urlparse(ROOT_URL)
-    root_domain = '.'.join(root_parsed.netloc.split('.')[-2:])  # e.g., "yau.edu.cn" from "https://yau.edu.cn"
-
-    # Generic words that need context
-    generic_words = {
-        '查看更多', '更多', 'more', 'More', 'MORE', '详情', '点击进入',
-        'More »', '>>', '...', '››', '»', '→', '进入', '查看',
-        '了解更多', 'Learn More', 'Read More', 'View More', 'See More',
-        '查看详情', 'Details', 'View Details', '>', '»»', '>>|'
-    }
-
-    def is_same_domain(url):
-        """Check if URL belongs to the same main domain or subdomain"""
-        try:
-            parsed = urlparse(url)
-            url_domain = '.'.join(parsed.netloc.split('.')[-2:])
-            return url_domain == root_domain
-        except:
-            return False
-
-    def find_context_for_link(a_tag):
-        """Find meaningful context for a link"""
-        text = a_tag.get('title') or a_tag.get('aria-label') or ''.join(a_tag.stripped_strings)
-
-        if not text or text.strip() in generic_words:
-            original_text = text or '更多'
-            context = None
-
-            # Method 1: Look for previous sibling elements
-            prev_sibling = a_tag.find_previous_sibling(['span', 'h1', 'h2', 'h3', 'h4', 'h5', 'div', 'p', 'strong', 'b'])
-            if prev_sibling:
-                context_text = ''.join(prev_sibling.stripped_strings).strip()
-                if context_text and len(context_text) < 50:
-                    context = context_text
-
-            # Method 2: Look for parent element with title/heading
-            if not context:
-                parent = a_tag.find_parent(['div', 'li', 'section', 'article', 'td'])
-                if parent:
-                    title_elem = parent.find(['h1', 'h2', 'h3', 'h4', 'h5', 'span', 'div', 'p'],
-                                           class_=re.compile(r'title|header|heading|name', re.I))
-                    if title_elem and title_elem != a_tag:
-                        context_text = ''.join(title_elem.stripped_strings).strip()
-                        if context_text and len(context_text) < 50:
-                            context = context_text
-
-            # Method 3: Look for nearby text nodes
-            if not context:
-                parent = a_tag.find_parent(['div', 'li', 'td'])
-                if parent:
-                    for elem in parent.children:
-                        if elem == a_tag:
-                            break
-                        if hasattr(elem, 'stripped_strings'):
-                            nearby_text = ''.join(elem.stripped_strings).strip()
-                            if nearby_text and len(nearby_text) < 50:
-                                context = nearby_text
-                                break
-
-            if context:
-                context = context.rstrip('：:')
-                text = f"{context} - {original_text}"
-            elif not text:
-                text = original_text
-
-        return text.strip() if text else None
-
-    # Extract <a> tags with href
-    for a_tag in soup.find_all('a', href=True):
-        url = a_tag['href']
-
-        # Skip javascript:void(0) links, but process their children for dropdown menus
-        if "javascript:void(0)" in url or url == "#":
-            # This might be a dropdown menu parent, check for child links
-            for child_a in a_tag.find_next_siblings('a', href=True, limit=10):
-                child_url = child_a['href']
-                if child_url and "javascript" not in child_url and not child_url.endswith(('.jpg', '.png', '.gif', '.jpeg', '.pdf')):
-                    full_url = process_url(current_url, child_url)
-                    if is_same_domain(full_url):
-                        child_text = find_context_for_link(child_a)
-                        if child_text:
-                            links.append({'url': full_url, 'text': child_text})
-            continue
-
-        text = find_context_for_link(a_tag)
-
-        if text and "javascript" not in url and not url.endswith(('.jpg', '.png', '.gif', '.jpeg', '.pdf')):
-            full_url = process_url(current_url, url)
-            if is_same_domain(full_url):  # Changed from startswith(ROOT_URL)
-                links.append({'url': full_url, 'text': text})
-
-    # Extract <a> tags with onclick
-    for a_tag in soup.find_all('a', onclick=True):
-        onclick_text = a_tag['onclick']
-        text = find_context_for_link(a_tag)
-
-        match = re.search(r"window\.location\.href='([^']*)'", onclick_text)
-        if match:
-            url = match.group(1)
-            if url and text and not url.endswith(('.jpg', '.png', '.gif', '.jpeg', '.pdf')):
-                full_url = process_url(current_url, url)
-                if is_same_domain(full_url):  # Changed from startswith(ROOT_URL)
-                    links.append({'url': full_url, 'text': text})
-
-    # Extract <a> tags with data-url
-    for a_tag in soup.find_all('a', attrs={'data-url': True}):
-        url = a_tag['data-url']
-        text = find_context_for_link(a_tag)
-        if url and text and not url.endswith(('.jpg', '.png', '.gif', '.jpeg', '.pdf')):
-            full_url = process_url(current_url, url)
-            if is_same_domain(full_url):  # Changed from startswith(ROOT_URL)
-                links.append({'url': full_url, 'text': text})
-
-    # Extract <a> tags with herf-mask class
-    for a_tag in soup.find_all('a', class_='herf-mask'):
-        url = a_tag.get('href')
-        text = find_context_for_link(a_tag)
-        if url and text and not url.endswith(('.jpg', '.png', '.gif', '.jpeg', '.pdf')):
-            full_url = process_url(current_url, url)
-            if is_same_domain(full_url):  # Changed from startswith(ROOT_URL)
-                links.append({'url': full_url, 'text': text})
-
-    # Extract <button> tags with onclick
-    for button in soup.find_all('button', onclick=True):
-        onclick_text = button['onclick']
-        text = button.get('title') or button.get('aria-label') or ''.join(button.stripped_strings)
-        match = re.search(r"window\.location\.href='([^']*)'", onclick_text)
-        if match:
-            url = match.group(1)
-            if url and text:
-                full_url = process_url(current_url, url)
-                if is_same_domain(full_url):  # Changed from startswith(ROOT_URL)
-                    links.append({'url': full_url, 'text': text})
-
-    # Remove duplicates
-    unique_links = {}
-    for item in links:
-        key = item['url']
-        if key in unique_links:
-            existing_text = unique_links[key]['text']
-            new_text = item['text']
-            if ' - ' in new_text and ' - ' not in existing_text:
-                unique_links[key] = item
-            elif len(new_text) > len(existing_text):
-                unique_links[key] = item
-        else:
-            unique_links[key] = item
-
-    # Save to BUTTON_URL_ADIC.json
-    if not os.path.exists("BUTTON_URL_ADIC.json"):
-        with open("BUTTON_URL_ADIC.json", "w") as f:
-            json.dump({}, f)
-    with open("BUTTON_URL_ADIC.json", "r") as f:
-        BUTTON_URL_ADIC = json.load(f)
-    for temp in list(unique_links.values()):
-        BUTTON_URL_ADIC[temp["text"]] = temp["url"]
-    with open("BUTTON_URL_ADIC.json", "w") as f:
-        json.dump(BUTTON_URL_ADIC, f, ensure_ascii=False, indent=2)
+    session = session or get_session({})
+    # Parse in the page processing pool (inline unless configured); only strings are sent
+    unique_links = run_cpu(extract_links, html or "", current_url, session.root_url, current_engine())
+    return _index_links(unique_links, session)
 
-    # Format output
-    info = ""
-    for i in list(unique_links.values()):
-        info += "<button>" + i["text"] + "<button>" + "\n"
-    return info
+
+async def aextract_links_with_text(html, current_url, session=None):
+    """Async version of extract_links_with_text that does not block the event loop."""
+    session = session or get_session({})
+    unique_links = await run_cpu_async(extract_links, html or "", current_url, session.root_url, current_engine())
+    return _index_links(unique_links, session)
+
+
+def _write_screenshot(screenshot, session):
+    """Write a base64 screenshot to the session image folder and return its path."""
+    image_folder = session.image_folder
+    if not os.path.exists(image_folder):
+        os.makedirs(image_folder)
+
+    # Get next image index
+    image_files = [f for f in os.listdir(image_folder) if f.endswith(('.png', '.jpg', '.jpeg'))]
+    image_index = len(image_files)
+    image_path = os.path.join(image_folder, f"{image_index}.png")
+
+    with open(image_path, "wb") as f:
+        f.write(base64.b64decode(screenshot))
+    return image_path
+
+
+def _save_screenshot(screenshot, url, session):
+    """Write a base64 screenshot to the session image folder and remember it for VLM access."""
+    save_screenshot_info(_write_screenshot(screenshot, session), url, session)
+
+
+async def _capture_all(urls):
+    return await asyncio.gather(*(capture_screenshot(url) for url in urls))
+
+
+def _page_view(markdown, url, session):
+    """Page content for an observation: the most relevant sections within the token budget, if one is set."""
+    budget = get_chunk_budget()
+    if not budget or not markdown:
+        session.page_chunks = {}
+        return markdown
+    content, state = chunk_page(markdown, session.query, budget)
+    session.page_chunks = dict(state, url=url) if state["remaining"] else {}
+    return content
+
+
+def _normalize_params(params: str) -> str:
+    if not params.strip().endswith("}"):
+        if "}" in params.strip():
+            params = "{" + get_content_between_a_b("{", "}", params) + "}"
+        else:
+            if not params.strip().endswith("\""):
+                params = params.strip() + "\"}"
+            else:
+                params = params.strip() + "}"
+    return "{" + get_content_between_a_b("{", "}", params) + "}"
 
 
 @register_tool('visit_page', allow_overwrite=True)
@@ -274,89 +147,94 @@ class VisitPage(BaseTool):
         'required': True
     }]
 
-    def call(self, params: str, **kwargs) -> str:
-        if not params.strip().endswith("}"):
-            if "}" in params.strip():
-                params = "{" + get_content_between_a_b("{", "}", params) + "}"
-            else:
-                if not params.strip().endswith("\""):
-                    params = params.strip() + "\"}"
-                else:
-                    params = params.strip() + "}"
-        params = "{" + get_content_between_a_b("{", "}", params) + "}"
-
+    def _resolve(self, params: str, session):
+        """
+        Returns:
+            tuple: (url, note) for a known button, where note lists the other pages of a button
+                text shared by several links (None if there are none), (None, response) otherwise
+        """
+        params = _normalize_params(params)
         if 'button' in json5.loads(params):
-            with open("BUTTON_URL_ADIC.json", "r") as f:
-                BUTTON_URL_ADIC = json.load(f)
-            if json5.loads(params)['button'].replace("<button>", "") in BUTTON_URL_ADIC:
-                button_text = json5.loads(params)['button'].replace("<button>", "")
-                url = BUTTON_URL_ADIC[button_text]
-
+            button_text = json5.loads(params)['button'].replace("<button>", "")
+            # Exact label, then case-insensitive label, then a numbered label ("更多 #2")
+            url = session.buttons.resolve(button_text)
+            if url:
                 # Increment navigation step counter
-                try:
-                    with open("navigation_steps.txt", "r") as f:
-                        steps = int(f.read().strip() or "0")
-                    with open("navigation_steps.txt", "w") as f:
-                        f.write(str(steps + 1))
-                except:
-                    with open("navigation_steps.txt", "w") as f:
-                        f.write("1")
-
-                # Use run_async_in_sync to handle both sync and async contexts
-                html, markdown, screenshot = run_async_in_sync(get_info(url))
-
-                # Save screenshot if available
-                if screenshot:
-                    print("get screenshot!")
-                    image_folder = "images/"
-                    if not os.path.exists(image_folder):
-                        os.makedirs(image_folder)
-
-                    # Get next image index
-                    image_files = [f for f in os.listdir(image_folder) if f.endswith(('.png', '.jpg', '.jpeg'))]
-                    image_index = len(image_files)
-                    image_path = os.path.join(image_folder, f"{image_index}.png")
-
-                    with open(image_path, "wb") as f:
-                        f.write(base64.b64decode(screenshot))
-                    save_screenshot_info(image_path, url)
-
-                response_buttons = extract_links_with_text(html, url)
-                response_content = markdown
-
-                # Read all discovered buttons from BUTTON_URL_ADIC
-                try:
-                    with open("BUTTON_URL_ADIC.json", "r") as f:
-                        all_discovered_buttons = json.load(f)
-                    all_button_names = list(all_discovered_buttons.keys())
-
-                    if response_content:
-                        response = f"The url now is {url}.\n\n"
-                        response += "=== CURRENT PAGE ===\n"
-                        response += f"Website information:\n{response_content}\n\n"
-                        response += f"Clickable buttons on THIS page:\n{response_buttons}\n\n"
-                        response += "=== GLOBAL DISCOVERY ===\n"
-                        response += f"All discovered buttons (from all visited pages): {', '.join(all_button_names[:30])}"
-                        if len(all_button_names) > 30:
-                            response += f" ... and {len(all_button_names) - 30} more"
-                        response += "\nYou can visit ANY of these discovered buttons using visit_page action.\n\n"
-                        response += "💡 STRATEGY: Breadth-first is more efficient - explore sibling pages at current level before going deeper.\n"
-                    else:
-                        response = f"The url now is {url}.\n\n The information of the current page is not accessible\n\n"
-                        response += "Clickable buttons are wrapped in <button> tag" + response_buttons
-                except Exception as e:
-                    print(f"[WARNING] Failed to read BUTTON_URL_ADIC: {e}")
-                    if response_content:
-                        response = f"The url now is {url}.\n\n The web information is:\n\n" + response_content + "\n\n"
-                    else:
-                        response = f"The url now is {url}.\n\n The information of the current page is not accessible\n\n"
-                    response += "Clickable buttons are wrapped in <button> tag" + response_buttons
-
-                return response
+                session.navigation_steps += 1
+                others = session.buttons.alternatives(button_text, url)
+                note = None
+                if others:
+                    note = (f"\nOther pages have the same button text; to open one of them, click "
+                            + ", ".join("<button>" + b + "<button>" for b in others))
+                return url, note
             else:
-                return "The button can not be clicked, please retry a new button!"
+                response = "The button can not be clicked, please retry a new button!"
+                # Suggested, not clicked: a different label may lead to a different page
+                similar = session.buttons.suggest(button_text, limit=5)
+                if similar:
+                    response += " Similar buttons: " + ", ".join("<button>" + b + "<button>" for b in similar)
+                return None, response
         else:
-            return "Your input is invalid, please output the action input correctly!"
+            return None, "Your input is invalid, please output the action input correctly!"
+
+    def _respond(self, url, markdown, screenshot, response_buttons, session):
+        # Save screenshot if available
+        if screenshot:
+            print("get screenshot!")
+            _save_screenshot(screenshot, url, session)
+        elif screenshots_on_demand():
+            # Taken when use_vlm_analysis asks for it
+            session.set_screenshot(None, url)
+
+        response_content = _page_view(markdown, url, session)
+
+        # Read all discovered buttons from the session
+        try:
+            all_discovered_buttons = session.buttons
+            all_button_names = list(all_discovered_buttons.keys())
+
+            if response_content:
+                response = f"The url now is {url}.\n\n"
+                response += "=== CURRENT PAGE ===\n"
+                response += f"Website information:\n{response_content}\n\n"
+                response += f"Clickable buttons on THIS page:\n{response_buttons}\n\n"
+                response += "=== GLOBAL DISCOVERY ===\n"
+                response += f"All discovered buttons (from all visited pages): {', '.join(all_button_names[:30])}"
+                if len(all_button_names) > 30:
+                    response += f" ... and {len(all_button_names) - 30} more"
+                response += "\nYou can visit ANY of these discovered buttons using visit_page action.\n\n"
+                response += "💡 STRATEGY: Breadth-first is more efficient - explore sibling pages at current level before going deeper.\n"
+            else:
+                response = f"The url now is {url}.\n\n The information of the current page is not accessible\n\n"
+                response += "Clickable buttons are wrapped in <button> tag" + response_buttons
+        except Exception as e:
+            print(f"[WARNING] Failed to read BUTTON_URL_ADIC: {e}")
+            if response_content:
+                response = f"The url now is {url}.\n\n The web information is:\n\n" + response_content + "\n\n"
+            else:
+                response = f"The url now is {url}.\n\n The information of the current page is not accessible\n\n"
+            response += "Clickable buttons are wrapped in <button> tag" + response_buttons
+
+        return response
+
+    def call(self, params: str, **kwargs) -> str:
+        session = get_session(kwargs)
+        url, message = self._resolve(params, session)
+        if url is None:
+            return message
+        # Fetch on the shared background event loop
+        html, markdown, screenshot = run_async_in_sync(fetch_page(url))
+        response_buttons = extract_links_with_text(html, url, session)
+        return self._respond(url, markdown, screenshot, response_buttons, session) + (message or "")
+
+    async def acall(self, params: str, **kwargs) -> str:
+        session = get_session(kwargs)
+        url, message = self._resolve(params, session)
+        if url is None:
+            return message
+        html, markdown, screenshot = await fetch_page(url)
+        response_buttons = await aextract_links_with_text(html, url, session)
+        return self._respond(url, markdown, screenshot, response_buttons, session) + (message or "")
 
 
 @register_tool('visit_url', allow_overwrite=True)
@@ -370,77 +248,47 @@ class VisitUrl(BaseTool):
         'required': True
     }]
 
-    def call(self, params: str, **kwargs) -> str:
-        if not params.strip().endswith("}"):
-            if "}" in params.strip():
-                params = "{" + get_content_between_a_b("{", "}", params) + "}"
-            else:
-                if not params.strip().endswith("\""):
-                    params = params.strip() + "\"}"
-                else:
-                    params = params.strip() + "}"
-        params = "{" + get_content_between_a_b("{", "}", params) + "}"
+    def _resolve(self, params: str, session):
+        """
+        Returns:
+            tuple: (url, None) for a url inside ROOT_URL, (None, response) otherwise
+        """
+        params = _normalize_params(params)
 
         try:
             data = json5.loads(params)
         except Exception:
-            return "invalid params"
+            return None, "invalid params"
 
         url = str(data.get('url', '')).strip()
         if not url:
-            return "invalid params: missing url"
+            return None, "invalid params: missing url"
 
-        try:
-            with open("ROOT_URL.txt", "r") as f:
-                ROOT_URL = f.read().strip()
-        except Exception:
-            ROOT_URL = ""
+        ROOT_URL = session.root_url.strip()
 
         # Domain guard
         if ROOT_URL and not process_url(ROOT_URL, url).startswith(ROOT_URL):
-            return "invalid url: out of ROOT_URL domain"
+            return None, "invalid url: out of ROOT_URL domain"
 
         # Increment navigation step counter
-        try:
-            with open("navigation_steps.txt", "r") as f:
-                steps = int(f.read().strip() or "0")
-            with open("navigation_steps.txt", "w") as f:
-                f.write(str(steps + 1))
-        except:
-            with open("navigation_steps.txt", "w") as f:
-                f.write("1")
-
-        try:
-            # Use run_async_in_sync to handle both sync and async contexts
-            html, markdown, screenshot = run_async_in_sync(get_info(url))
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch URL: {e}")
-            return "failed to fetch url"
+        session.navigation_steps += 1
+        return url, None
 
+    def _respond(self, url, markdown, screenshot, response_buttons, session):
         # Save screenshot if available
         if screenshot:
             try:
-                image_folder = "images/"
-                if not os.path.exists(image_folder):
-                    os.makedirs(image_folder)
-
-                image_files = [f for f in os.listdir(image_folder) if f.endswith(('.png', '.jpg', '.jpeg'))]
-                image_index = len(image_files)
-                image_path = os.path.join(image_folder, f"{image_index}.png")
-
-                with open(image_path, "wb") as f:
-                    f.write(base64.b64decode(screenshot))
-                save_screenshot_info(image_path, url)
+                _save_screenshot(screenshot, url, session)
             except Exception as e:
                 print(f"[WARNING] Failed to save screenshot: {e}")
+        elif screenshots_on_demand():
+            session.set_screenshot(None, url)
 
-        response_buttons = extract_links_with_text(html, url)
-        response_content = markdown
+        response_content = _page_view(markdown, url, session)
 
         # Read all discovered buttons
         try:
-            with open("BUTTON_URL_ADIC.json", "r") as f:
-                all_discovered_buttons = json.load(f)
+            all_discovered_buttons = session.buttons
             all_button_names = list(all_discovered_buttons.keys())
 
             response = f"The url now is {url}.\n\n"
@@ -460,11 +308,59 @@ class VisitUrl(BaseTool):
 
         return response
 
+    def call(self, params: str, **kwargs) -> str:
+        session = get_session(kwargs)
+        url, error = self._resolve(params, session)
+        if error:
+            return error
+
+        try:
+            # Fetch on the shared background event loop
+            html, markdown, screenshot = run_async_in_sync(fetch_page(url))
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch URL: {e}")
+            return "failed to fetch url"
+
+        response_buttons = extract_links_with_text(html, url, session)
+        return self._respond(url, markdown, screenshot, response_buttons, session)
+
+    async def acall(self, params: str, **kwargs) -> str:
+        session = get_session(kwargs)
+        url, error = self._resolve(params, session)
+        if error:
+            return error
+
+        try:
+            html, markdown, screenshot = await fetch_page(url)
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch URL: {e}")
+            return "failed to fetch url"
+
+        response_buttons = await aextract_links_with_text(html, url, session)
+        return self._respond(url, markdown, screenshot, response_buttons, session)
+
+
+@register_tool('show_more', allow_overwrite=True)
+class ShowMore(BaseTool):
+    """Page through the sections of the current page left out of the last observation."""
+    description = 'Long pages are shortened to their sections most relevant to the query. Call this tool to read the next most relevant sections of the current page that were not shown yet.'
+    parameters = []
+
+    def call(self, params: str, **kwargs) -> str:
+        session = get_session(kwargs)
+        state = session.page_chunks
+        if not state or not state.get("remaining"):
+            return "There is no more content on the current page."
+        chunks = state["chunks"]
+        selected, remaining = take_within_budget(chunks, state["remaining"], get_chunk_budget() or 0)
+        state["remaining"] = remaining
+        return f"More content of {state['url']}:\n\n" + render_chunks(chunks, selected, remaining)
+
 
 @register_tool('url_stack', allow_overwrite=True)
 class UrlStack(BaseTool):
     """Manage a simple URL stack for navigation."""
-    description = 'Manage a simple URL stack for navigation. Persisted in nav_chain.json.'
+    description = 'Manage a simple URL stack for navigation. Persisted in the agent session.'
     parameters = [{
         'name': 'op',
         'type': 'string',
@@ -482,26 +378,12 @@ class UrlStack(BaseTool):
         'required': False
     }]
 
-    FILE_PATH = 'nav_chain.json'
+    def _load(self, session):
+        return list(session.nav_chain)
 
-    def _load(self):
-        try:
-            if os.path.exists(self.FILE_PATH):
-                with open(self.FILE_PATH, 'r') as f:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        return data
-        except Exception:
-            pass
-        return []
-
-    def _save(self, stack):
-        try:
-            with open(self.FILE_PATH, 'w') as f:
-                json.dump(stack, f, ensure_ascii=False)
-            return True
-        except Exception:
-            return False
+    def _save(self, session, stack):
+        session.nav_chain = stack
+        return True
 
     def _normalize_url(self, url: str) -> str:
         try:
@@ -540,11 +422,12 @@ class UrlStack(BaseTool):
             return json.dumps({"ok": False, "error": "invalid params"}, ensure_ascii=False)
 
         op = str(data.get('op', '')).lower()
-        stack = self._load()
+        session = get_session(kwargs)
+        stack = self._load(session)
 
         if op == 'reset':
             stack = []
-            self._save(stack)
+            self._save(session, stack)
             return json.dumps({"ok": True, "stack": stack}, ensure_ascii=False)
 
         if op == 'get':
@@ -564,7 +447,7 @@ class UrlStack(BaseTool):
                 return json.dumps({"ok": False, "error": "missing url"}, ensure_ascii=False)
             stack = [{'url': url}]
             print(f"[url_stack] Initialized with root: {url}")
-            self._save(stack)
+            self._save(session, stack)
             return json.dumps({"ok": True, "stack": stack}, ensure_ascii=False)
 
         if op == 'push':
@@ -573,7 +456,7 @@ class UrlStack(BaseTool):
                 return json.dumps({"ok": False, "error": "missing url"}, ensure_ascii=False)
             old_len = len(stack)
             stack = self._push(stack, url)
-            self._save(stack)
+            self._save(session, stack)
             print(f"[url_stack] Pushed {url}, depth: {old_len} -> {len(stack)}")
             return json.dumps({
                 "ok": True,
@@ -593,7 +476,7 @@ class UrlStack(BaseTool):
             old_len = len(stack)
             new_len = max(1, len(stack) - steps)
             stack = stack[:new_len]
-            self._save(stack)
+            self._save(session, stack)
             parent_url = stack[-1]['url']
             print(f"[url_stack] Went back {steps} step(s), depth: {old_len} -> {new_len}, now at: {parent_url}")
             return json.dumps({
@@ -617,20 +500,11 @@ class CountUsefulness(BaseTool):
         'required': True
     }]
 
-    def _read_count(self) -> int:
-        if not os.path.exists(path):
-            with open(path, "w") as f:
-                f.write("0")
-            return 0
-        try:
-            with open(path, "r") as f:
-                return int(f.read().strip() or 0)
-        except Exception:
-            return 0
+    def _read_count(self, session) -> int:
+        return session.count
 
-    def _write_count(self, value: int) -> None:
-        with open(path, "w") as f:
-            f.write(str(max(0, int(value))))
+    def _write_count(self, session, value: int) -> None:
+        session.count = max(0, int(value))
 
     def call(self, params: str, **kwargs) -> str:
         if not params.strip().endswith("}"):
@@ -648,13 +522,14 @@ class CountUsefulness(BaseTool):
         except Exception:
             return "invalid params"
 
+        session = get_session(kwargs)
         op = str(data.get('op', '')).lower()
         if op == 'inc':
-            current = self._read_count() + 1
-            self._write_count(current)
+            current = self._read_count(session) + 1
+            self._write_count(session, current)
             return str(current)
         elif op == 'get':
-            return str(self._read_count())
+            return str(self._read_count(session))
         else:
             return "invalid op"
 
@@ -675,21 +550,11 @@ class QueryRequirement(BaseTool):
         'required': False
     }]
 
-    def _read_query(self) -> str:
-        path = 'query.txt'
-        if not os.path.exists(path):
-            return ""
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except Exception as e:
-            print(f"[query_requirement] Error reading query: {e}")
-            return ""
+    def _read_query(self, session) -> str:
+        return session.query.strip()
 
-    def _write_query(self, query: str) -> None:
-        path = 'query.txt'
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(query)
+    def _write_query(self, session, query: str) -> None:
+        session.query = query
 
     def call(self, params: str, **kwargs) -> str:
         if not params.strip().endswith("}"):
@@ -707,15 +572,16 @@ class QueryRequirement(BaseTool):
         except Exception:
             return "invalid params"
 
+        session = get_session(kwargs)
         op = str(data.get('op', '')).lower()
         if op == 'set':
             query = data.get('query')
             if not query:
                 return "Query is required for 'set' operation."
-            self._write_query(query)
+            self._write_query(session, query)
             return f"Query stored successfully: {query}"
         elif op == 'get':
-            query = self._read_query()
+            query = self._read_query(session)
             return f"Original query: {query}" if query else "No query stored yet."
         else:
             return "invalid op"
@@ -751,30 +617,7 @@ class CalculateUnderstandingScore(BaseTool):
 
     def _evaluate_text_quality(self, observation):
         """Evaluate text content quality (0-25 points)"""
-        score = 0
-        length = len(observation)
-
-        if length < 100:
-            score += 0
-        elif 100 <= length < 500:
-            score += 5
-        elif 500 <= length < 5000:
-            score += 10
-        else:
-            score += 8
-
-        valid_chars = len(re.findall(r'[\u4e00-\u9fa5a-zA-Z0-9\s.,!?;:，。！？；：]', observation))
-        valid_ratio = valid_chars / max(length, 1)
-        score += valid_ratio * 10
-
-        has_headers = bool(re.search(r'^#+\s', observation, re.MULTILINE))
-        has_lists = bool(re.search(r'^\s*[-*]\s', observation, re.MULTILINE))
-        if has_headers:
-            score += 2.5
-        if has_lists:
-            score += 2.5
-
-        return min(score, 25)
+        return text_quality_score(observation)
 
     def _evaluate_relevance_with_llm(self, observation, query):
         """Evaluate information relevance using LLM (0-40 points)"""
@@ -796,81 +639,67 @@ Please return JSON directly:
 {{"score": <integer 0-40>, "reason": "<brief reason>"}}
 """
 
+        params = {
+            'model': llm_cfg['model'],
+            'messages': [{'role': 'user', 'content': prompt}],
+            'response_format': {"type": "json_object"},
+            'temperature': 0.1,
+        }
+        cache = get_llm_cache()
         try:
-            client = OpenAI(
-                api_key=llm_cfg['api_key'],
-                base_url=llm_cfg['model_server'],
-            )
-            response = client.chat.completions.create(
-                model=llm_cfg['model'],
-                messages=[{'role': 'user', 'content': prompt}],
-                response_format={"type": "json_object"},
-                temperature=0.1
-            )
-            result = json.loads(response.choices[0].message.content)
+            content = cache.get('understanding_relevance', params)
+            if content is None:
+                client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
+                with get_limiter().llm_slot():
+                    response = traced_create(client, 'understanding_relevance', **params)
+                content = response.choices[0].message.content
+                result = json.loads(content)
+                cache.put('understanding_relevance', params, content)
+            else:
+                result = json.loads(content)
             return result.get('score', 20), result.get('reason', '')
         except Exception as e:
             print(f"LLM evaluation error: {e}")
-            return 20, "LLM evaluation failed, using default score"
-
-    def _evaluate_structure(self, observation):
+            return None, "LLM evaluation failed"
+
+    def _evaluate_relevance(self, observation, query, local_score=None):
+        """
+        Relevance (0-40 points) according to the configured mode.
+
+        Args:
+            local_score (float): sum of the heuristic scores; None to always ask the LLM
+
+        Returns:
+            tuple: (relevance, reason, source), source is llm, short_circuited, lexical or lexical_fallback
+        """
+        settings = get_understanding_settings()
+        if settings['mode'] == 'lexical':
+            return lexical_relevance(observation, query), "Lexical overlap of query and page", 'lexical'
+        if local_score is not None and not relevance_can_change_decision(local_score, settings['thresholds']):
+            return (lexical_relevance(observation, query),
+                    "LLM skipped, the heuristics decide the result; lexical overlap estimate", 'short_circuited')
+        relevance, reason = self._evaluate_relevance_with_llm(observation, query)
+        if relevance is not None:
+            return relevance, reason, 'llm'
+        if settings['fallback'] == 'lexical':
+            return (lexical_relevance(observation, query),
+                    "LLM evaluation failed, using lexical overlap estimate", 'lexical_fallback')
+        return 20, "LLM evaluation failed, using default score", 'llm'
+
+    def _evaluate_structure(self, observation, session):
         """Evaluate page structure clarity (0-20 points)"""
-        score = 0
-
-        paragraphs = observation.split('\n\n')
-        num_paragraphs = len([p for p in paragraphs if len(p.strip()) > 50])
-        if num_paragraphs >= 3:
-            score += 5
-        elif num_paragraphs >= 1:
-            score += 3
-
-        try:
-            with open("BUTTON_URL_ADIC.json", "r") as f:
-                buttons = json.load(f)
-            num_buttons = len(buttons)
-            if 5 <= num_buttons <= 30:
-                score += 10
-            elif 1 <= num_buttons < 5:
-                score += 5
-            elif num_buttons > 30:
-                score += 3
-        except Exception:
-            score += 5
-
-        sentences = re.split(r'[。！？.!?]', observation)
-        valid_sentences = [s for s in sentences if len(s.strip()) > 20]
-        density = len(valid_sentences) / max(len(sentences), 1)
-        score += density * 5
-
-        return min(score, 20)
+        return structure_score(observation, self._count_buttons(session))
 
     def _evaluate_special_cases(self, observation, url):
         """Detect special scenarios requiring visual understanding (0-15 points)"""
-        score = 15
+        return special_cases_score(observation, url)
 
-        url_lower = url.lower() if url else ""
-        obs_lower = observation.lower()
-
-        image_indicators = ['gallery', 'photo', 'image', '图片', '相册']
-        video_indicators = ['video', 'play', 'watch', '视频']
-        if any(kw in obs_lower or kw in url_lower for kw in image_indicators):
-            score -= 10
-        if any(kw in obs_lower or kw in url_lower for kw in video_indicators):
-            score -= 10
-
-        interactive_indicators = ['login', 'register', 'captcha', '登录', '注册', '验证码']
-        if any(kw in obs_lower for kw in interactive_indicators):
-            score -= 5
-
-        error_indicators = ['404', 'error', 'not found', '错误', '页面不存在']
-        if any(kw in obs_lower for kw in error_indicators):
-            score -= 15
-
-        viz_indicators = ['chart', 'graph', 'dashboard', '图表', '数据']
-        if any(kw in obs_lower for kw in viz_indicators):
-            score -= 8
-
-        return max(score, 0)
+    @staticmethod
+    def _count_buttons(session):
+        try:
+            return len(session.buttons)
+        except Exception:
+            return None
 
     def call(self, params: str, **kwargs) -> str:
         if not params.strip().endswith("}"):
@@ -904,30 +733,24 @@ Please return JSON directly:
             }, ensure_ascii=False)
 
         try:
-            text_quality = self._evaluate_text_quality(observation)
-            relevance, relevance_reason = self._evaluate_relevance_with_llm(observation, query)
-            structure = self._evaluate_structure(observation)
-            special_cases = self._evaluate_special_cases(observation, url)
+            session = get_session(kwargs)
+            heuristics = submit_cpu(heuristic_scores, observation, url, self._count_buttons(session))
+            if get_understanding_settings()['mode'] == 'llm':
+                # The heuristics run in the page processing pool while the LLM judges relevance
+                relevance, relevance_reason, relevance_source = self._evaluate_relevance(observation, query)
+                text_quality, structure, special_cases = heuristics.result()
+            else:
+                # The heuristics decide whether the LLM is needed at all
+                text_quality, structure, special_cases = heuristics.result()
+                relevance, relevance_reason, relevance_source = self._evaluate_relevance(
+                    observation, query, text_quality + structure + special_cases)
+            record_relevance(relevance_source, session.metrics.setdefault('understanding_score', {}))
 
             final_score = text_quality + relevance + structure + special_cases
             final_score = max(0, min(100, final_score))
 
-            if final_score >= 80:
-                recommendation = "excellent"
-                suggestion = "Text content is highly understandable, continue using LLM analysis."
-                should_use_vlm = False
-            elif final_score >= 60:
-                recommendation = "good"
-                suggestion = "Text content is reasonably understandable, LLM should work well."
-                should_use_vlm = False
-            elif final_score >= 40:
-                recommendation = "fair"
-                suggestion = "Text content understanding is marginal, consider using VLM for better results."
-                should_use_vlm = True
-            else:
-                recommendation = "poor"
-                suggestion = "Text content is difficult to understand, strongly recommend using VLM assistance."
-                should_use_vlm = True
+            # The same boundaries as the short-circuit thresholds (understanding_heuristics.RECOMMENDATIONS)
+            recommendation, suggestion, should_use_vlm = recommend(final_score)
 
             print(f"[calculate_understanding_score] Score: {int(final_score)}/100 ({recommendation})")
 
@@ -938,6 +761,7 @@ Please return JSON directly:
                     "text_quality": round(text_quality, 2),
                     "relevance": round(relevance, 2),
                     "relevance_reason": relevance_reason,
+                    "relevance_source": relevance_source,
                     "structure": round(structure, 2),
                     "special_cases": round(special_cases, 2)
                 },
@@ -994,19 +818,22 @@ Output requirements:
 - If there is no relevant information, state it clearly
 """
 
-    vlm_call_count = 0
-    MAX_VLM_CALLS_PER_SESSION = 15
-
-    def _load_screenshot(self, screenshot_path=None):
-        """Load screenshot as base64"""
+    def _load_screenshot(self, session, screenshot_path=None):
+        """Load screenshot file bytes (capturing the current page first if it has none yet)"""
         try:
             if not screenshot_path:
-                if os.path.exists("current_screenshot.json"):
-                    with open("current_screenshot.json", "r") as f:
-                        info = json.load(f)
-                        screenshot_path = info.get("screenshot_path")
+                if session.current_screenshot:
+                    screenshot_path = session.current_screenshot.get("screenshot_path")
+                    if not screenshot_path:
+                        # Fetched without a screenshot (on-demand capture): take it now
+                        url = session.current_screenshot["url"]
+                        screenshot = run_async_in_sync(capture_screenshot(url))
+                        if not screenshot:
+                            return None, f"Failed to capture a screenshot of {url}"
+                        _save_screenshot(screenshot, url, session)
+                        screenshot_path = session.current_screenshot["screenshot_path"]
                 else:
-                    image_folder = "images/"
+                    image_folder = session.image_folder
                     if os.path.exists(image_folder):
                         image_files = [f for f in os.listdir(image_folder) if f.endswith(('.png', '.jpg', '.jpeg'))]
                         if image_files:
@@ -1019,48 +846,79 @@ Output requirements:
 
             with open(screenshot_path, "rb") as f:
                 screenshot_data = f.read()
-            screenshot_base64 = base64.b64encode(screenshot_data).decode()
-            return screenshot_base64, screenshot_path
+            return screenshot_data, screenshot_path
 
         except Exception as e:
             return None, f"Failed to load screenshot: {str(e)}"
 
-    def _call_vlm(self, screenshot_base64, query, focus_area=None):
-        """Call VLM to analyze screenshot"""
+    def _load_pending(self, session, max_pages):
+        """
+        Load the screenshots of the last max_pages pages not analyzed yet (the current page included).
+
+        Returns:
+            list: (url, screenshot bytes, path) of every page that could be loaded, oldest first
+        """
+        entries = session.pending_screenshots[-max_pages:]
+        missing = [entry for entry in entries if not entry.get("screenshot_path")]
+        if missing:
+            # Pages fetched without a screenshot (on-demand capture) are captured together
+            screenshots = run_async_in_sync(_capture_all([entry["url"] for entry in missing]))
+            for entry, screenshot in zip(missing, screenshots):
+                if screenshot:
+                    entry["screenshot_path"] = _write_screenshot(screenshot, session)
+
+        pages = []
+        for entry in entries:
+            path = entry.get("screenshot_path")
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                with open(path, "rb") as f:
+                    pages.append((entry["url"], f.read(), path))
+            except OSError as e:
+                print(f"[WARNING] Failed to load screenshot {path}: {e}")
+        return pages
+
+    def _call_vlm(self, pages, query, focus_area=None):
+        """Call VLM to analyze screenshots (pages: [(url, data URLs)], several images for a tiled page)"""
         try:
             vlm_model = llm_cfg.get('vlm_model', 'qwen-vl-plus')
 
             user_content = f"Query: {query}"
             if focus_area:
                 user_content += f"\nFocus Area: {focus_area}"
+            if len(pages) > 1:
+                user_content += (f"\nThe screenshots of {len(pages)} visited pages follow, each preceded by its URL. "
+                                 "Answer for every page that is relevant to the query and name its URL.")
+            if any(len(images) > 1 for _, images in pages):
+                user_content += "\nA tall page is split into consecutive parts, from top to bottom."
             user_content += "\n\nPlease analyze the webpage screenshot and answer the query."
 
+            content = [{'type': 'text', 'text': user_content}]
+            for index, (url, images) in enumerate(pages, 1):
+                if len(pages) > 1:
+                    content.append({'type': 'text', 'text': f"Page {index}: {url}"})
+                content.extend({
+                    'type': 'image_url',
+                    'image_url': {
+                        'url': image_url
+                    }
+                } for image_url in images)
+
             messages = [
                 {'role': 'system', 'content': self.VLM_SYSTEM_PROMPT},
-                {
-                    'role': 'user',
-                    'content': [
-                        {'type': 'text', 'text': user_content},
-                        {
-                            'type': 'image_url',
-                            'image_url': {
-                                'url': f"data:image/png;base64,{screenshot_base64}"
-                            }
-                        }
-                    ]
-                }
+                {'role': 'user', 'content': content}
             ]
 
-            client = OpenAI(
-                api_key=llm_cfg['api_key'],
-                base_url=llm_cfg['model_server'],
-            )
+            client = get_client(llm_cfg['api_key'], llm_cfg['model_server'])
 
-            response = client.chat.completions.create(
-                model=vlm_model,
-                messages=messages,
-                max_tokens=500
-            )
+            with get_limiter().llm_slot():
+                response = traced_create(
+                    client, 'vlm',
+                    model=vlm_model,
+                    messages=messages,
+                    max_tokens=500 * len(pages)
+                )
 
             return response.choices[0].message.content, "high"
 
@@ -1099,7 +957,9 @@ Output requirements:
                 "error": "missing query"
             }, ensure_ascii=False)
 
-        if self.vlm_call_count >= self.MAX_VLM_CALLS_PER_SESSION:
+        session = get_session(kwargs)
+        budget = session.vlm_budget
+        if not budget.allows():
             return json.dumps({
                 "vlm_result": None,
                 "status": "failed",
@@ -1107,19 +967,58 @@ Output requirements:
                 "fallback_suggestion": "Try to continue with text analysis or visit other pages"
             }, ensure_ascii=False)
 
-        screenshot_base64, error_or_path = self._load_screenshot(screenshot_path)
-        if screenshot_base64 is None:
+        options = get_vlm_options()
+        pages = []
+        if not screenshot_path and options["batch_pages"] > 1 and len(session.pending_screenshots) > 1:
+            # Batched: the pages visited since their last analysis, in one request
+            pages = self._load_pending(session, options["batch_pages"])
+        if not pages:
+            screenshot_data, error_or_path = self._load_screenshot(session, screenshot_path)
+            if screenshot_data is None:
+                return json.dumps({
+                    "vlm_result": None,
+                    "status": "failed",
+                    "error": error_or_path,
+                    "fallback_suggestion": "Screenshot not available, continue with text analysis"
+                }, ensure_ascii=False)
+            current = session.current_screenshot or {}
+            url = current.get("url") if current.get("screenshot_path") == error_or_path else None
+            pages = [(url, screenshot_data, error_or_path)]
+
+        try:
+            # Crop, downscale and re-encode in the page processing pool
+            screenshot_options = get_screenshot_options()
+            futures = [submit_cpu(prepare_screenshot, data, focus_area, screenshot_options) for _, data, _ in pages]
+            prepared = [future.result() for future in futures]
+        except Exception as e:
             return json.dumps({
                 "vlm_result": None,
                 "status": "failed",
-                "error": error_or_path,
+                "error": f"Failed to prepare screenshot: {e}",
                 "fallback_suggestion": "Screenshot not available, continue with text analysis"
             }, ensure_ascii=False)
 
-        self.vlm_call_count += 1
-        vlm_result, confidence_or_error = self._call_vlm(screenshot_base64, query, focus_area)
+        # Keep within the images of one request, dropping the oldest pages first
+        selected, images = [], 0
+        for page, page_prepared in reversed(list(zip(pages, prepared))):
+            if selected and images + len(page_prepared["images"]) > options["max_images"]:
+                break
+            page_prepared["images"] = page_prepared["images"][:options["max_images"]]
+            selected.insert(0, (page, page_prepared))
+            images += len(page_prepared["images"])
+        for _, page_prepared in selected:
+            record_screenshot(page_prepared)
+
+        start = time.perf_counter()
+        vlm_result, confidence_or_error = self._call_vlm(
+            [(url or "current page", page_prepared["images"]) for (url, _, _), page_prepared in selected],
+            query, focus_area)
+        latency = time.perf_counter() - start
 
         if vlm_result is None:
+            # Only successful calls use up the session's budget
+            budget.record_failure()
+            session.metrics['vlm'] = budget.stats()
             return json.dumps({
                 "vlm_result": None,
                 "status": "failed",
@@ -1127,12 +1026,28 @@ Output requirements:
                 "fallback_suggestion": "VLM call failed, continue with text analysis or try other pages"
             }, ensure_ascii=False)
 
-        print(f"[use_vlm_analysis] VLM call #{self.vlm_call_count} completed successfully")
+        budget.charge(images, len(selected), latency)
+        session.metrics['vlm'] = budget.stats()
+        session.mark_analyzed(url for (url, _, _), _ in selected if url)
+        print(f"[use_vlm_analysis] VLM call #{budget.calls} completed successfully "
+              f"({len(selected)} pages, {images} images)")
 
-        return json.dumps({
+        result = {
             "vlm_result": vlm_result,
             "status": "success",
             "confidence": confidence_or_error,
-            "screenshot_used": error_or_path,
-            "vlm_calls_used": self.vlm_call_count
-        }, ensure_ascii=False)
+            "screenshot_used": selected[-1][0][2],
+            "image": {
+                "images": images,
+                "original_bytes": sum(p["original_bytes"] for _, p in selected),
+                "sent_bytes": sum(p["sent_bytes"] for _, p in selected),
+                "preprocess_ms": round(max(p["seconds"] for _, p in selected) * 1000, 1),
+                "truncated": any(p["truncated"] for _, p in selected)
+            },
+            "latency_ms_per_image": round(latency * 1000 / max(images, 1), 1),
+            "vlm_calls_used": budget.calls,
+            "vlm_calls_left": budget.remaining
+        }
+        if len(selected) > 1:
+            result["pages"] = [url for (url, _, _), _ in selected]
+        return json.dumps(result, ensure_ascii=False)
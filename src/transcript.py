@@ -0,0 +1,172 @@
+"""
+Bounded ReAct transcript of the VGems agent.
+
+The agent used to append every Thought/Action/Observation (full page markdown,
+button lists, the global discovery block) to the prompt and resend all of it on
+each planner call, so prompt tokens grew linearly per step and quadratically
+per question. ReActTranscript keeps the last `window` observations verbatim,
+replaces older ones by one-line visit summaries, and always shows the
+information extracted so far (the agent's memory). With window=None the
+transcript is rendered verbatim, exactly as before.
+
+Token counts are estimated (no tokenizer needed) for every planner call, both
+for the rendered prompt and for what the unbounded transcript would have
+been, so that the savings can be reported.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+_CJK = re.compile(r'[\u3000-\u30ff\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+_URL_IN_OBSERVATION = re.compile(r'The url now is (https?://[^\s\n]+)')
+MAX_SUMMARY_THOUGHT = 200   # characters of an old thought kept in its summary
+MAX_SUMMARY_INPUT = 200     # characters of an old action input kept in its summary
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: one token per CJK character, one per 4 other characters.
+
+    Args:
+        text (str): prompt text
+
+    Returns:
+        int: estimated number of tokens
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class _Step:
+    def __init__(self, lead: str, thought: str, action: str, action_input: str, observation: str,
+                 useful: Optional[bool]):
+        self.lead = lead              # hints added before the step and the separating newline
+        self.thought = thought
+        self.action = action
+        self.action_input = action_input
+        self.observation = observation
+        self.useful = useful
+
+    def verbatim(self) -> str:
+        action_input = self.action_input
+        if action_input.startswith('```'):
+            # Add a newline for proper markdown rendering of code
+            action_input = '\n' + action_input
+        return self.lead + self.thought + f'\nAction: {self.action}\nAction Input: {action_input}' + \
+            f'\nObservation: {self.observation}\nThought: '
+
+    def summary(self) -> str:
+        url_match = _URL_IN_OBSERVATION.search(self.observation)
+        visited = f"visited {url_match.group(1).strip()}" if url_match else _shorten(self.observation, 80)
+        if self.useful is True:
+            visited += "; useful information found (see collected information)"
+        elif self.useful is False:
+            visited += "; no new information"
+        thought = _shorten(self.thought, MAX_SUMMARY_THOUGHT)
+        return thought + f'\nAction: {self.action}\nAction Input: {_shorten(self.action_input, MAX_SUMMARY_INPUT)}' + \
+            f'\nObservation: [summarized] {visited}\nThought: '
+
+
+class ReActTranscript:
+    """
+    Args:
+        prompt (str): the ReAct prompt (tools, format and question) the transcript starts with
+        window (int): number of most recent observations kept verbatim, None to keep all
+    """
+
+    def __init__(self, prompt: str, window: Optional[int] = None):
+        self.prompt = prompt
+        self.window = window
+        self._steps: List[_Step] = []
+        self._tail = ""              # hints added since the last step
+        self._verbatim_end = prompt[-len('\nThought: '):]
+        self._full_tokens = estimate_tokens(prompt)
+        self.calls: List[Dict] = []  # token accounting per planner call
+
+    def add_step(self, thought: str, action: str, action_input: str, observation: str,
+                 useful: Optional[bool] = None) -> str:
+        """
+        Append one Thought/Action/Observation step.
+
+        Args:
+            useful (bool): whether the observation contained information for the query
+
+        Returns:
+            str: the observation as added to the transcript ('\nObservation: ...\nThought: ')
+        """
+        lead = self._tail
+        # Add the '\n' between '\nQuestion:' and the first 'Thought:'
+        if (not (self._verbatim_end + lead).endswith('\nThought: ')) and (not thought.startswith('\n')):
+            lead += '\n'
+        step = _Step(lead, thought, action, action_input, observation, useful)
+        self._steps.append(step)
+        self._tail = ""
+        self._verbatim_end = '\nThought: '
+        self._full_tokens += estimate_tokens(step.verbatim())
+        return f'\nObservation: {observation}\nThought: '
+
+    def add_hint(self, hint: str):
+        """Append a system hint after the last step (kept verbatim until that part is summarized)."""
+        self._tail += hint
+        self._full_tokens += estimate_tokens(hint)
+
+    def render(self, memory: List[str] = None) -> str:
+        """
+        Args:
+            memory (list): information extracted so far, always shown once steps are summarized
+
+        Returns:
+            str: the transcript to send to the planner
+        """
+        summarized = 0 if self.window is None else max(0, len(self._steps) - self.window)
+        parts = [self.prompt]
+        if summarized and memory:
+            parts.append("\n[Collected information so far]\n" + "\n".join(f"- {m.strip()}" for m in memory) + "\n")
+        for i, step in enumerate(self._steps):
+            if i < summarized:
+                parts.append('\n' + step.summary() if i == 0 else step.summary())
+            else:
+                parts.append(step.verbatim())
+        parts.append(self._tail)
+        return "".join(parts)
+
+    def record_call(self, prompt: str) -> Dict:
+        """
+        Record the token counts of one planner call.
+
+        Args:
+            prompt (str): the rendered transcript sent to the planner
+
+        Returns:
+            dict: {"step", "prompt_tokens", "full_tokens"}
+        """
+        entry = {
+            "step": len(self.calls) + 1,
+            "prompt_tokens": estimate_tokens(prompt),
+            "full_tokens": self._full_tokens,
+        }
+        self.calls.append(entry)
+        return entry
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            dict: planner calls, prompt tokens sent, tokens an unbounded transcript would have sent
+        """
+        sent = sum(c["prompt_tokens"] for c in self.calls)
+        full = sum(c["full_tokens"] for c in self.calls)
+        return {
+            "window": self.window,
+            "planner_calls": len(self.calls),
+            "prompt_tokens": sent,
+            "unbounded_prompt_tokens": full,
+            "saved_tokens": full - sent,
+            "last_prompt_tokens": self.calls[-1]["prompt_tokens"] if self.calls else 0,
+        }
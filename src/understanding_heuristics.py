@@ -0,0 +1,290 @@
+"""
+Text heuristics of the calculate_understanding_score tool.
+
+These are module-level functions of plain strings and numbers so that they can
+run in the page processing pool (see page_processing.py). Patterns are compiled
+once, characters are counted without materializing a match per character, and
+the special-case keywords are matched in a single Aho-Corasick pass when
+pyahocorasick is installed. The scores are exactly those of the original
+implementation; benchmarks/bench_understanding_heuristics.py checks parity and
+measures the speedup.
+
+The tool adds an LLM relevance score (0-40) to the local heuristics (0-60).
+In short-circuit mode the LLM is only asked when its score could still move the
+total across a decision threshold (by default the boundaries of RECOMMENDATIONS:
+40, 60 where the tool stops recommending the VLM, and 80); otherwise, and in
+lexical mode, relevance is estimated
+locally from the overlap of query and page terms. How often the LLM call was
+avoided is counted per session and for the whole process.
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, Tuple
+
+from page_chunking import tokenize
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional, keywords are then found with substring scans
+    ahocorasick = None
+
+RELEVANCE_MAX = 40
+RELEVANCE_MODES = ("llm", "short_circuit", "lexical")
+RELEVANCE_FALLBACKS = ("default", "lexical")
+
+# Final score -> the tool's decision: (lowest score, recommendation, suggestion, should_use_vlm), best first
+RECOMMENDATIONS = (
+    (80, "excellent", "Text content is highly understandable, continue using LLM analysis.", False),
+    (60, "good", "Text content is reasonably understandable, LLM should work well.", False),
+    (40, "fair", "Text content understanding is marginal, consider using VLM for better results.", True),
+    (0, "poor", "Text content is difficult to understand, strongly recommend using VLM assistance.", True),
+)
+# Final scores at which the decision changes
+DEFAULT_THRESHOLDS = tuple(sorted(low for low, _, _, _ in RECOMMENDATIONS if low > 0))
+
+# Frequent query words that say nothing about relevance
+STOPWORDS = frozenset("""a an and are as at be by can do does for from how i in is it me of on or please
+the this to was what when where which who why will with you your""".split())
+
+# Patterns of the heuristics, compiled once
+_INVALID_RUN = re.compile(r'[^\u4e00-\u9fa5a-zA-Z0-9\s.,!?;:，。！？；：]+')
+_HEADER = re.compile(r'^#+\s', re.MULTILINE)
+_LIST_ITEM = re.compile(r'^\s*[-*]\s', re.MULTILINE)
+_SENTENCE_END = re.compile(r'[。！？.!?]')
+
+# Keyword groups of the special cases score: (name, keywords, also looked up in the url, penalty)
+KEYWORD_GROUPS = (
+    ("image", ('gallery', 'photo', 'image', '图片', '相册'), True, 10),
+    ("video", ('video', 'play', 'watch', '视频'), True, 10),
+    ("interactive", ('login', 'register', 'captcha', '登录', '注册', '验证码'), False, 5),
+    ("error", ('404', 'error', 'not found', '错误', '页面不存在'), False, 15),
+    ("visualization", ('chart', 'graph', 'dashboard', '图表', '数据'), False, 8),
+)
+
+_settings = {"mode": "llm", "fallback": "default", "thresholds": DEFAULT_THRESHOLDS}
+_stats = {"calls": 0, "llm_calls": 0, "short_circuited": 0, "lexical": 0, "lexical_fallbacks": 0}
+_stats_lock = threading.Lock()
+
+
+def text_quality_score(observation: str) -> float:
+    """Evaluate text content quality (0-25 points)"""
+    score = 0
+    length = len(observation)
+
+    if length < 100:
+        score += 0
+    elif 100 <= length < 500:
+        score += 5
+    elif 500 <= length < 5000:
+        score += 10
+    else:
+        score += 8
+
+    # Count the characters outside the class instead of listing every one inside it
+    invalid_chars = sum(len(run) for run in _INVALID_RUN.findall(observation))
+    valid_ratio = (length - invalid_chars) / max(length, 1)
+    score += valid_ratio * 10
+
+    if _HEADER.search(observation):
+        score += 2.5
+    if _LIST_ITEM.search(observation):
+        score += 2.5
+
+    return min(score, 25)
+
+
+def structure_score(observation: str, num_buttons: int = None) -> float:
+    """
+    Evaluate page structure clarity (0-20 points)
+
+    Args:
+        observation (str): page markdown
+        num_buttons (int): number of buttons discovered so far (None if unknown)
+    """
+    score = 0
+
+    num_paragraphs = sum(1 for p in observation.split('\n\n') if len(p.strip()) > 50)
+    if num_paragraphs >= 3:
+        score += 5
+    elif num_paragraphs >= 1:
+        score += 3
+
+    if num_buttons is None:
+        score += 5
+    elif 5 <= num_buttons <= 30:
+        score += 10
+    elif 1 <= num_buttons < 5:
+        score += 5
+    elif num_buttons > 30:
+        score += 3
+
+    sentences = _SENTENCE_END.split(observation)
+    valid_sentences = sum(1 for s in sentences if len(s.strip()) > 20)
+    density = valid_sentences / max(len(sentences), 1)
+    score += density * 5
+
+    return min(score, 20)
+
+
+class KeywordMatcher:
+    """
+    Finds which keyword groups occur in a text.
+
+    With pyahocorasick installed, all keywords are matched in one Aho-Corasick
+    pass that stops as soon as every group has been seen; otherwise each group
+    falls back to substring scans, stopping at its first hit.
+
+    Args:
+        groups (dict): {group name: keywords}
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups = {name: tuple(keywords) for name, keywords in groups.items()}
+        self._automaton = None
+        if ahocorasick is not None:
+            owners: Dict[str, set] = {}
+            for name, keywords in self.groups.items():
+                for keyword in keywords:
+                    owners.setdefault(keyword, set()).add(name)
+            self._automaton = ahocorasick.Automaton()
+            for keyword, names in owners.items():
+                self._automaton.add_word(keyword, frozenset(names))
+            self._automaton.make_automaton()
+
+    def groups_in(self, text: str) -> set:
+        """
+        Returns:
+            set: names of the groups with at least one keyword in text
+        """
+        if self._automaton is None:
+            return {name for name, keywords in self.groups.items() if any(kw in text for kw in keywords)}
+        found = set()
+        if not text:
+            return found
+        for _, names in self._automaton.iter(text):
+            found |= names
+            if len(found) == len(self.groups):
+                break
+        return found
+
+
+_SPECIAL_CASES = KeywordMatcher({name: keywords for name, keywords, _, _ in KEYWORD_GROUPS})
+
+
+def special_cases_score(observation: str, url: str) -> float:
+    """Detect special scenarios requiring visual understanding (0-15 points)"""
+    score = 15
+
+    url_lower = url.lower() if url else ""
+    in_page = _SPECIAL_CASES.groups_in(observation.lower())
+    in_url = _SPECIAL_CASES.groups_in(url_lower) if url_lower else set()
+
+    for name, _, check_url, penalty in KEYWORD_GROUPS:
+        if name in in_page or (check_url and name in in_url):
+            score -= penalty
+
+    return max(score, 0)
+
+
+def heuristic_scores(observation: str, url: str, num_buttons: int = None) -> Tuple[float, float, float]:
+    """
+    Returns:
+        tuple: (text_quality, structure, special_cases) scores
+    """
+    return (text_quality_score(observation),
+            structure_score(observation, num_buttons),
+            special_cases_score(observation, url))
+
+
+def lexical_relevance(observation: str, query: str) -> float:
+    """
+    Local relevance estimate (0-40 points): the share of query terms (words and
+    CJK bigrams, without stopwords) that occur in the page.
+    """
+    query_terms = set(tokenize(query)) - STOPWORDS
+    if not query_terms:
+        return RELEVANCE_MAX / 2
+    page_terms = set(tokenize(observation))
+    coverage = len(query_terms & page_terms) / len(query_terms)
+    return round(RELEVANCE_MAX * coverage, 2)
+
+
+def recommend(final_score: float) -> Tuple[str, str, bool]:
+    """
+    Returns:
+        tuple: (recommendation, suggestion, should_use_vlm) for a final score in 0-100
+    """
+    for low, recommendation, suggestion, should_use_vlm in RECOMMENDATIONS:
+        if final_score >= low:
+            return recommendation, suggestion, should_use_vlm
+    return RECOMMENDATIONS[-1][1:]
+
+
+def relevance_can_change_decision(local_score: float, thresholds: Iterable[float] = None) -> bool:
+    """
+    Args:
+        local_score (float): text quality + structure + special cases
+        thresholds (iterable): final scores at which the decision changes
+
+    Returns:
+        bool: True if some relevance score in 0-40 moves the total across a threshold
+    """
+    low = max(0, min(100, local_score))
+    high = max(0, min(100, local_score + RELEVANCE_MAX))
+    return any(low < t <= high for t in (thresholds or _settings["thresholds"]))
+
+
+def configure_understanding_score(mode: str = "llm", fallback: str = "default",
+                                  thresholds: Iterable[float] = DEFAULT_THRESHOLDS):
+    """
+    Args:
+        mode (str): "llm" always asks the LLM for relevance, "short_circuit" only when the
+            result could cross a threshold, "lexical" never (local estimate only)
+        fallback (str): relevance when the LLM call fails: "default" (20 points) or "lexical"
+        thresholds (iterable): final scores at which the decision changes
+    """
+    if mode not in RELEVANCE_MODES:
+        raise ValueError(f"Unknown relevance mode: {mode} (expected one of {RELEVANCE_MODES})")
+    if fallback not in RELEVANCE_FALLBACKS:
+        raise ValueError(f"Unknown relevance fallback: {fallback} (expected one of {RELEVANCE_FALLBACKS})")
+    _settings.update(mode=mode, fallback=fallback, thresholds=tuple(thresholds))
+
+
+def get_understanding_settings() -> Dict:
+    """
+    Returns:
+        dict: {"mode", "fallback", "thresholds"}
+    """
+    return dict(_settings)
+
+
+def record_relevance(source: str, metrics: Dict = None):
+    """
+    Count one understanding score by where its relevance came from.
+
+    Args:
+        source (str): "llm", "short_circuited", "lexical" or "lexical_fallback"
+        metrics (dict): per-session counters to update as well (session.metrics["understanding_score"])
+    """
+    key = {"llm": "llm_calls", "lexical_fallback": "lexical_fallbacks"}.get(source, source)
+    with _stats_lock:
+        for counters in (_stats, metrics):
+            if counters is None:
+                continue
+            counters["calls"] = counters.get("calls", 0) + 1
+            counters[key] = counters.get(key, 0) + 1
+            if source == "lexical_fallback":
+                # The LLM was called but failed
+                counters["llm_calls"] = counters.get("llm_calls", 0) + 1
+
+
+def understanding_score_report() -> str:
+    """How often the relevance LLM call was avoided in this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    avoided = stats["short_circuited"] + stats["lexical"]
+    rate = avoided / stats["calls"] * 100 if stats["calls"] else 0.0
+    return (f"understanding score ({_settings['mode']}): {stats['calls']} scores, "
+            f"{stats['llm_calls']} LLM calls, {avoided} avoided ({rate:.1f}%), "
+            f"{stats['lexical_fallbacks']} lexical fallbacks")
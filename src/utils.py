@@ -1,6 +1,174 @@
 import urllib.parse
-from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+from crawl4ai import CrawlerRunConfig
+from browser_pool import get_browser_pool
+from page_cache import get_page_cache
+from page_processing import run_cpu_async
+from prefetch import get_prefetcher
+from host_profiles import get_host_profiles
+from markdown_cleaning import clean_markdown, get_url_pattern
+from static_fetch import fetch_static, looks_js_rendered, record_browser_fetch, use_http
 import re
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+
+class _Slots:
+    """
+    Counting semaphore shared by threads and event loops: a released slot is handed to the
+    longest waiting caller, a thread or a coroutine on any loop, which is woken without polling.
+    """
+
+    def __init__(self, value):
+        self._value = value
+        self._waiters = deque()  # (None, threading.Event) of a thread, (loop, future) of a coroutine
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                handed = waiter not in self._waiters
+                if not handed:
+                    self._waiters.remove(waiter)
+            if handed:
+                # The slot was handed over before the cancellation: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if loop is None:
+                    waiter.set()
+                    return
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(_hand_over, waiter)
+                    return
+            self._value += 1
+
+
+def _hand_over(future):
+    # A cancelled waiter releases the slot itself
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestLimiter:
+    """
+    Process-wide limits shared by all sessions and threads.
+
+    Bounds the number of in-flight LLM calls and page fetches, and keeps a
+    per-host politeness limit (concurrent fetches and minimum spacing).
+    Limits set to None are unbounded.
+    """
+
+    def __init__(self, max_llm_calls=None, max_fetches=None, per_host=None, host_interval=0.0):
+        self._llm = _Slots(max_llm_calls) if max_llm_calls else None
+        self._fetches = _Slots(max_fetches) if max_fetches else None
+        self.per_host = per_host
+        self.host_interval = host_interval
+        self._hosts = {}
+        self._last_fetch = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _Slots(self.per_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def llm_slot(self):
+        """Hold one LLM slot (blocking) for the duration of a call."""
+        if self._llm is None:
+            yield
+            return
+        self._llm.acquire()
+        try:
+            yield
+        finally:
+            self._llm.release()
+
+    @asynccontextmanager
+    async def allm_slot(self):
+        """Hold one LLM slot for the duration of an async call, without blocking the event loop."""
+        if self._llm is None:
+            yield
+            return
+        await self._llm.aacquire()
+        try:
+            yield
+        finally:
+            self._llm.release()
+
+    @asynccontextmanager
+    async def fetch_slot(self, url):
+        """Hold one fetch slot, and one slot of the url's host, for a page fetch."""
+        held = []
+        try:
+            if self._fetches is not None:
+                await self._fetches.aacquire()
+                held.append(self._fetches)
+            host = urllib.parse.urlsplit(url).netloc.lower()
+            if self.per_host:
+                host_semaphore = self._host_semaphore(host)
+                await host_semaphore.aacquire()
+                held.append(host_semaphore)
+            if self.host_interval:
+                with self._lock:
+                    wait = self._last_fetch.get(host, 0) + self.host_interval - time.monotonic()
+                    self._last_fetch[host] = time.monotonic() + max(wait, 0)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            yield
+        finally:
+            for semaphore in reversed(held):
+                semaphore.release()
+
+
+_limiter = RequestLimiter()
+
+
+def configure_limits(max_llm_calls=None, max_fetches=None, per_host=None, host_interval=0.0):
+    """
+    Args:
+        max_llm_calls (int): maximum number of concurrent LLM calls
+        max_fetches (int): maximum number of concurrent page fetches
+        per_host (int): maximum number of concurrent fetches per host
+        host_interval (float): minimum seconds between two fetches to the same host
+    """
+    global _limiter
+    _limiter = RequestLimiter(max_llm_calls, max_fetches, per_host, host_interval)
+
+
+def get_limiter():
+    """
+    Returns:
+        RequestLimiter: the process-wide request limiter
+    """
+    return _limiter
 
 def process_url(url, sub_url):
     """
@@ -14,65 +182,275 @@ def process_url(url, sub_url):
     return urllib.parse.urljoin(url, sub_url)
 
 
-def clean_markdown(res):
+SCREENSHOT_CAPTURE_MODES = ("eager", "on_demand")
+
+MAX_OPEN_PAGES = 8        # rendered pages kept open for on-demand screenshots (the oldest are closed)
+MAX_REMEMBERED_VISITS = 64  # on-demand visits whose event loop is remembered
+
+_screenshot_capture = "eager"
+_capture_stats = {"visits": 0, "captured": 0, "reused": 0, "capture_seconds": 0.0}
+# url -> {"loop", "crawler", "session_id"} of on-demand visits, most recent last; crawler and
+# session_id name the browser page the url was rendered in while it is kept open
+_visited_pages = OrderedDict()
+_visited_lock = threading.Lock()
+
+
+def configure_screenshot_capture(mode="eager"):
     """
     Args:
-        res (str): markdown content
-    
+        mode (str): "eager" takes a screenshot on every page visit; "on_demand" fetches pages
+            without one and captures the current page only when use_vlm_analysis needs it
+    """
+    global _screenshot_capture
+    if mode not in SCREENSHOT_CAPTURE_MODES:
+        raise ValueError(f"Unknown screenshot capture mode: {mode} (expected one of {SCREENSHOT_CAPTURE_MODES})")
+    _screenshot_capture = mode
+
+
+def screenshots_on_demand():
+    """
     Returns:
-        str: cleaned markdown content
+        bool: whether screenshots are captured only when the VLM asks for them
     """
-    pattern = r'\[.*?\]\(.*?\)'
+    return _screenshot_capture == "on_demand"
+
+
+async def _close_page(page):
+    """Close the browser page of a visit (on the loop it was rendered on)."""
     try:
-        result = re.sub(pattern, '', res)
-        url_pattern = pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-        result = re.sub(url_pattern, '', result)
-        result = result.replace("* \n","")
-        result = re.sub(r"\n\n+", "\n", result)
-        return result
-    except Exception:
-        return res
+        await page["crawler"].crawler_strategy.kill_session(page["session_id"])
+    except Exception as e:
+        print(f"[WARNING] Failed to close the page kept for {page.get('url')}: {e}")
+
+
+def _schedule_close(page):
+    loop = page["loop"]
+    if loop.is_closed():
+        return
+    if loop is asyncio.get_running_loop():
+        loop.create_task(_close_page(page))
+    else:
+        asyncio.run_coroutine_threadsafe(_close_page(page), loop)
+
 
-async def get_info(url, screenshot = True) -> str:
+def _remember_visit(url, crawler=None, session_id=None):
+    """
+    Remember the event loop of an on-demand visit and, if it was rendered, its still open browser page.
+    """
+    entry = {"url": url, "loop": asyncio.get_running_loop(), "crawler": crawler, "session_id": session_id}
+    stale = []
+    with _visited_lock:
+        previous = _visited_pages.pop(url, None)
+        if previous and previous["session_id"]:
+            stale.append(previous)
+        _visited_pages[url] = entry
+        open_pages = [page for page in _visited_pages.values() if page["session_id"]]
+        for page in open_pages[:-MAX_OPEN_PAGES]:
+            stale.append(dict(page))
+            page["crawler"] = page["session_id"] = None
+        while len(_visited_pages) > MAX_REMEMBERED_VISITS:
+            _, page = _visited_pages.popitem(last=False)
+            if page["session_id"]:
+                stale.append(page)
+    for page in stale:
+        _schedule_close(page)
+
+
+async def get_info(url, screenshot = True, keep_open = False, prefetch = False) -> str:
     """
     Args:
         url (str): url
         screentshot (bool): whether to take a screenshot
+        keep_open (bool): keep the rendered browser page open for capture_screenshot (on-demand visits)
+        prefetch (bool): a speculative fetch, left out of the host profiles (and their fail-fast)
 
     Returns:
-        str: html content and cleaned markdown content
+        tuple: html content, cleaned markdown content and, if screenshot, the base64 screenshot
     """
-    import asyncio
+    def failed(message):
+        return ("", message, None) if screenshot else ("", message)
+
+    cache = get_page_cache()
+    cached = cache.get(url, need_screenshot=screenshot)
+    if cached:
+        if keep_open:
+            _remember_visit(url)
+        if screenshot:
+            return cached["html"], cached["clean_markdown"], cached.get("screenshot")
+        return cached["html"], cached["clean_markdown"]
+    if cache.read_only:
+        print(f"[WARNING] {url} is not in the replay cache")
+        return failed("Error: Page not in replay cache")
 
+    profiles = get_host_profiles()
+    # Prefetches of links the agent never follows (dead links, slow pages) must not mark a host dead
+    record = profiles.enabled and not prefetch
+    dead = profiles.fail_fast(url)
+    if dead:
+        print(f"[WARNING] {dead}: {url}")
+        return failed(f"Error: {dead}")
+    # Fixed defaults (30 s, DOM loaded), or adapted to what is known of the host
+    settings = profiles.fetch_settings(url)
+    # A page fetched in a crawl4ai session stays open after the fetch, so it can be captured later
+    session_id = f"vgems-{uuid.uuid4().hex}" if keep_open else None
     run_config = CrawlerRunConfig(
-        screenshot=True,             # Grab a screenshot as base64
-        screenshot_wait_for=1.0,     # Wait 1s before capturing
-        page_timeout=30000,          # 30 second timeout for page load
-        wait_until="domcontentloaded"  # Don't wait for all resources, just DOM
+        screenshot=screenshot,       # Grab a screenshot as base64
+        screenshot_wait_for=1.0 if screenshot else None,  # Wait 1s before capturing
+        page_timeout=settings["page_timeout"],  # Timeout for page load
+        wait_until=settings["wait_until"],      # "domcontentloaded": don't wait for all resources, just DOM
+        session_id=session_id
     )
 
+    start = None
+    opened = None  # the browser page kept open, closed again if the fetch fails
     try:
-        async with AsyncWebCrawler() as crawler:
-            if screenshot:
-                # Add timeout wrapper
-                result = await asyncio.wait_for(
-                    crawler.arun(url, config=run_config),
-                    timeout=45.0  # 45 second total timeout
-                )
-                return result.html, clean_markdown(result.markdown), result.screenshot
+        async with get_limiter().fetch_slot(url):
+            start = time.perf_counter()
+            # Static pages are fetched over plain HTTP when the fetch tier allows it
+            static = await fetch_static(url) if not screenshot and use_http(url) else None
+            if static is None:
+                # Lease a long-lived browser instead of launching Chromium per visit
+                async with get_browser_pool().acquire() as lease:
+                    crawler = lease.crawler
+                    if session_id:
+                        opened = {"url": url, "loop": asyncio.get_running_loop(), "crawler": crawler,
+                                  "session_id": session_id}
+                    start = time.perf_counter()
+                    # Add timeout wrapper
+                    result = await asyncio.wait_for(
+                        crawler.arun(url, config=run_config),
+                        timeout=settings["timeout"]  # 45 second total timeout by default
+                    )
+                    # crawl4ai reports most failed fetches in the result rather than raising
+                    if result.success and result.html:
+                        lease.mark_succeeded()
+                    else:
+                        lease.mark_failed()
+                record_browser_fetch(url)
+            elapsed = time.perf_counter() - start
+        if static is not None:
+            html, raw_markdown = static
+            success, page_screenshot = True, None
+        else:
+            html, success, page_screenshot = result.html, result.success, result.screenshot
+            raw_markdown = str(result.markdown) if result.markdown is not None else None
+        # Clean in the page processing pool so that other fetches keep running meanwhile
+        # (the pool's processes do not see the configured URL pattern, so it is passed along)
+        markdown = await run_cpu_async(clean_markdown, raw_markdown, get_url_pattern())
+        if success and html:
+            cache.put(url, html, raw_markdown, markdown,
+                      page_screenshot if screenshot else None)
+        if keep_open:
+            if opened and success and html:
+                _remember_visit(url, opened["crawler"], session_id)
+                opened = None
+            else:
+                _remember_visit(url)
+        if record:
+            if static is not None:
+                profiles.record(url, elapsed, ok=True)
             else:
-                result = await asyncio.wait_for(
-                    crawler.arun(url, screenshot=screenshot),
-                    timeout=45.0
-                )
-                return result.html, clean_markdown(result.markdown)
+                profiles.record(url, elapsed, ok=bool(success and html), wait_until=settings["wait_until"],
+                                has_content=not looks_js_rendered(html or "", raw_markdown or ""))
+        if screenshot:
+            return html, markdown, page_screenshot
+        return html, markdown
     except asyncio.TimeoutError:
         print(f"[WARNING] Timeout fetching {url}, returning empty content")
-        return "", "Error: Page load timeout", None if screenshot else ("", "")
+        if keep_open:
+            _remember_visit(url)
+        if record and start is not None:
+            profiles.record(url, time.perf_counter() - start, ok=False, timeout=True)
+        return failed("Error: Page load timeout")
     except Exception as e:
         print(f"[ERROR] Failed to fetch {url}: {e}")
-        return "", f"Error: {str(e)}", None if screenshot else ("", "")
-    
+        if record and start is not None:
+            profiles.record(url, time.perf_counter() - start, ok=False)
+        if keep_open:
+            _remember_visit(url)
+        return failed(f"Error: {str(e)}")
+    finally:
+        if opened:
+            await _close_page(opened)
+
+
+async def fetch_page(url):
+    """
+    Fetch a page for a visit, with a screenshot unless screenshots are captured on demand.
+
+    Returns:
+        tuple: html content, cleaned markdown content, base64 screenshot (None on demand)
+    """
+    # Wait for a running prefetch of the page instead of fetching it twice
+    await get_prefetcher().claim(url)
+    _capture_stats["visits"] += 1
+    if screenshots_on_demand():
+        html, markdown = await get_info(url, screenshot=False, keep_open=True)
+        return html, markdown, None
+    _capture_stats["captured"] += 1
+    return await get_info(url)
+
+
+async def prefetch_page(url):
+    """Fetch a page into the page cache the way a visit would (used by the prefetcher)."""
+    return await get_info(url, screenshot=not screenshots_on_demand(), prefetch=True)
+
+
+async def _capture(url, page):
+    if page and page["session_id"]:
+        # Screenshot of the page as the agent read it: no navigation, the rendered page is reused
+        config = CrawlerRunConfig(session_id=page["session_id"], js_only=True, screenshot=True,
+                                  screenshot_wait_for=1.0)
+        try:
+            result = await asyncio.wait_for(page["crawler"].arun(url, config=config), timeout=30)
+            if result.success and result.screenshot:
+                _capture_stats["reused"] += 1
+                return result.screenshot
+            print(f"[WARNING] Could not capture the open page of {url}, fetching it again")
+        except Exception as e:
+            print(f"[WARNING] Could not capture the open page of {url} ({e}), fetching it again")
+        finally:
+            await _close_page(page)
+    # The page was not rendered (page cache, HTTP tier) or was closed: fetch it with a screenshot
+    _, _, screenshot = await get_info(url)
+    return screenshot
+
+
+async def capture_screenshot(url):
+    """
+    Screenshot of a page visited earlier without one: taken from the browser page the visit
+    rendered if it is still open, otherwise by fetching the page again (served by the page cache
+    if it has one). Runs on the event loop of the visit, whose browser pool holds that page.
+
+    Returns:
+        str: base64 screenshot, None if it could not be taken
+    """
+    start = time.perf_counter()
+    with _visited_lock:
+        page = _visited_pages.pop(url, None)
+    if page and page["loop"].is_closed():
+        page = None  # its browser pool is closed with it
+    if page and page["loop"] is not asyncio.get_running_loop():
+        screenshot = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_capture(url, page), page["loop"]))
+    else:
+        screenshot = await _capture(url, page)
+    _capture_stats["captured"] += 1
+    _capture_stats["capture_seconds"] += time.perf_counter() - start
+    return screenshot
+
+
+def screenshot_capture_report():
+    """Screenshots taken in this process against page visits."""
+    stats = dict(_capture_stats)
+    if not stats["visits"]:
+        return "screenshot capture: no page visits"
+    if not screenshots_on_demand():
+        return f"screenshot capture (eager): {stats['captured']} screenshots for {stats['visits']} visits"
+    average = stats["capture_seconds"] / stats["captured"] if stats["captured"] else 0.0
+    return (f"screenshot capture (on demand): {stats['captured']} screenshots for {stats['visits']} visits "
+            f"({1 - stats['captured'] / stats['visits']:.0%} skipped, {stats['reused']} from the open page), "
+            f"{average:.1f} s per capture")
+
 def get_content_between_a_b(start_tag, end_tag, text):
     """
     Args:
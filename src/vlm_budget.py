@@ -0,0 +1,137 @@
+"""
+Per-session VLM budget and batching settings.
+
+use_vlm_analysis used to cap VLM usage with a class attribute shared by every
+agent in the process and never reset, so later questions of an evaluation run
+silently lost the VLM. Each Session now owns a VLMBudget, recreated with the
+session state for every query, which limits calls and images and measures
+images per call and latency per image.
+
+With batch_pages > 1, one use_vlm_analysis call sends the screenshots of the
+last visited pages not analyzed yet (the current page included) together in
+one multi-image request, instead of one request per page.
+"""
+
+import threading
+from typing import Dict
+
+MAX_CALLS = 15          # VLM requests per session
+MAX_IMAGES = 8          # images per request (pages x tiles)
+
+_options = {
+    "max_calls": MAX_CALLS,
+    "max_images": MAX_IMAGES,
+    "batch_pages": 1,   # pages per request, 1 for the current page only
+}
+
+_totals = {"sessions": 0, "calls": 0, "failed": 0, "images": 0, "pages": 0, "seconds": 0.0}
+_totals_lock = threading.Lock()
+
+
+def configure_vlm(max_calls: int = None, max_images: int = None, batch_pages: int = None):
+    """
+    Args:
+        max_calls (int): VLM requests per session
+        max_images (int): images per request
+        batch_pages (int): pending page screenshots sent in one request
+    """
+    if max_calls is not None:
+        _options["max_calls"] = max_calls
+    if max_images is not None:
+        _options["max_images"] = max(1, max_images)
+    if batch_pages is not None:
+        _options["batch_pages"] = max(1, batch_pages)
+
+
+def get_vlm_options() -> Dict:
+    """
+    Returns:
+        dict: max_calls, max_images, batch_pages
+    """
+    return dict(_options)
+
+
+class VLMBudget:
+    """
+    VLM calls left to one session, and what they were spent on.
+
+    Args:
+        max_calls (int): VLM requests allowed (the configured default if None)
+    """
+
+    def __init__(self, max_calls: int = None):
+        self.max_calls = max_calls if max_calls is not None else _options["max_calls"]
+        self.calls = 0
+        self.failed = 0     # failed requests, which do not use up the budget
+        self.images = 0
+        self.pages = 0
+        self.seconds = 0.0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.max_calls - self.calls)
+
+    def allows(self) -> bool:
+        return self.remaining > 0
+
+    def charge(self, images: int, pages: int, seconds: float):
+        """
+        Record one successful VLM request.
+
+        Args:
+            images (int): images sent
+            pages (int): pages they show
+            seconds (float): request latency
+        """
+        self.calls += 1
+        self.images += images
+        self.pages += pages
+        self.seconds += seconds
+        with _totals_lock:
+            _totals["sessions"] += self.calls == 1
+            _totals["calls"] += 1
+            _totals["images"] += images
+            _totals["pages"] += pages
+            _totals["seconds"] += seconds
+
+    def record_failure(self):
+        """Record a failed VLM request (network error, error reply): counted, but not charged."""
+        self.failed += 1
+        with _totals_lock:
+            _totals["failed"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "failed": self.failed,
+            "max_calls": self.max_calls,
+            "images": self.images,
+            "pages": self.pages,
+            "images_per_call": round(self.images / self.calls, 2) if self.calls else 0.0,
+            "seconds_per_image": round(self.seconds / self.images, 3) if self.images else 0.0,
+        }
+
+    def to_dict(self) -> Dict:
+        return {"max_calls": self.max_calls, "calls": self.calls, "failed": self.failed, "images": self.images,
+                "pages": self.pages, "seconds": self.seconds}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "VLMBudget":
+        budget = cls(data.get("max_calls"))
+        budget.calls = int(data.get("calls", 0))
+        budget.failed = int(data.get("failed", 0))
+        budget.images = int(data.get("images", 0))
+        budget.pages = int(data.get("pages", 0))
+        budget.seconds = float(data.get("seconds", 0.0))
+        return budget
+
+
+def vlm_report() -> str:
+    """VLM requests of this process: images per call and latency per image."""
+    with _totals_lock:
+        totals = dict(_totals)
+    if not totals["calls"]:
+        return f"VLM: no calls ({totals['failed']} failed)" if totals["failed"] else "VLM: no calls"
+    return (f"VLM: {totals['calls']} calls in {totals['sessions']} sessions ({totals['failed']} more failed), "
+            f"{totals['pages'] / totals['calls']:.1f} pages and {totals['images'] / totals['calls']:.1f} images "
+            f"per call, {totals['seconds'] / max(totals['images'], 1):.2f} s per image")